@@ -1,6 +1,35 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import json
+import os
+
+from lewis_core import (
+    FUNCTIONAL_GROUPS,
+    INORGANIC_ATOMS,
+    ORGANIC_ATOMS,
+    MolGraph,
+    SnapshotError,
+    BuilderRun,
+    dump_snapshot,
+    hydrogen_pieces,
+    import_structure,
+    ingest,
+    load_snapshot,
+    new_piece_id,
+    parse_payload,
+    piece_events,
+    pieces_from_token,
+    snapshot_token,
+    tidy_pieces,
+)
+# Cached resources shared by every session and page
+from lewis_resources import (
+    analysis_pool,
+    event_recorder,
+    molecule_library,
+    profiler,
+    session_registry,
+    structure_store,
+)
 
 st.set_page_config(page_title="Molecule Builder", layout="wide")
 
@@ -8,25 +37,142 @@ st.title("🧪 Molecule Builder (Organic & Inorganic)")
 st.write("Use the tabs to switch between Organic and Inorganic builders.")
 
 # -----------------------------
-#  PALETTES
+#  SESSION STATE
 # -----------------------------
+# Only the session id lives in st.session_state. The pieces and the molecule
+# tracker fed by the analysis worker are checked out of the registry (see
+# lewis_core.session), which may have restored them from disk. The rerun is
+# profiled (with the analysis it submits) only if an admin armed this session.
+# The load test drives the same BuilderRun steps (see lewis_core.rerun).
+registry = session_registry()
+profiles = profiler()
+run = BuilderRun(registry, analysis_pool(), profiles, st.session_state.get("session_id"))
+state = run.state
+st.session_state.session_id = run.session_id
+
+# Optional trace of every ingested payload, for python -m lewis_core.replay
+RECORD_PATH = os.environ.get("LEWIS_RECORD_EVENTS")
+if RECORD_PATH and "recorder" not in state:
+    state["recorder"] = event_recorder(RECORD_PATH)
 
-ORGANIC_ATOMS = ["H", "C", "N", "O", "F", "Cl"]
-INORGANIC_ATOMS = ["H", "C", "N", "O", "F", "Cl", "S", "P"]
+# -----------------------------
+#  IMPORT (SMILES / MOLFILE)
+# -----------------------------
+with st.expander("Import a structure (SMILES or molfile)"):
+    smiles_text = st.text_input("SMILES", placeholder="e.g. CC(=O)O")
+    molfile = st.file_uploader("Molfile", type=["mol", "sdf"])
+
+    if st.button("Add to canvas"):
+        source = molfile.getvalue().decode("utf-8", "replace") if molfile else smiles_text
+        try:
+            new_pieces = import_structure(source)
+        except (ValueError, IndexError) as exc:
+            st.error(f"Could not import structure: {exc}")
+        else:
+            # One bulk insert for the whole structure
+            ingest(state, piece_events(new_pieces))
 
-BONDS = ["-", "=", "≡"]
+# -----------------------------
+#  MOLECULE LIBRARY
+# -----------------------------
+with st.expander("Molecule library"):
+    library = molecule_library()
+    query = st.text_input("Name or formula", placeholder="e.g. benzene, C2H6O")
+    contains = st.multiselect("Must contain", library.elements)
+    hits = library.search(query, contains=contains, limit=25)
+
+    if hits:
+        options = {f"{library.name(record)} — {library.formula(record)}": record for record in hits}
+        choice = st.selectbox(f"{len(options)} match(es)", list(options))
+        if st.button("Load onto canvas"):
+            new_pieces = library.pieces(options[choice])
+            ingest(state, piece_events(new_pieces))
+    elif query or contains:
+        st.caption("No molecules match.")
 
-ELECTRON_PAIRS = [
-    {"label": "|", "desc": "Vertical dash"},
-    {"label": "••", "desc": "Horizontal electron pair"},
-    {"label": ":", "desc": "Vertical electron pair"},
-]
+# -----------------------------
+#  SAVED STRUCTURES
+# -----------------------------
+with st.expander("Save / search saved structures"):
+    store = structure_store()
+    save_name = st.text_input("Save current canvas as", placeholder="e.g. Alex - acetic acid")
+    if st.button("💾 Save structure", disabled=not (save_name and state["pieces"])):
+        store.add(save_name, dict(state["pieces"]))
+        st.success(f"Saved {save_name!r} ({len(store)} saved structures).")
+
+    mode = st.radio("Find saved structures containing", ["A functional group", "The fragment on the canvas"])
+    if mode == "A functional group":
+        group = st.selectbox("Functional group", list(FUNCTIONAL_GROUPS))
+        pattern = MolGraph.from_group(group)
+    else:
+        # Fragments are usually drawn without lone pairs, so charges are not compared
+        pattern = MolGraph.from_pieces(state["pieces"], charges=False)
+
+    if st.button("🔎 Search", disabled=not pattern.elements):
+        found = store.search(pattern)
+        st.caption(f"{len(found)} of {len(store)} saved structures match.")
+        st.session_state.search_hits = found
+
+    found = [record for record in st.session_state.get("search_hits", []) if record < len(store)]
+    if found:
+        options = {f'{store.meta[r]["name"]} ({store.meta[r]["saved_at"]})': r for r in found[:200]}
+        choice = st.selectbox("Matches", list(options))
+        if st.button("Load match onto canvas"):
+            new_pieces = {new_piece_id(): piece for piece in store.pieces(options[choice]).values()}
+            ingest(state, piece_events(new_pieces))
 
 # -----------------------------
-#  SESSION STATE
+#  SHARE / COPY
+# -----------------------------
+# A share link carries the whole drawing in ?s=, added once per session
+shared = st.experimental_get_query_params().get("s")
+if shared and st.session_state.get("shared_token") != shared[0]:
+    st.session_state.shared_token = shared[0]
+    try:
+        ingest(state, piece_events(pieces_from_token(shared[0])))
+    except SnapshotError as exc:
+        st.error(f"Could not open the shared structure: {exc}")
+
+with st.expander("Share / copy between sessions"):
+    # Encoding walks every piece, so it only runs while the toggle is on
+    if st.toggle("Show share code and link", disabled=not state["pieces"]):
+        token = snapshot_token(state["pieces"])
+        st.caption(f'{len(state["pieces"])} pieces in {len(token)} characters.')
+        st.code(token, language=None)
+        st.markdown(f"[🔗 Share link](?s={token})")
+        st.download_button(
+            "⬇️ Download snapshot",
+            dump_snapshot(state["pieces"]),
+            file_name="structure.lws",
+            mime="application/octet-stream",
+        )
+
+    pasted = st.text_area("Paste a share code", height=80)
+    snapshot_file = st.file_uploader("Or open a snapshot file", type=["lws"])
+    if st.button("Add snapshot to canvas", disabled=not (pasted.strip() or snapshot_file)):
+        try:
+            new_pieces = load_snapshot(snapshot_file.getvalue()) if snapshot_file else pieces_from_token(pasted)
+        except SnapshotError as exc:
+            st.error(f"Could not read the snapshot: {exc}")
+        else:
+            ingest(state, piece_events(new_pieces))
+
+# -----------------------------
+#  TIDY UP / HYDROGENS
 # -----------------------------
-if "pieces" not in st.session_state:
-    st.session_state.pieces = {}
+tidy_col, hydrogen_col = st.columns(2)
+
+if tidy_col.button("🧹 Tidy up layout"):
+    moved = tidy_pieces(state["pieces"])
+    # All new positions travel as one batched update
+    ingest(state, piece_events(moved))
+
+if hydrogen_col.button("➕ Add implicit hydrogens"):
+    # Every H and its bond go in as one bulk insert; the canvas picks them up on remount
+    hydrogens = hydrogen_pieces(state["pieces"])
+    ingest(state, piece_events(hydrogens))
+    if not hydrogens:
+        hydrogen_col.caption("Every atom already has its hydrogens.")
 
 # -----------------------------
 #  TABS
@@ -34,235 +180,165 @@ if "pieces" not in st.session_state:
 tab1, tab2 = st.tabs(["Organic Builder", "Inorganic Builder"])
 
 def render_builder(atom_list):
-    """Renders the full HTML/JS builder with the given atom palette."""
+    """Renders the full HTML/JS builder with the given atom palette.
 
-    atom_palette_html = "".join(
-        f'<div class="palette-item" data-label="{a}" data-type="atom">{a}</div>'
-        for a in atom_list
-    )
+    The page carries every piece of the session (with its id). The iframe
+    is recreated on reruns, and the page rehydrates the canvas from them in
+    one pass, without echoing them back to the server. It also carries the
+    throttle hint that tells it how fast it may post.
+    """
+    components.html(run.canvas_html(atom_list), height=750)
 
-    bond_palette_html = "".join(
-        f'<div class="palette-item" data-label="{b}" data-type="bond">{b}</div>'
-        for b in BONDS
-    )
 
-    electron_palette_html = "".join(
-        f'<div class="palette-item electron-item" data-label="{e["label"]}" data-type="electron">{e["label"]}</div>'
-        for e in ELECTRON_PAIRS
-    )
+def render_summary(summary, throttle=None):
+    """Live formula, electron count and charge of everything on the canvas."""
+    st.metric("Formula", summary.formula or "—")
+    st.metric("Electrons drawn / expected", f"{summary.electrons} / {summary.expected}")
+    st.metric("Net charge", f"{summary.charge:+d}" if summary.charge else "0")
+    if throttle and throttle["pending"]:
+        st.caption(f'⏳ {throttle["pending"]} piece update(s) held back; slow down a little.')
 
-    components.html(
-        """
-        <style>
-            body {
-                user-select: none;
-            }
-
-            #container {
-                display: flex;
-                gap: 20px;
-            }
-
-            #left-palette, #right-palette {
-                width: 150px;
-                border: 2px solid #ccc;
-                padding: 10px;
-                background: #fafafa;
-            }
-
-            .palette-item {
-                font-size: 32px;
-                padding: 8px;
-                margin: 6px 0;
-                border: 1px solid #aaa;
-                background: white;
-                text-align: center;
-                cursor: grab;
-            }
-
-            /* Make vertical dash shorter in the palette */
-            .electron-item[data-label="|"] {
-                font-size: 24px !important;
-            }
-
-            #canvas {
-                width: 900px;
-                height: 600px;
-                border: 2px solid #ccc;
-                position: relative;
-                background: white;
-                overflow: hidden;
-            }
-
-            .piece {
-                position: absolute;
-                font-size: 48px;
-                cursor: grab;
-            }
-
-            /* Make vertical dash shorter on the canvas */
-            .piece.vertical-dash {
-                font-size: 24px !important;
-            }
-
-            .piece:active {
-                cursor: grabbing;
-            }
-        </style>
-
-        <div id="container">
-
-            <!-- Left Palette -->
-            <div id="left-palette">
-                <h4>Atoms</h4>
-                """ + atom_palette_html + """
-                <h4>Bonds</h4>
-                """ + bond_palette_html + """
-            </div>
-
-            <!-- Canvas -->
-            <div id="canvas"></div>
-
-            <!-- Right Palette -->
-            <div id="right-palette">
-                <h4>Electron Pairs</h4>
-                """ + electron_palette_html + """
-            </div>
-
-        </div>
-
-        <script>
-            const canvas = document.getElementById("canvas");
-
-            // Create a new piece on the canvas
-            function createPiece(label, type, x, y) {
-                const id = "piece-" + Math.random().toString(36).substr(2, 9);
-
-                const el = document.createElement("div");
-                el.className = "piece";
-                el.id = id;
-                el.style.left = x + "px";
-                el.style.top = y + "px";
-                el.textContent = label;
-
-                // Tag vertical dash for smaller size
-                if (label === "|") {
-                    el.classList.add("vertical-dash");
-                }
-
-                canvas.appendChild(el);
-                makeDraggable(el);
-
-                sendUpdate(id, x, y, false, label, type);
-            }
-
-            // Drag from palette → create new piece
-            document.querySelectorAll(".palette-item").forEach(item => {
-                item.addEventListener("mousedown", e => {
-                    createPiece(
-                        item.dataset.label,
-                        item.dataset.type,
-                        50,
-                        50
-                    );
-                });
-            });
-
-            // Make a piece draggable
-            function makeDraggable(el) {
-                let active = false;
-                let offsetX = 0;
-                let offsetY = 0;
-
-                el.addEventListener("mousedown", startDrag);
-
-                function startDrag(e) {
-                    active = true;
-                    const rect = el.getBoundingClientRect();
-                    offsetX = e.clientX - rect.left;
-                    offsetY = e.clientY - rect.top;
-
-                    document.addEventListener("mousemove", drag);
-                    document.addEventListener("mouseup", endDrag);
-                }
-
-                function drag(e) {
-                    if (!active) return;
-
-                    const parent = canvas.getBoundingClientRect();
-                    const x = e.clientX - parent.left - offsetX;
-                    const y = e.clientY - parent.top - offsetY;
-
-                    el.style.left = x + "px";
-                    el.style.top = y + "px";
-                }
-
-                function endDrag(e) {
-                    if (!active) return;
-                    active = false;
-
-                    const parent = canvas.getBoundingClientRect();
-                    const x = e.clientX - parent.left - offsetX;
-                    const y = e.clientY - parent.top - offsetY;
-
-                    sendUpdate(el.id, x, y, false);
-
-                    document.removeEventListener("mousemove", drag);
-                    document.removeEventListener("mouseup", endDrag);
-                }
-            }
-
-            // Send updates to Streamlit
-            function sendUpdate(id, x, y, deleted, label=null, type=null) {
-                window.parent.postMessage(
-                    {
-                        "type": "streamlit:setComponentValue",
-                        "value": {
-                            id, x, y, deleted, label, type
-                        }
-                    },
-                    "*"
-                );
-            }
-        </script>
-        """,
-        height=750,
-    )
 
+# -----------------------------
+#  RECEIVE JS UPDATES
+# -----------------------------
+event = st.experimental_get_query_params().get("streamlit_component_value")
+
+if event:
+    try:
+        # Events over the session's rate wait in the throttle, merged per piece
+        run.receive(parse_payload(event[0]))
+    except Exception:
+        pass
+throttle = run.throttle
 
 # -----------------------------
 #  RENDER TABS
 # -----------------------------
+# The canvas is rebuilt from the server's pieces, including the event above
 with tab1:
     st.subheader("Organic Molecule Builder")
-    render_builder(ORGANIC_ATOMS)
+    canvas_col, summary_col = st.columns([5, 1])
+    with canvas_col:
+        render_builder(ORGANIC_ATOMS)
+    with summary_col:
+        render_summary(state["summary"], throttle)
 
 with tab2:
     st.subheader("Inorganic Molecule Builder")
-    render_builder(INORGANIC_ATOMS)
+    canvas_col, summary_col = st.columns([5, 1])
+    with canvas_col:
+        render_builder(INORGANIC_ATOMS)
+    with summary_col:
+        render_summary(state["summary"], throttle)
 
 # -----------------------------
-#  RECEIVE JS UPDATES
+#  BACKGROUND ANALYSIS
 # -----------------------------
-event = st.experimental_get_query_params().get("streamlit_component_value")
+# Only the newest edit matters; older queued jobs are superseded
+outcome = run.analysis()
+
+st.write("### Molecules on canvas:")
+scheme = outcome[0] if outcome and outcome[1] is None else {"molecules": [], "steps": []}
+molecules = scheme["molecules"]
+if outcome is None or not outcome[2]:
+    st.caption("⏳ Analysis is catching up with your latest edits…")
+if outcome and outcome[1] is not None:
+    st.warning(f"Molecule analysis failed: {outcome[1]}")
+if molecules:
+    st.table([
+        {
+            "Formula": summary["formula"],
+            "Electrons": f'{summary["electrons"]} / {summary["expected"]}',
+            "Charge": f'{summary["charge"]:+d}' if summary["charge"] else "0",
+            "Rings": ", ".join(
+                f'{ring["size"]}{" (aromatic)" if ring["aromatic"] else ""}' for ring in summary["rings"]
+            ) or "—",
+            "Problems": "; ".join(summary["problems"]) or "—",
+        }
+        for summary in molecules
+    ])
+else:
+    st.write("No atoms yet.")
+
+# Arrows (→) on the canvas make it a reaction scheme, checked step by step
+if scheme["steps"]:
+    st.write("### Reaction balance:")
+    st.table([
+        {
+            "Step": step["step"],
+            "Reaction": f'{step["reactants"] or "∅"} → {step["products"] or "∅"}',
+            "Atoms": "✅" if step["atoms_balanced"] else "❌ products have " + ", ".join(
+                f'{abs(count)} {element} {"too few" if count > 0 else "too many"}'
+                for element, count in step["missing"].items()
+            ),
+            "Charge": "✅" if step["charge_balanced"] else "❌ {:+d} → {:+d}".format(*step["charges"]),
+        }
+        for step in scheme["steps"]
+    ])
 
-if event:
-    try:
-        data = json.loads(event[0])
-        pid = data["id"]
+st.write("### Current pieces on canvas:")
+st.json(run.pieces_json())
 
-        if data.get("deleted"):
-            if pid in st.session_state.pieces:
-                del st.session_state.pieces[pid]
-        else:
-            st.session_state.pieces[pid] = {
-                "x": data["x"],
-                "y": data["y"],
-                "label": data.get("label", st.session_state.pieces.get(pid, {}).get("label")),
-                "type": data.get("type", st.session_state.pieces.get(pid, {}).get("type")),
-            }
-    except Exception:
-        pass
+# -----------------------------
+#  MEMORY
+# -----------------------------
+run.close()
+
+with st.expander("Server memory"):
+    totals = registry.totals()
+    st.caption(
+        f'{totals["resident"]} session(s) in memory, about {totals["bytes"] / 2 ** 20:.1f} of '
+        f'{totals["ceiling"] / 2 ** 20:.0f} MB; {totals["on_disk"]} idle session(s) on disk '
+        f'({totals["disk_bytes"] / 1024:.0f} KB).'
+    )
+    st.table([
+        {
+            "Session": row["session_id"][:8] + (" (you)" if row["session_id"] == state["session_id"] else ""),
+            "Pieces": row.get("pieces", 0),
+            "Pieces KB": round(row.get("piece_bytes", 0) / 1024, 1),
+            "Caches KB": round(row.get("cache_bytes", 0) / 1024, 1),
+            "Idle s": row["idle_s"],
+        }
+        for row in registry.usage()[:25]
+    ])
 
-st.write("### Current pieces on canvas:")
-st.json(st.session_state.pieces)
+# -----------------------------
+#  PROFILING (ADMIN)
+# -----------------------------
+# Only shown with ?admin=<LEWIS_ADMIN_TOKEN>; a capture covers the chosen
+# session's next reruns and nobody else's
+ADMIN_TOKEN = os.environ.get("LEWIS_ADMIN_TOKEN")
+if ADMIN_TOKEN and st.experimental_get_query_params().get("admin") == [ADMIN_TOKEN]:
+    with st.expander("Profiling (admin)"):
+        sessions = {
+            row["session_id"][:8] + (" (you)" if row["session_id"] == state["session_id"] else ""): row["session_id"]
+            for row in registry.usage()
+        }
+        target = st.selectbox("Session", list(sessions))
+        runs = st.number_input("Reruns to capture", min_value=1, max_value=50, value=5)
+        if st.button("⏺️ Capture", disabled=target is None):
+            profiles.arm(sessions[target], int(runs))
+
+        for profile in profiles.profiles():
+            sid = profile.session_id
+            st.write(
+                f"**{sid[:8]}** (armed {profile.armed_at}): {profile.captured} of "
+                f"{profile.requested} rerun(s), {profile.jobs} analysis job(s)"
+            )
+            download_col, report_col, discard_col = st.columns(3)
+            download_col.download_button(
+                "⬇️ pstats",
+                profile.pstats_bytes(),
+                file_name=f"lewis-{sid[:8]}.pstats",
+                disabled=profile.stats is None,
+                key=f"pstats-{sid}",
+            )
+            report_col.download_button(
+                "⬇️ Report",
+                profile.report(),
+                file_name=f"lewis-{sid[:8]}.txt",
+                key=f"report-{sid}",
+            )
+            if discard_col.button("Discard", key=f"discard-{sid}"):
+                profiles.disarm(sid)
@@ -0,0 +1,7 @@
+"""Puts the repository root on sys.path, so a bare ``pytest`` run in the
+repository imports lewis_core the way ``python -m pytest`` does."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,56 @@
+"""Core engine of the Lewis structure builder, free of Streamlit.
+
+The piece model, event ingestion and chemistry analysis live here; the
+Streamlit scripts are thin layers over it. Importing the package is cheap:
+names below are resolved on first use, so ``from lewis_core import ingest``
+loads only the event module, and numpy only comes in with the modules that
+compute with it (structure import, layout, library, search, snapshots).
+"""
+
+import importlib
+
+_EXPORTS = {
+    "pieces": [
+        "BOND_ORDERS", "ELECTRON_GLYPHS", "STRICT_OCTET", "VALENCE_ELECTRONS",
+        "hill_formula", "is_glyph", "is_piece", "new_piece_id", "new_piece_ids", "piece_center", "piece_size",
+    ],
+    "events": ["apply_events", "ingest", "iter_events", "parse_payload", "piece_events", "record_payload"],
+    "graph": ["PieceGraph"],
+    "components": ["ComponentTracker", "summarize_component"],
+    "rings": ["aromatic_rings", "smallest_rings"],
+    "reactions": ["ReactionBalance"],
+    "importer": [
+        "StructureImportError", "hydrogen_pieces", "import_structure", "parse_molfile", "parse_smiles",
+    ],
+    "layout": ["tidy_pieces"],
+    "templates": ["TEMPLATES", "template_pieces"],
+    "grading": ["Grader", "Structure"],
+    "workers": ["AnalysisPool", "DeferredUpdates", "analyze_molecules", "analyze_scheme"],
+    "summary": ["LiveSummary"],
+    "ratelimit": ["EventThrottle", "TokenBucket"],
+    "profiling": ["Profiler", "SessionProfile"],
+    "snapshot": ["SnapshotError", "dump_snapshot", "load_snapshot", "pieces_from_token", "snapshot_token"],
+    "session": ["SessionRegistry", "deep_sizeof", "init_session", "session_usage"],
+    "library": ["MoleculeLibrary"],
+    "search": ["FUNCTIONAL_GROUPS", "MolGraph", "StructureStore"],
+    "replay": ["EventRecorder"],
+    "canvas": ["INORGANIC_ATOMS", "ORGANIC_ATOMS", "builder_html"],
+    "rerun": ["BuilderRun"],
+    "thumbnails": ["ThumbnailCache", "pieces_svg", "source_key", "thumbnail_key"],
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name):
+    module = _LOCATIONS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,924 @@
+"""HTML/JS of the drag-and-drop builder canvas.
+
+The page is built without Streamlit so the app and the tools that exercise
+the same render path (the load test) produce it the same way.
+"""
+
+import json
+
+from .reactions import ARROW, PLUS
+from .templates import TEMPLATES, template_pieces
+
+# -----------------------------
+#  PALETTES
+# -----------------------------
+
+ORGANIC_ATOMS = ["H", "C", "N", "O", "F", "Cl"]
+INORGANIC_ATOMS = ["H", "C", "N", "O", "F", "Cl", "S", "P"]
+
+BONDS = ["-", "=", "≡"]
+
+ELECTRON_PAIRS = [
+    {"label": "|", "desc": "Vertical dash"},
+    {"label": "••", "desc": "Horizontal electron pair"},
+    {"label": ":", "desc": "Vertical electron pair"},
+]
+
+# Reaction arrows split the canvas into steps; "+" is only drawn
+REACTION_SIGNS = [ARROW, PLUS]
+
+
+def builder_html(atom_list, mount=(), throttle=None):
+    """Returns the full builder page with the given atom palette.
+
+    ``mount`` is the session's pieces (with their ids). The page is rebuilt
+    whenever Streamlit recreates the iframe, so it rehydrates the canvas
+    from them in one pass when it loads, without echoing them back to the
+    server, and picks up the pan and zoom the previous page left behind.
+
+    ``throttle`` is ``EventThrottle.hint()`` of the session: the page spaces
+    its posts by ``interval_ms``, merging what it sends per piece meanwhile,
+    and holds the next one for ``retry_after_ms``, then posts once on its
+    own to collect the ``pending`` events the server still holds.
+    """
+    head, tail = builder_page(atom_list, mount)
+    return head + throttle_json(throttle) + tail
+
+
+def script_json(value):
+    """``value`` as JSON to paste into the page's <script>.
+
+    Every ``<`` is written as ``\\u003c``, which JSON reads back as the same
+    character, so no label can close the script (``</script>``) or open an
+    HTML comment (``<!--``) that changes how the browser parses it.
+    """
+    return json.dumps(value).replace("<", "\\u003c")
+
+
+def throttle_json(throttle=None):
+    """The throttle hint as the page reads it; no hint means no limit."""
+    return script_json(throttle or {"interval_ms": 0, "retry_after_ms": 0, "pending": 0})
+
+
+def builder_page(atom_list, mount=()):
+    """``builder_html`` as ``(head, tail)``, to be joined around ``throttle_json``.
+
+    Neither half depends on the throttle, so a caller can keep them while
+    the pieces are unchanged and only fill in the current hint.
+    """
+
+    atom_palette_html = "".join(
+        f'<div class="palette-item" data-label="{a}" data-type="atom">{a}</div>'
+        for a in atom_list
+    )
+
+    bond_palette_html = "".join(
+        f'<div class="palette-item" data-label="{b}" data-type="bond">{b}</div>'
+        for b in BONDS
+    )
+
+    electron_palette_html = "".join(
+        f'<div class="palette-item electron-item" data-label="{e["label"]}" data-type="electron">{e["label"]}</div>'
+        for e in ELECTRON_PAIRS
+    )
+
+    reaction_palette_html = "".join(
+        f'<div class="palette-item" data-label="{r}" data-type="reaction">{r}</div>'
+        for r in REACTION_SIGNS
+    )
+
+    template_palette_html = "".join(
+        f'<div class="palette-item template-item" data-template="{name}" data-type="template">{name}</div>'
+        for name in TEMPLATES
+    )
+
+    mount_json = script_json(list(mount))
+    templates_json = script_json({name: template_pieces(name) for name in TEMPLATES})
+
+    return (
+        """
+        <style>
+            body {
+                user-select: none;
+            }
+
+            #container {
+                display: flex;
+                gap: 20px;
+            }
+
+            #left-palette, #right-palette {
+                width: 150px;
+                border: 2px solid #ccc;
+                padding: 10px;
+                background: #fafafa;
+            }
+
+            .palette-item {
+                font-size: 32px;
+                padding: 8px;
+                margin: 6px 0;
+                border: 1px solid #aaa;
+                background: white;
+                text-align: center;
+                cursor: grab;
+            }
+
+            /* Make vertical dash shorter in the palette */
+            .electron-item[data-label="|"] {
+                font-size: 24px !important;
+            }
+
+            .template-item {
+                font-size: 16px;
+            }
+
+            #toolbar {
+                margin-bottom: 6px;
+                font-family: sans-serif;
+            }
+
+            #canvas {
+                width: 900px;
+                height: 600px;
+                border: 2px solid #ccc;
+                position: relative;
+                background: white;
+                overflow: hidden;
+            }
+
+            /* Unbounded drawing plane, panned and zoomed with a transform */
+            #world {
+                position: absolute;
+                left: 0;
+                top: 0;
+                transform-origin: 0 0;
+            }
+
+            .piece {
+                position: absolute;
+                font-size: 48px;
+                cursor: grab;
+            }
+
+            /* Make vertical dash shorter on the canvas */
+            .piece.vertical-dash {
+                font-size: 24px !important;
+            }
+
+            .piece:active {
+                cursor: grabbing;
+            }
+
+            .piece.selected {
+                color: #1f6feb;
+            }
+
+            /* Stacked on another piece */
+            .piece.overlap {
+                background: rgba(207, 34, 46, 0.15);
+                outline: 1px dashed #cf222e;
+            }
+
+            /* Alignment guides, in world coordinates */
+            .guide {
+                position: absolute;
+                display: none;
+                background: #d63384;
+                pointer-events: none;
+            }
+
+            #rubber-band {
+                position: absolute;
+                display: none;
+                border: 1px dashed #1f6feb;
+                background: rgba(31, 111, 235, 0.08);
+                pointer-events: none;
+            }
+        </style>
+
+        <div id="container">
+
+            <!-- Left Palette -->
+            <div id="left-palette">
+                <h4>Atoms</h4>
+                """ + atom_palette_html + """
+                <h4>Bonds</h4>
+                """ + bond_palette_html + """
+            </div>
+
+            <!-- Canvas -->
+            <div id="canvas-column">
+                <div id="toolbar">
+                    <button id="rotate-left" title="Rotate selection">⟲ 15°</button>
+                    <button id="rotate-right" title="Rotate selection">⟳ 15°</button>
+                    <button id="zoom-out" title="Zoom out">−</button>
+                    <button id="zoom-in" title="Zoom in">+</button>
+                    <button id="zoom-fit" title="Fit all pieces">Fit</button>
+                    <label title="Snap piece centers to the grid"><input type="checkbox" id="snap-grid"> Grid</label>
+                    <label title="Align with nearby atoms while dragging"><input type="checkbox" id="snap-guides" checked> Guides</label>
+                    <span id="selection-count"></span>
+                    <span id="view-status"></span>
+                </div>
+                <div id="canvas">
+                    <div id="world">
+                        <div id="guide-x" class="guide"></div>
+                        <div id="guide-y" class="guide"></div>
+                    </div>
+                    <div id="rubber-band"></div>
+                </div>
+            </div>
+
+            <!-- Right Palette -->
+            <div id="right-palette">
+                <h4>Electron Pairs</h4>
+                """ + electron_palette_html + """
+                <h4>Reactions</h4>
+                """ + reaction_palette_html + """
+                <h4>Templates</h4>
+                """ + template_palette_html + """
+            </div>
+
+        </div>
+
+        <script>
+            const canvas = document.getElementById("canvas");
+            const world = document.getElementById("world");
+            const band = document.getElementById("rubber-band");
+            const TEMPLATES = """ + templates_json + """;
+
+            // World model: every piece lives here; only visible ones get an element
+            const CELL = 256;
+            const pieces = new Map();
+            const elements = new Map();
+            const grid = new Map();
+            const selection = new Set();
+            const dragging = new Set();
+            const view = {x: 0, y: 0, scale: 1};
+
+            // Pan and zoom outlive the iframe, which Streamlit recreates on reruns
+            const VIEW_KEY = "lewis-builder-view";
+            function saveView() {
+                try {
+                    sessionStorage.setItem(VIEW_KEY, JSON.stringify(view));
+                } catch (err) {}
+            }
+            function loadView() {
+                try {
+                    Object.assign(view, JSON.parse(sessionStorage.getItem(VIEW_KEY)) || {});
+                } catch (err) {}
+            }
+
+            function newPieceId() {
+                return "piece-" + Math.random().toString(36).substr(2, 9);
+            }
+
+            function pieceSize(p) {
+                const font = p.label === "|" ? 24 : 48;
+                return {w: Math.max(1, (p.label || "").length) * font * 0.6, h: font * 1.15};
+            }
+
+            // -----------------------------
+            //  SPATIAL INDEX
+            // -----------------------------
+            function cellRange(x0, y0, x1, y1) {
+                return [
+                    Math.floor(x0 / CELL), Math.floor(y0 / CELL),
+                    Math.floor(x1 / CELL), Math.floor(y1 / CELL),
+                ];
+            }
+
+            function indexPiece(p) {
+                const s = pieceSize(p);
+                const [cx0, cy0, cx1, cy1] = cellRange(p.x, p.y, p.x + s.w, p.y + s.h);
+                p.cells = [];
+                for (let cx = cx0; cx <= cx1; cx++) {
+                    for (let cy = cy0; cy <= cy1; cy++) {
+                        const key = cx + "," + cy;
+                        if (!grid.has(key)) grid.set(key, new Set());
+                        grid.get(key).add(p.id);
+                        p.cells.push(key);
+                    }
+                }
+            }
+
+            function unindexPiece(p) {
+                (p.cells || []).forEach(key => {
+                    const bucket = grid.get(key);
+                    bucket.delete(p.id);
+                    if (!bucket.size) grid.delete(key);
+                });
+            }
+
+            // Ids of pieces whose box intersects the world rectangle
+            function queryRect(x0, y0, x1, y1) {
+                const hits = new Set();
+                const [cx0, cy0, cx1, cy1] = cellRange(x0, y0, x1, y1);
+                const keys = (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > grid.size
+                    ? grid.keys()
+                    : (function* () {
+                        for (let cx = cx0; cx <= cx1; cx++)
+                            for (let cy = cy0; cy <= cy1; cy++) yield cx + "," + cy;
+                    })();
+                for (const key of keys) {
+                    const bucket = grid.get(key);
+                    if (!bucket) continue;
+                    bucket.forEach(id => {
+                        const p = pieces.get(id);
+                        const s = pieceSize(p);
+                        if (p.x <= x1 && p.x + s.w >= x0 && p.y <= y1 && p.y + s.h >= y0) hits.add(id);
+                    });
+                }
+                return hits;
+            }
+
+            // -----------------------------
+            //  OVERLAPS
+            // -----------------------------
+            // Two pieces are stacked when their boxes share at least this
+            // much of the smaller box; lone pairs beside their atom share less
+            const OVERLAP_RATIO = 0.5;
+            const overlaps = new Map();
+
+            function stacked(a, b) {
+                const sa = pieceSize(a), sb = pieceSize(b);
+                const w = Math.min(a.x + sa.w, b.x + sb.w) - Math.max(a.x, b.x);
+                const h = Math.min(a.y + sa.h, b.y + sb.h) - Math.max(a.y, b.y);
+                return w > 0 && h > 0 && w * h >= OVERLAP_RATIO * Math.min(sa.w * sa.h, sb.w * sb.h);
+            }
+
+            function markOverlap(id) {
+                const el = elements.get(id);
+                if (el) el.classList.toggle("overlap", overlaps.has(id));
+            }
+
+            function linkOverlap(a, b) {
+                if (!overlaps.has(a)) overlaps.set(a, new Set());
+                overlaps.get(a).add(b);
+            }
+
+            // Re-pairs one piece with what it is stacked on now, looking only at
+            // the hash cells under its box
+            function updateOverlaps(p) {
+                const before = overlaps.get(p.id);
+                overlaps.delete(p.id);
+                (before || []).forEach(other => {
+                    const set = overlaps.get(other);
+                    set.delete(p.id);
+                    if (!set.size) overlaps.delete(other);
+                    markOverlap(other);
+                });
+
+                const s = pieceSize(p);
+                queryRect(p.x, p.y, p.x + s.w, p.y + s.h).forEach(id => {
+                    if (id === p.id || !stacked(p, pieces.get(id))) return;
+                    linkOverlap(p.id, id);
+                    linkOverlap(id, p.id);
+                    markOverlap(id);
+                });
+                markOverlap(p.id);
+            }
+
+            // Add or move a piece in the model and keep its element in sync
+            function setPiece(p) {
+                const old = pieces.get(p.id);
+                if (old) unindexPiece(old);
+                pieces.set(p.id, p);
+                indexPiece(p);
+                updateOverlaps(p);
+
+                const el = elements.get(p.id);
+                if (el) {
+                    el.style.left = p.x + "px";
+                    el.style.top = p.y + "px";
+                }
+            }
+
+            // -----------------------------
+            //  VIEWPORT
+            // -----------------------------
+            function toWorld(clientX, clientY) {
+                const r = canvas.getBoundingClientRect();
+                return {
+                    x: view.x + (clientX - r.left) / view.scale,
+                    y: view.y + (clientY - r.top) / view.scale,
+                };
+            }
+
+            function materialize(p, parent) {
+                const el = document.createElement("div");
+                el.className = "piece";
+                el.id = p.id;
+                el.style.left = p.x + "px";
+                el.style.top = p.y + "px";
+                el.textContent = p.label;
+
+                // Tag vertical dash for smaller size
+                if (p.label === "|") {
+                    el.classList.add("vertical-dash");
+                }
+                if (selection.has(p.id)) {
+                    el.classList.add("selected");
+                }
+                if (overlaps.has(p.id)) {
+                    el.classList.add("overlap");
+                }
+
+                parent.appendChild(el);
+                makeDraggable(el);
+                elements.set(p.id, el);
+                return el;
+            }
+
+            // Materialize what intersects the viewport and drop the rest
+            function cull() {
+                world.style.transform =
+                    "translate(" + (-view.x * view.scale) + "px," + (-view.y * view.scale) + "px) " +
+                    "scale(" + view.scale + ")";
+
+                const margin = 100 / view.scale;
+                const visible = queryRect(
+                    view.x - margin,
+                    view.y - margin,
+                    view.x + canvas.clientWidth / view.scale + margin,
+                    view.y + canvas.clientHeight / view.scale + margin,
+                );
+
+                for (const [id, el] of elements) {
+                    if (!visible.has(id) && !dragging.has(id)) {
+                        el.remove();
+                        elements.delete(id);
+                    }
+                }
+                const fragment = document.createDocumentFragment();
+                visible.forEach(id => {
+                    if (!elements.has(id)) materialize(pieces.get(id), fragment);
+                });
+                world.appendChild(fragment);
+
+                drawGrid();
+                document.getElementById("view-status").textContent =
+                    Math.round(view.scale * 100) + "% · " + elements.size + "/" + pieces.size + " drawn" +
+                    (overlaps.size ? " · " + overlaps.size + " stacked" : "");
+                saveView();
+            }
+
+            let cullQueued = false;
+            function refreshViewport() {
+                if (cullQueued) return;
+                cullQueued = true;
+                requestAnimationFrame(() => {
+                    cullQueued = false;
+                    cull();
+                });
+            }
+
+            function zoomAt(clientX, clientY, factor) {
+                const anchor = toWorld(clientX, clientY);
+                const r = canvas.getBoundingClientRect();
+                view.scale = Math.min(4, Math.max(0.05, view.scale * factor));
+                view.x = anchor.x - (clientX - r.left) / view.scale;
+                view.y = anchor.y - (clientY - r.top) / view.scale;
+                refreshViewport();
+            }
+
+            function zoomToFit() {
+                if (!pieces.size) return;
+                let x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+                pieces.forEach(p => {
+                    const s = pieceSize(p);
+                    x0 = Math.min(x0, p.x); y0 = Math.min(y0, p.y);
+                    x1 = Math.max(x1, p.x + s.w); y1 = Math.max(y1, p.y + s.h);
+                });
+                const pad = 40;
+                view.scale = Math.min(4, Math.max(0.05, Math.min(
+                    canvas.clientWidth / (x1 - x0 + 2 * pad),
+                    canvas.clientHeight / (y1 - y0 + 2 * pad),
+                )));
+                view.x = x0 - pad;
+                view.y = y0 - pad;
+                refreshViewport();
+            }
+
+            canvas.addEventListener("wheel", e => {
+                e.preventDefault();
+                zoomAt(e.clientX, e.clientY, Math.exp(-e.deltaY * 0.0015));
+            }, {passive: false});
+
+            function zoomCenter(factor) {
+                const r = canvas.getBoundingClientRect();
+                zoomAt(r.left + r.width / 2, r.top + r.height / 2, factor);
+            }
+
+            document.getElementById("zoom-in").addEventListener("click", () => zoomCenter(1.25));
+            document.getElementById("zoom-out").addEventListener("click", () => zoomCenter(0.8));
+            document.getElementById("zoom-fit").addEventListener("click", zoomToFit);
+            canvas.addEventListener("contextmenu", e => e.preventDefault());
+
+            // -----------------------------
+            //  SNAPPING
+            // -----------------------------
+            const GRID = 24;            // grid pitch, world px
+            const GUIDE_PX = 8;         // screen px within which centers align
+            const GUIDE_RANGE = 240;    // world px searched around the dragged piece
+            const SNAP_KEY = "lewis-builder-snap";
+            const guideX = document.getElementById("guide-x");
+            const guideY = document.getElementById("guide-y");
+            const snap = {grid: false, guides: true};
+            try {
+                Object.assign(snap, JSON.parse(sessionStorage.getItem(SNAP_KEY)) || {});
+            } catch (err) {}
+
+            ["grid", "guides"].forEach(name => {
+                const box = document.getElementById("snap-" + name);
+                box.checked = snap[name];
+                box.addEventListener("change", () => {
+                    snap[name] = box.checked;
+                    try {
+                        sessionStorage.setItem(SNAP_KEY, JSON.stringify(snap));
+                    } catch (err) {}
+                    drawGrid();
+                });
+            });
+
+            function drawGrid() {
+                if (!snap.grid) {
+                    canvas.style.backgroundImage = "";
+                    return;
+                }
+                const pitch = GRID * view.scale;
+                canvas.style.backgroundImage = "radial-gradient(circle, #d0d7de 1px, transparent 1px)";
+                canvas.style.backgroundSize = pitch + "px " + pitch + "px";
+                canvas.style.backgroundPosition =
+                    (-view.x * view.scale - pitch / 2) + "px " + (-view.y * view.scale - pitch / 2) + "px";
+            }
+
+            function center(p) {
+                const s = pieceSize(p);
+                return {x: p.x + s.w / 2, y: p.y + s.h / 2};
+            }
+
+            // Nearest atom center within reach on each axis. The search box is
+            // fixed in world px, so it touches at most a few hash cells
+            // whatever the number of pieces.
+            function nearestAlignment(c) {
+                const reach = Math.min(GUIDE_PX / view.scale, GUIDE_RANGE);
+                const best = {x: null, y: null, dx: reach, dy: reach};
+                queryRect(c.x - GUIDE_RANGE, c.y - GUIDE_RANGE, c.x + GUIDE_RANGE, c.y + GUIDE_RANGE)
+                    .forEach(id => {
+                        const q = pieces.get(id);
+                        if (dragging.has(id) || q.type !== "atom") return;
+                        const qc = center(q);
+                        if (Math.abs(qc.x - c.x) < best.dx) {
+                            Object.assign(best, {dx: Math.abs(qc.x - c.x), x: qc});
+                        }
+                        if (Math.abs(qc.y - c.y) < best.dy) {
+                            Object.assign(best, {dy: Math.abs(qc.y - c.y), y: qc});
+                        }
+                    });
+                return best;
+            }
+
+            function showGuide(el, x0, y0, x1, y1) {
+                const hair = 1 / view.scale;
+                Object.assign(el.style, {
+                    display: "block",
+                    left: Math.min(x0, x1) + "px",
+                    top: Math.min(y0, y1) + "px",
+                    width: Math.max(hair, Math.abs(x1 - x0)) + "px",
+                    height: Math.max(hair, Math.abs(y1 - y0)) + "px",
+                });
+            }
+
+            function hideGuides() {
+                guideX.style.display = "none";
+                guideY.style.display = "none";
+            }
+
+            // Where a piece's center should go when dropped at c: onto an
+            // atom's axis if one is close (shown as a guide), else the grid
+            function snapCenter(c) {
+                const to = {x: c.x, y: c.y};
+                const near = snap.guides ? nearestAlignment(c) : {x: null, y: null};
+                if (near.x) to.x = near.x.x;
+                else if (snap.grid) to.x = Math.round(c.x / GRID) * GRID;
+                if (near.y) to.y = near.y.y;
+                else if (snap.grid) to.y = Math.round(c.y / GRID) * GRID;
+
+                if (near.x) showGuide(guideX, to.x, to.y, to.x, near.x.y);
+                else guideX.style.display = "none";
+                if (near.y) showGuide(guideY, to.x, to.y, near.y.x, to.y);
+                else guideY.style.display = "none";
+                return to;
+            }
+
+            // -----------------------------
+            //  PIECES
+            // -----------------------------
+
+            // Create a new piece on the canvas
+            function createPiece(label, type, x, y) {
+                const p = {id: newPieceId(), label, type, x, y};
+                if (snap.grid) {
+                    const s = pieceSize(p);
+                    p.x = x = Math.round((x + s.w / 2) / GRID) * GRID - s.w / 2;
+                    p.y = y = Math.round((y + s.h / 2) / GRID) * GRID - s.h / 2;
+                }
+                setPiece(p);
+                materialize(p, world);
+                sendUpdate(p.id, x, y, false, label, type);
+            }
+
+            // Rehydrate the canvas from the server's pieces: index them all, then
+            // draw the visible ones as one fragment. Nothing is sent back, and a
+            // piece without a label or type is passed over rather than stopping the mount.
+            function mountPieces(list) {
+                loadView();
+                list.filter(p => p.label && p.type)
+                    .forEach(p => setPiece({id: p.id, label: p.label, type: p.type, x: p.x, y: p.y}));
+                cull();
+            }
+
+            // Insert every piece of a template and send them as one message
+            function stampTemplate(name, x, y) {
+                const events = TEMPLATES[name].map(t => {
+                    const p = {id: newPieceId(), label: t.label, type: t.type, x: x + t.x, y: y + t.y};
+                    setPiece(p);
+                    return {id: p.id, x: p.x, y: p.y, deleted: false, label: p.label, type: p.type};
+                });
+
+                clearSelection();
+                events.forEach(ev => select(ev.id));
+                cull();
+                sendBatch(events);
+            }
+
+            // Drag from palette → create new piece near the top-left of the view
+            document.querySelectorAll(".palette-item").forEach(item => {
+                item.addEventListener("mousedown", e => {
+                    const x = view.x + 50 / view.scale;
+                    const y = view.y + 50 / view.scale;
+                    if (item.dataset.type === "template") {
+                        stampTemplate(item.dataset.template, x, y);
+                        return;
+                    }
+                    createPiece(
+                        item.dataset.label,
+                        item.dataset.type,
+                        x,
+                        y
+                    );
+                });
+            });
+
+            // -----------------------------
+            //  SELECTION
+            // -----------------------------
+            function select(id) {
+                selection.add(id);
+                const el = elements.get(id);
+                if (el) el.classList.add("selected");
+                updateSelectionCount();
+            }
+
+            function deselect(id) {
+                selection.delete(id);
+                const el = elements.get(id);
+                if (el) el.classList.remove("selected");
+                updateSelectionCount();
+            }
+
+            function clearSelection() {
+                selection.forEach(id => {
+                    const el = elements.get(id);
+                    if (el) el.classList.remove("selected");
+                });
+                selection.clear();
+                updateSelectionCount();
+            }
+
+            function updateSelectionCount() {
+                document.getElementById("selection-count").textContent =
+                    selection.size ? selection.size + " selected" : "";
+            }
+
+            function moveEvent(p) {
+                return {id: p.id, x: p.x, y: p.y, deleted: false};
+            }
+
+            // Empty canvas: left drag draws a rubber band, middle/right/alt drag pans
+            canvas.addEventListener("mousedown", e => {
+                if (e.target !== canvas && e.target !== world) return;
+
+                const r = canvas.getBoundingClientRect();
+                const startX = e.clientX - r.left;
+                const startY = e.clientY - r.top;
+
+                if (e.button !== 0 || e.altKey) {
+                    const startView = {x: view.x, y: view.y};
+                    const pan = ev => {
+                        view.x = startView.x - (ev.clientX - r.left - startX) / view.scale;
+                        view.y = startView.y - (ev.clientY - r.top - startY) / view.scale;
+                        refreshViewport();
+                    };
+                    const stop = () => {
+                        document.removeEventListener("mousemove", pan);
+                        document.removeEventListener("mouseup", stop);
+                    };
+                    document.addEventListener("mousemove", pan);
+                    document.addEventListener("mouseup", stop);
+                    return;
+                }
+
+                if (!e.shiftKey) clearSelection();
+
+                function resize(ev) {
+                    const x = ev.clientX - r.left;
+                    const y = ev.clientY - r.top;
+                    band.style.left = Math.min(x, startX) + "px";
+                    band.style.top = Math.min(y, startY) + "px";
+                    band.style.width = Math.abs(x - startX) + "px";
+                    band.style.height = Math.abs(y - startY) + "px";
+                    band.style.display = "block";
+                }
+
+                function finish(ev) {
+                    document.removeEventListener("mousemove", resize);
+                    document.removeEventListener("mouseup", finish);
+                    if (band.style.display !== "block") return;
+                    band.style.display = "none";
+
+                    const a = toWorld(r.left + startX, r.top + startY);
+                    const b = toWorld(ev.clientX, ev.clientY);
+                    queryRect(
+                        Math.min(a.x, b.x), Math.min(a.y, b.y),
+                        Math.max(a.x, b.x), Math.max(a.y, b.y),
+                    ).forEach(select);
+                }
+
+                document.addEventListener("mousemove", resize);
+                document.addEventListener("mouseup", finish);
+            });
+
+            // Rotate the selection around its centroid
+            function rotateSelection(degrees) {
+                const group = [...selection].map(id => pieces.get(id)).filter(p => p);
+                if (!group.length) return;
+
+                const centers = group.map(p => {
+                    const s = pieceSize(p);
+                    return {x: p.x + s.w / 2, y: p.y + s.h / 2};
+                });
+                const cx = centers.reduce((sum, c) => sum + c.x, 0) / centers.length;
+                const cy = centers.reduce((sum, c) => sum + c.y, 0) / centers.length;
+                const rad = degrees * Math.PI / 180;
+                const cos = Math.cos(rad), sin = Math.sin(rad);
+
+                group.forEach((p, i) => {
+                    const s = pieceSize(p);
+                    const dx = centers[i].x - cx, dy = centers[i].y - cy;
+                    setPiece(Object.assign(p, {
+                        x: cx + dx * cos - dy * sin - s.w / 2,
+                        y: cy + dx * sin + dy * cos - s.h / 2,
+                    }));
+                });
+                refreshViewport();
+                sendBatch(group.map(moveEvent));
+            }
+
+            document.getElementById("rotate-left").addEventListener("click", () => rotateSelection(-15));
+            document.getElementById("rotate-right").addEventListener("click", () => rotateSelection(15));
+
+            // Make a piece draggable; dragging a selected piece moves the group
+            function makeDraggable(el) {
+                let active = false;
+                let startX = 0;
+                let startY = 0;
+                let group = [];
+                let anchor = null;
+
+                el.addEventListener("mousedown", startDrag);
+
+                function startDrag(e) {
+                    if (e.button !== 0) return;
+                    e.stopPropagation();
+                    if (e.shiftKey) {
+                        selection.has(el.id) ? deselect(el.id) : select(el.id);
+                        return;
+                    }
+                    if (!selection.has(el.id)) {
+                        clearSelection();
+                        select(el.id);
+                    }
+
+                    active = true;
+                    startX = e.clientX;
+                    startY = e.clientY;
+                    group = [...selection].map(id => pieces.get(id)).filter(p => p)
+                        .map(p => ({p, x: p.x, y: p.y}));
+                    group.forEach(m => dragging.add(m.p.id));
+                    anchor = group.find(m => m.p.id === el.id);
+
+                    document.addEventListener("mousemove", drag);
+                    document.addEventListener("mouseup", endDrag);
+                }
+
+                // The grabbed piece snaps and the rest of the group follows it
+                function moveGroup(e) {
+                    let dx = (e.clientX - startX) / view.scale;
+                    let dy = (e.clientY - startY) / view.scale;
+                    if (anchor && (dx || dy) && (snap.grid || snap.guides)) {
+                        const c = center({label: anchor.p.label, x: anchor.x + dx, y: anchor.y + dy});
+                        const to = snapCenter(c);
+                        dx += to.x - c.x;
+                        dy += to.y - c.y;
+                    }
+                    group.forEach(m => setPiece(Object.assign(m.p, {x: m.x + dx, y: m.y + dy})));
+                    return dx || dy;
+                }
+
+                function drag(e) {
+                    if (!active) return;
+                    moveGroup(e);
+                }
+
+                function endDrag(e) {
+                    if (!active) return;
+                    active = false;
+
+                    const moved = moveGroup(e);
+                    dragging.clear();
+                    hideGuides();
+                    if (moved) {
+                        if (group.length === 1) {
+                            const p = group[0].p;
+                            sendUpdate(p.id, p.x, p.y, false);
+                        } else {
+                            sendBatch(group.map(m => moveEvent(m.p)));
+                        }
+                    }
+                    refreshViewport();
+
+                    document.removeEventListener("mousemove", drag);
+                    document.removeEventListener("mouseup", endDrag);
+                }
+            }
+
+            mountPieces(""" + mount_json + """);
+
+            // Outgoing events wait here, one per piece, until the server's rate allows a post
+            const THROTTLE = """,
+        """;
+            const outbox = new Map();
+            let holdUntil = Date.now() + THROTTLE.retry_after_ms;
+            let flushTimer = null;
+
+            function queueEvent(ev) {
+                const waiting = outbox.get(ev.id);
+                if (!waiting || waiting.deleted || ev.deleted) {
+                    outbox.set(ev.id, ev);
+                    return;
+                }
+                // A move after a create keeps the create's label and type
+                for (const key in ev) {
+                    if (ev[key] !== null) waiting[key] = ev[key];
+                }
+            }
+
+            function scheduleFlush() {
+                if (flushTimer !== null) return;
+                flushTimer = setTimeout(flushOutbox, Math.max(0, holdUntil - Date.now()));
+            }
+
+            function flushOutbox() {
+                flushTimer = null;
+                const events = [...outbox.values()];
+                outbox.clear();
+                holdUntil = Date.now() + THROTTLE.interval_ms;
+                window.parent.postMessage(
+                    {
+                        "type": "streamlit:setComponentValue",
+                        "value": {events}
+                    },
+                    "*"
+                );
+            }
+
+            // Send updates to Streamlit
+            function sendUpdate(id, x, y, deleted, label=null, type=null) {
+                queueEvent({id, x, y, deleted, label, type});
+                scheduleFlush();
+            }
+
+            // Send many piece events as one message, applied in one step
+            function sendBatch(events) {
+                if (!events.length) return;
+                events.forEach(queueEvent);
+                scheduleFlush();
+            }
+
+            // The server is holding events back; an empty post collects them once it allows
+            if (THROTTLE.pending) scheduleFlush();
+        </script>
+        """
+    )
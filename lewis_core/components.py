@@ -0,0 +1,186 @@
+"""Splits the drawn graph into molecules and validates each one on its own.
+
+Components are tracked with a union-find that follows every batch of piece
+changes: new bonds union two components, while a lost bond or atom only
+rebuilds the component it belonged to. Summaries are cached per component
+and recomputed only for components whose structure changed, so editing one
+molecule leaves the analysis of the others untouched. Ring perception is
+cached on top of that and only reruns for a component whose bonds changed;
+moving electrons around re-checks aromaticity on the cached rings. The
+reaction balance (see reactions.py) is fed the same way: only molecules
+that were re-validated, split, merged or moved are read again.
+"""
+
+from collections import Counter
+
+from .graph import PieceGraph
+from .pieces import STRICT_OCTET, VALENCE_ELECTRONS, hill_formula
+from .reactions import ReactionBalance
+from .rings import aromatic_rings, smallest_rings
+
+
+def summarize_component(graph, atoms, rings=None):
+    """Validation summary of the molecule made of ``atoms``.
+
+    ``rings`` is the molecule's SSSR when the caller already has it.
+    """
+    if rings is None:
+        rings = smallest_rings(graph, atoms)
+    counts = Counter(graph.atoms[atom] for atom in atoms)
+    expected = sum(VALENCE_ELECTRONS.get(element, 0) for element in counts.elements())
+    drawn = 0
+    charge = 0
+    problems = []
+
+    for atom in sorted(atoms):
+        element = graph.atoms[atom]
+        bonded = sum(order for _, order in graph.neighbors(atom))
+        lone = graph.lone_electrons(atom)
+        drawn += bonded + lone
+        charge += VALENCE_ELECTRONS.get(element, 0) - lone - bonded
+
+        shell = 2 * bonded + lone
+        target = 2 if element == "H" else 8
+        if shell < target:
+            problems.append(f"{element} has {shell} electrons (needs {target})")
+        elif shell > target and element in STRICT_OCTET:
+            problems.append(f"{element} has {shell} electrons (max {target})")
+
+    return {
+        "formula": hill_formula(counts),
+        "atoms": len(atoms),
+        "electrons": drawn,
+        "expected": expected,
+        "charge": charge,
+        "problems": problems,
+        "rings": [
+            {"atoms": ring, "size": len(ring), "aromatic": aromatic}
+            for ring, aromatic in zip(rings, aromatic_rings(graph, rings))
+        ],
+    }
+
+
+class ComponentTracker:
+    """Incremental connected components over a ``PieceGraph``."""
+
+    def __init__(self, pieces=None):
+        self.graph = PieceGraph()
+        self.parent = {}
+        self.members = {}
+        self.summaries = {}
+        self.dirty = set()
+        # SSSR per component root, and the roots whose bonds changed since
+        self.rings = {}
+        self.stale_rings = set()
+        # Reaction scheme totals, and the roots it has to re-read
+        self.reactions = ReactionBalance()
+        self.revised = set()
+        if pieces:
+            self.update([(pid, None, piece) for pid, piece in pieces.items()])
+
+    def find(self, atom):
+        parent = self.parent
+        while parent[atom] != atom:
+            parent[atom] = parent[parent[atom]]
+            atom = parent[atom]
+        return atom
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if len(self.members[ra]) < len(self.members[rb]):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.members[ra] |= self.members.pop(rb)
+        self.summaries.pop(rb, None)
+        self.revised.add(rb)
+        self.dirty.discard(rb)
+        self.dirty.add(ra)
+        # A bond between two molecules closes no ring: their rings just add up
+        rings = self.rings.pop(ra, []) + self.rings.pop(rb, [])
+        if rings:
+            self.rings[ra] = rings
+        if rb in self.stale_rings:
+            self.stale_rings.discard(rb)
+            self.stale_rings.add(ra)
+        return ra
+
+    def _rebuild(self, roots):
+        """Re-splits the components that lost a bond or an atom."""
+        atoms = set()
+        for root in roots:
+            atoms |= self.members.pop(root)
+            self.summaries.pop(root, None)
+            self.revised.add(root)
+            self.dirty.discard(root)
+            self.rings.pop(root, None)
+            self.stale_rings.discard(root)
+        atoms = [atom for atom in atoms if atom in self.graph.atoms]
+        for atom in atoms:
+            self.parent[atom] = atom
+            self.members[atom] = {atom}
+            self.dirty.add(atom)
+            self.stale_rings.add(atom)
+        for atom in atoms:
+            for neighbor, _ in self.graph.neighbors(atom):
+                self.union(atom, neighbor)
+
+    def update(self, changes):
+        """Feeds ``(pid, before, after)`` changes; returns the graph delta."""
+        self.reactions.update_arrows(changes)
+        delta = self.graph.update(changes)
+        if delta:
+            self._restructure(delta)
+        # Moved atoms leave the structure alone but may carry a molecule across an arrow
+        parent = self.parent
+        self.revised.update(self.find(pid) for pid, _, after in changes if after is not None and pid in parent)
+        return delta
+
+    def _restructure(self, delta):
+        """Follows the bonds and atoms a graph update gained or lost."""
+        broken = {self.find(atom) for atom in delta.removed if atom in self.parent}
+        broken.update(
+            self.find(atom)
+            for pair in delta.unlinked
+            for atom in pair
+            if atom in self.parent
+        )
+        for atom in delta.added:
+            self.parent[atom] = atom
+            self.members[atom] = {atom}
+            self.dirty.add(atom)
+        self._rebuild(broken)
+        for atom in delta.removed:
+            self.parent.pop(atom, None)
+        for a, b in delta.linked:
+            root = self.find(a)
+            if root == self.find(b):
+                # A new bond inside one molecule closes a ring
+                self.stale_rings.add(root)
+            self.union(a, b)
+        self.dirty.update(self.find(atom) for atom in delta.touched if atom in self.graph.atoms)
+
+    def components(self):
+        """Returns ``[(root, atoms, summary), ...]``, largest molecule first.
+
+        Only components changed since the last call are re-validated, and
+        only those whose bonds changed get their rings perceived again.
+        """
+        for root in self.stale_rings:
+            if root in self.members:
+                self.rings[root] = smallest_rings(self.graph, self.members[root])
+        self.stale_rings.clear()
+        for root in self.dirty:
+            if root in self.members:
+                self.summaries[root] = summarize_component(
+                    self.graph, self.members[root], self.rings.get(root, [])
+                )
+        self.revised |= self.dirty
+        self.dirty.clear()
+        self.reactions.refresh(self, self.revised)
+        self.revised.clear()
+        return sorted(
+            ((root, atoms, self.summaries[root]) for root, atoms in self.members.items()),
+            key=lambda item: (-len(item[1]), item[0]),
+        )
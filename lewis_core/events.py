@@ -0,0 +1,117 @@
+"""Server-side ingestion of the piece events sent by sendUpdate()."""
+
+import json
+
+from .pieces import is_piece
+
+
+def parse_payload(raw):
+    """Decodes the JSON value posted by the component, or returns None."""
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_events(payload):
+    """Yields the single events of a payload.
+
+    A payload is either one event dict or a bulk message of the form
+    ``{"events": [...]}``, which is applied in one step.
+    """
+    if isinstance(payload, list):
+        events = payload
+    elif isinstance(payload, dict) and "events" in payload:
+        events = payload["events"]
+    else:
+        events = [payload]
+    for event in events:
+        if isinstance(event, dict) and event.get("id"):
+            yield event
+
+
+def apply_event(pieces, data):
+    """Applies one event to ``pieces``.
+
+    Returns ``(pid, before, after)`` where either side is None for a create
+    or a delete, or None when the event changed nothing. An event that would
+    leave an incomplete piece (a create without label or type, a position
+    that is not a number) is ignored.
+    """
+    pid = data["id"]
+    before = pieces.get(pid)
+
+    if data.get("deleted"):
+        if before is None:
+            return None
+        del pieces[pid]
+        return pid, before, None
+
+    previous = before or {}
+    after = {
+        "x": data.get("x"),
+        "y": data.get("y"),
+        "label": data.get("label") or previous.get("label"),
+        "type": data.get("type") or previous.get("type"),
+    }
+    if not is_piece(after):
+        return None
+    pieces[pid] = after
+    return pid, before, after
+
+
+def apply_events(pieces, payload):
+    """Applies a single or bulk payload and returns the list of changes."""
+    changes = []
+    for event in iter_events(payload):
+        change = apply_event(pieces, event)
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+def piece_events(pieces):
+    """Turns ``{pid: piece}`` into one bulk message creating or moving them."""
+    return {
+        "events": [
+            dict(piece, id=pid, deleted=False)
+            for pid, piece in pieces.items()
+        ]
+    }
+
+
+def record_payload(state, payload):
+    """Appends ``payload`` to ``state["recorder"]``, if one is set.
+
+    Payloads without events (the canvas' empty posts that collect what the
+    throttle holds) are not recorded.
+    """
+    recorder = state.get("recorder")
+    if recorder is not None and next(iter_events(payload), None) is not None:
+        recorder.record(payload, state.get("session_id"))
+
+
+def ingest(state, payload, record=True):
+    """The server-side ingestion path for one component value.
+
+    Applies the payload to ``state["pieces"]`` and keeps the derived state
+    stored next to it (the live summary and the component tracker) in step
+    with the changes. ``state["revision"]`` counts the ingests that changed
+    something, for caches of what is built from the pieces.
+    When ``state["recorder"]`` is set the payload is recorded first, unless
+    ``record`` is False because the caller recorded what it received
+    before throttling it.
+    ``state`` is ``st.session_state`` in the app, or any dict elsewhere.
+    """
+    if record:
+        record_payload(state, payload)
+    changes = apply_events(state["pieces"], payload)
+    if changes:
+        state["revision"] = state.get("revision", 0) + 1
+    summary = state.get("summary")
+    if summary is not None and changes:
+        summary.update(changes)
+    tracker = state.get("components")
+    if tracker is not None and changes:
+        tracker.update(changes)
+    return changes
@@ -0,0 +1,411 @@
+"""Grades builder canvases against answer-key structures.
+
+A submission and a key are compared as graphs, so layout and piece ids do
+not matter. Keys are screened by cheap invariants first (formula, degree
+sequence, Weisfeiler-Lehman hash); only survivors go through the
+backtracking isomorphism search, whose candidates are restricted to atoms
+with the same refined color. Identical submissions are graded once and
+served from a cache afterwards.
+
+Batch mode::
+
+    python -m lewis_core.grading keys.json submissions.jsonl -o grades.jsonl -j 8
+
+``keys.json`` maps key names to a SMILES string, molfile text or a pieces
+dict; every line of ``submissions.jsonl`` is ``{"id": ..., "pieces": {...}}``.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from .graph import PieceGraph
+from .pieces import BOND_ORDERS, VALENCE_ELECTRONS, hill_formula
+
+WL_ROUNDS = 4
+# Backtracking steps allowed per comparison before giving up
+SEARCH_LIMIT = 20000
+# Skeleton mappings scored when looking for the best partial credit
+PARTIAL_MAPPINGS = 200
+# Canonical hashes whose grades a Grader keeps, least recently used dropped first
+CACHE_SIZE = 4096
+
+_BOND_NAMES = {1: "single", 2: "double", 3: "triple"}
+
+
+def _digest(value):
+    return hashlib.blake2b(repr(value).encode(), digest_size=8).hexdigest()
+
+
+class Structure:
+    """Layout-free Lewis structure: elements, bond orders and lone electrons."""
+
+    def __init__(self, elements, bonds, lone, stray_bonds=0, stray_electrons=0):
+        self.elements = list(elements)
+        self.lone = list(lone)
+        self.adjacency = [{} for _ in self.elements]
+        for a, b, order in bonds:
+            if a == b:
+                continue
+            # Two glyphs between the same atoms add up, e.g. "-" + "-" is "="
+            order = self.adjacency[a].get(b, 0) + order
+            self.adjacency[a][b] = self.adjacency[b][a] = order
+        self.stray_bonds = stray_bonds
+        self.stray_electrons = stray_electrons
+
+        self.charges = [
+            VALENCE_ELECTRONS.get(element, 0) - self.lone[i] - sum(self.adjacency[i].values())
+            for i, element in enumerate(self.elements)
+        ]
+        self.formula = hill_formula(Counter(self.elements))
+        self.degree_sequence = tuple(sorted(
+            (element, len(self.adjacency[i])) for i, element in enumerate(self.elements)
+        ))
+        self.skeleton_colors = self._refine(full=False)
+        self.colors = self._refine(full=True)
+        self.canonical_hash = _digest((self.formula, sorted(self.colors)))
+
+    @classmethod
+    def from_pieces(cls, pieces):
+        graph = PieceGraph(pieces)
+        index = {pid: i for i, pid in enumerate(graph.atoms)}
+        bonds = [(index[a], index[b], order) for a, b, order in graph.bonds.values()]
+        stray_bonds = sum(
+            1 for pid, piece in pieces.items()
+            if piece.get("type") == "bond" and piece.get("label") in BOND_ORDERS
+            and pid not in graph.bonds
+        )
+        stray_electrons = sum(1 for owner in graph.owners.values() if owner is None)
+        return cls(
+            list(graph.atoms.values()),
+            bonds,
+            [graph.lone_electrons(pid) for pid in graph.atoms],
+            stray_bonds,
+            stray_electrons,
+        )
+
+    @classmethod
+    def from_molecule(cls, mol):
+        mol.add_explicit_hydrogens()
+        return cls(mol.elements, mol.bonds, [2 * pairs for pairs in mol.lone_pairs()])
+
+    @classmethod
+    def from_source(cls, source):
+        """Builds a key from SMILES, molfile text or a pieces dict."""
+        # The importer brings numpy along; only key building needs it
+        from .importer import parse_molfile, parse_smiles
+
+        if isinstance(source, dict):
+            return cls.from_pieces(source)
+        if "M  END" in source or "V2000" in source:
+            return cls.from_molecule(parse_molfile(source))
+        return cls.from_molecule(parse_smiles(source))
+
+    def _refine(self, full):
+        """Weisfeiler-Lehman colors; ``full`` also sees orders, lone pairs and charges."""
+        if full:
+            colors = [
+                _digest((e, self.lone[i], self.charges[i])) for i, e in enumerate(self.elements)
+            ]
+        else:
+            colors = [_digest(e) for e in self.elements]
+        classes = len(set(colors))
+        for _ in range(WL_ROUNDS):
+            colors = [
+                _digest((colors[i], sorted(
+                    (order if full else 0, colors[j]) for j, order in self.adjacency[i].items()
+                )))
+                for i in range(len(colors))
+            ]
+            if len(set(colors)) == classes:
+                break
+            classes = len(set(colors))
+        return colors
+
+
+# -----------------------------
+#  ISOMORPHISM
+# -----------------------------
+
+def _search_order(structure, colors):
+    """Visits rare colors first, then grows breadth-first along bonds."""
+    frequency = Counter(colors)
+    remaining = sorted(range(len(colors)), key=lambda i: (frequency[colors[i]], i))
+    seen, order = set(), []
+    for start in remaining:
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = [start]
+        while queue:
+            atom = queue.pop(0)
+            order.append(atom)
+            for neighbor in sorted(structure.adjacency[atom], key=lambda j: frequency[colors[j]]):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return order
+
+
+def mappings(sub, key, full=True, limit=SEARCH_LIMIT):
+    """Yields atom mappings ``sub -> key`` preserving the compared labels.
+
+    With ``full`` bond orders, lone electrons and charges must match too;
+    otherwise only elements and connectivity (the skeleton) are compared.
+    """
+    if len(sub.elements) != len(key.elements):
+        return
+    sub_colors = sub.colors if full else sub.skeleton_colors
+    key_colors = key.colors if full else key.skeleton_colors
+    if sorted(sub_colors) != sorted(key_colors):
+        return
+
+    by_color = defaultdict(list)
+    for atom, color in enumerate(key_colors):
+        by_color[color].append(atom)
+    order = _search_order(sub, sub_colors)
+    mapping, used = {}, set()
+    budget = [limit]
+
+    def extend(depth):
+        if depth == len(order):
+            yield dict(mapping)
+            return
+        atom = order[depth]
+        anchor = next((n for n in sub.adjacency[atom] if n in mapping), None)
+        pool = key.adjacency[mapping[anchor]] if anchor is not None else by_color[sub_colors[atom]]
+        for candidate in list(pool):
+            budget[0] -= 1
+            if budget[0] < 0:
+                return
+            if candidate in used or key_colors[candidate] != sub_colors[atom]:
+                continue
+            if not _consistent(sub, key, atom, candidate, mapping, full):
+                continue
+            mapping[atom] = candidate
+            used.add(candidate)
+            yield from extend(depth + 1)
+            del mapping[atom]
+            used.discard(candidate)
+
+    yield from extend(0)
+
+
+def _consistent(sub, key, atom, candidate, mapping, full):
+    mapped = 0
+    for neighbor, order in sub.adjacency[atom].items():
+        if neighbor in mapping:
+            image = key.adjacency[candidate].get(mapping[neighbor])
+            if image is None or (full and image != order):
+                return False
+            mapped += 1
+    # No extra bonds between the candidate and already-mapped atoms
+    images = set(mapping.values())
+    return mapped == sum(1 for n in key.adjacency[candidate] if n in images)
+
+
+def is_isomorphic(a, b):
+    """True when two structures are the same Lewis structure."""
+    return a.canonical_hash == b.canonical_hash and next(mappings(a, b), None) is not None
+
+
+# -----------------------------
+#  GRADING
+# -----------------------------
+
+def _signed(charge):
+    return f"{charge:+d}" if charge else "0"
+
+
+def _differences(sub, key, mapping):
+    """Bond-order, lone-pair and formal-charge errors under one mapping."""
+    details = []
+    wrong_bonds = 0
+    bonds = 0
+    for a in range(len(sub.elements)):
+        for b, order in sub.adjacency[a].items():
+            if b < a:
+                continue
+            bonds += 1
+            expected = key.adjacency[mapping[a]][mapping[b]]
+            if expected != order:
+                wrong_bonds += 1
+                details.append(
+                    f"{sub.elements[a]}–{sub.elements[b]} bond should be "
+                    f"{_BOND_NAMES.get(expected, expected)}, drawn as {_BOND_NAMES.get(order, order)}"
+                )
+
+    wrong_atoms = 0
+    for atom, element in enumerate(sub.elements):
+        drawn, expected = sub.lone[atom] // 2, key.lone[mapping[atom]] // 2
+        charge, expected_charge = sub.charges[atom], key.charges[mapping[atom]]
+        if drawn != expected or charge != expected_charge:
+            wrong_atoms += 1
+        if drawn < expected:
+            details.append(f"{element} is missing {expected - drawn} lone pair(s)")
+        elif drawn > expected:
+            details.append(f"{element} has {drawn - expected} extra lone pair(s)")
+        if charge != expected_charge:
+            details.append(
+                f"{element} formal charge is {_signed(charge)}, expected {_signed(expected_charge)}"
+            )
+
+    score = 0.5
+    score += 0.25 * (1 - wrong_bonds / bonds if bonds else 1)
+    score += 0.25 * (1 - wrong_atoms / len(sub.elements))
+    return round(score, 3), details
+
+
+def compare(sub, key):
+    """Scores one submission against one key; returns ``(score, match, details)``."""
+    if sub.formula != key.formula:
+        drawn, expected = Counter(sub.elements), Counter(key.elements)
+        missing = hill_formula(expected - drawn)
+        extra = hill_formula(drawn - expected)
+        details = [f"missing atoms: {missing}"] if missing else []
+        details += [f"extra atoms: {extra}"] if extra else []
+        return 0.0, False, details
+
+    if sub.canonical_hash == key.canonical_hash and next(mappings(sub, key), None) is not None:
+        return 1.0, True, []
+
+    if sub.degree_sequence != key.degree_sequence:
+        return 0.25, False, ["atoms are connected differently from the answer key"]
+
+    best = None
+    for count, mapping in enumerate(mappings(sub, key, full=False)):
+        score, details = _differences(sub, key, mapping)
+        if best is None or score > best[0]:
+            best = (score, details)
+        if count + 1 >= PARTIAL_MAPPINGS:
+            break
+    if best is None:
+        return 0.25, False, ["atoms are connected differently from the answer key"]
+    return best[0], False, best[1]
+
+
+class Grader:
+    """Grades submissions against a fixed set of answer keys.
+
+    ``keys`` maps key names to a ``Structure`` or anything
+    ``Structure.from_source`` accepts. Grades are cached per canonical hash
+    for up to ``cache_size`` hashes; glyphs that connect to nothing are not
+    part of the structure, so they are reported after the cache.
+    """
+
+    def __init__(self, keys, cache_size=CACHE_SIZE):
+        self.keys = []
+        self.by_formula = defaultdict(list)
+        for name, source in keys.items():
+            key = source if isinstance(source, Structure) else Structure.from_source(source)
+            self.keys.append((name, key))
+            self.by_formula[key.formula].append((name, key))
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def grade(self, submission):
+        """Grades a pieces dict (or ``Structure``) and returns a result dict."""
+        sub = submission if isinstance(submission, Structure) else Structure.from_pieces(submission)
+        result = self._cached(sub)
+        result = dict(result, details=list(result["details"]))
+        if sub.stray_bonds:
+            result["details"].append(f"{sub.stray_bonds} bond glyph(s) do not connect two atoms")
+        if sub.stray_electrons:
+            result["details"].append(f"{sub.stray_electrons} electron glyph(s) are not next to an atom")
+        return result
+
+    def _cached(self, sub):
+        entries = self._cache.get(sub.canonical_hash)
+        if entries is None:
+            entries = self._cache[sub.canonical_hash] = []
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(sub.canonical_hash)
+            for representative, result in entries:
+                if next(mappings(sub, representative), None) is not None:
+                    return result
+        result = self._grade(sub)
+        entries.append((sub, result))
+        return result
+
+    def _grade(self, sub):
+        # Keys with another formula can only score 0; without a same-formula
+        # key, report against the key whose atoms differ the least
+        candidates = self.by_formula.get(sub.formula)
+        if not candidates and self.keys:
+            drawn = Counter(sub.elements)
+            candidates = [min(self.keys, key=lambda item: sum(
+                ((drawn - Counter(item[1].elements)) + (Counter(item[1].elements) - drawn)).values()
+            ))]
+        best = None
+        for name, key in candidates:
+            score, match, details = compare(sub, key)
+            if best is None or score > best["score"]:
+                best = {"key": name, "score": score, "match": match, "details": details}
+            if match:
+                break
+        if best is None:
+            best = {"key": None, "score": 0.0, "match": False, "details": ["no answer keys"]}
+        return best
+
+
+# -----------------------------
+#  BATCH MODE
+# -----------------------------
+
+_worker_grader = None
+
+
+def _init_worker(keys):
+    global _worker_grader
+    _worker_grader = Grader(keys)
+
+
+def _grade_in_worker(pieces):
+    return _worker_grader.grade(pieces)
+
+
+def grade_batch(submissions, keys, workers=None, chunksize=64):
+    """Grades ``(submission_id, pieces)`` pairs on a process pool.
+
+    Each worker builds the keys once and keeps its own result cache.
+    Yields ``(submission_id, result)`` in input order.
+    """
+    submissions = list(submissions)
+    ids = [sid for sid, _ in submissions]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(keys,)) as pool:
+        results = pool.map(_grade_in_worker, [p for _, p in submissions], chunksize=chunksize)
+        yield from zip(ids, results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("keys", help="JSON file mapping key names to SMILES/molfile/pieces")
+    parser.add_argument("submissions", help="JSON-lines file of {id, pieces} records")
+    parser.add_argument("-o", "--output", help="write JSON-lines results here (default stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes")
+    args = parser.parse_args(argv)
+
+    with open(args.keys, encoding="utf-8") as fh:
+        keys = json.load(fh)
+    with open(args.submissions, encoding="utf-8") as fh:
+        submissions = [
+            (record["id"], record["pieces"])
+            for record in map(json.loads, fh)
+        ]
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for sid, result in grade_batch(submissions, keys, args.workers):
+            out.write(json.dumps(dict(result, id=sid)) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Infers the molecular graph a student drew from the loose canvas pieces.
+
+Bond glyphs and electron glyphs are free-floating pieces, so the graph is
+recovered from geometry: a bond glyph joins the two closest atoms lying on
+opposite sides of it, and an electron glyph belongs to the nearest atom on
+the side it is drawn for ("••" above or below a symbol, ":" and "|" to its
+left or right).
+
+``PieceGraph`` can be built once from a pieces dict or kept up to date with
+the ``(pid, before, after)`` changes returned by ``apply_events``; an update
+only re-examines glyphs near the pieces that changed.
+"""
+
+import math
+
+from .pieces import BOND_ORDERS, ELECTRON_GLYPHS, piece_center
+from .spatial import LazyKDTree, SpatialHash
+
+# How far from a bond glyph's center its atoms may sit
+BOND_REACH_PX = 95.0
+# How far from an atom an electron glyph may sit and still belong to it,
+# measured towards the atom and sideways from that direction
+ELECTRON_REACH_PX = 70.0
+ELECTRON_SIDE_PX = 45.0
+# Axis pointing from each electron glyph to its atom: 0 is x, 1 is y
+ELECTRON_AXES = {"••": 1, ":": 0, "|": 0}
+# Minimum angle between the two atoms of a bond, seen from the glyph
+MIN_BOND_ANGLE = math.radians(120)
+
+
+class GraphDelta:
+    """Structural effect of one ``PieceGraph.update`` call.
+
+    ``touched`` holds atoms whose own bonds, electrons or label changed,
+    ``linked``/``unlinked`` the atom pairs that gained or lost a bond and
+    ``added``/``removed`` the atoms that appeared or disappeared.
+    """
+
+    def __init__(self):
+        self.touched = set()
+        self.linked = []
+        self.unlinked = []
+        self.added = set()
+        self.removed = set()
+
+    def __bool__(self):
+        return bool(self.touched or self.linked or self.unlinked or self.added or self.removed)
+
+
+class PieceGraph:
+    """Atoms, bonds and electron glyphs recovered from ``pieces``.
+
+    ``atoms`` maps atom ids to their element, ``centers`` every piece id to
+    its glyph center, ``bonds`` a bond glyph id to ``(atom_a, atom_b,
+    order)`` and ``owners`` an electron glyph id to its atom id (or None
+    when it floats alone). ``tallies`` holds the electrons drawn next to
+    each atom and is kept current as glyphs change hands.
+    """
+
+    def __init__(self, pieces=None):
+        self.atoms = {}
+        self.labels = {}
+        self.centers = {}
+        self.bonds = {}
+        self.owners = {}
+        self.atom_bonds = {}
+        self.atom_electrons = {}
+        self.tallies = {}
+        self.atom_index = SpatialHash(BOND_REACH_PX)
+        # Electron ownership queries go to a k-d tree rebuilt after atoms move
+        self.atom_tree = LazyKDTree()
+        self.bond_index = SpatialHash(BOND_REACH_PX)
+        self.electron_index = SpatialHash(ELECTRON_REACH_PX)
+        if pieces:
+            self.update([(pid, None, piece) for pid, piece in pieces.items()])
+
+    def adjacency(self):
+        """Returns ``{atom: [(neighbor, order), ...]}``."""
+        adjacency = {pid: [] for pid in self.atoms}
+        for a, b, order in self.bonds.values():
+            adjacency[a].append((b, order))
+            adjacency[b].append((a, order))
+        return adjacency
+
+    def neighbors(self, atom):
+        """Yields ``(neighbor, order)`` for the bonds of one atom."""
+        for glyph in self.atom_bonds.get(atom, ()):
+            a, b, order = self.bonds[glyph]
+            yield (b if a == atom else a), order
+
+    def lone_electrons(self, atom):
+        """Electrons drawn as glyphs next to an atom."""
+        return self.tallies.get(atom, 0)
+
+    # -----------------------------
+    #  INCREMENTAL UPDATES
+    # -----------------------------
+    def update(self, changes):
+        """Applies piece changes and returns the resulting ``GraphDelta``."""
+        delta = GraphDelta()
+        rebond, reown = set(), set()
+
+        for pid, before, after in changes:
+            if before is not None and self._kind(before) is not None:
+                self._remove(pid, before, after, rebond, reown, delta)
+            if after is not None and self._kind(after) is not None:
+                self._add(pid, after, before, rebond, reown, delta)
+
+        for glyph in rebond:
+            self._attach_bond(glyph, delta)
+        for glyph in reown:
+            self._attach_electron(glyph, delta)
+        return delta
+
+    @staticmethod
+    def _kind(piece):
+        label = piece.get("label")
+        kind = piece.get("type")
+        if kind == "atom" and label:
+            return kind
+        if kind == "bond" and label in BOND_ORDERS:
+            return kind
+        if kind == "electron" and label in ELECTRON_GLYPHS:
+            return kind
+        return None
+
+    def _nearby(self, x, y, rebond, reown):
+        rebond.update(key for _, key in self.bond_index.query_radius(x, y, BOND_REACH_PX))
+        reown.update(key for _, key in self.electron_index.query_radius(x, y, ELECTRON_REACH_PX))
+
+    def _remove(self, pid, before, after, rebond, reown, delta):
+        kind = self._kind(before)
+        center = self.centers.pop(pid, None)
+        self.labels.pop(pid, None)
+        if kind == "atom":
+            self.atom_index.remove(pid)
+            self.atom_tree.remove(pid)
+            self.atoms.pop(pid, None)
+            rebond.update(self.atom_bonds.get(pid, ()))
+            reown.update(self.atom_electrons.get(pid, ()))
+            if center is not None:
+                self._nearby(*center, rebond, reown)
+            if after is None or self._kind(after) != "atom":
+                delta.removed.add(pid)
+                self.atom_bonds.pop(pid, None)
+                self.atom_electrons.pop(pid, None)
+                self.tallies.pop(pid, None)
+        elif kind == "bond":
+            self.bond_index.remove(pid)
+            rebond.add(pid)
+        else:
+            self.electron_index.remove(pid)
+            reown.add(pid)
+
+    def _add(self, pid, after, before, rebond, reown, delta):
+        kind = self._kind(after)
+        center = piece_center(after)
+        self.centers[pid] = center
+        self.labels[pid] = after["label"]
+        if kind == "atom":
+            if pid not in self.atom_bonds:
+                delta.added.add(pid)
+                self.atom_bonds[pid] = set()
+                self.atom_electrons[pid] = set()
+                self.tallies[pid] = 0
+            elif before is not None and before.get("label") != after["label"]:
+                delta.touched.add(pid)
+            self.atoms[pid] = after["label"]
+            self.atom_index.insert(pid, *center)
+            self.atom_tree.insert(pid, *center)
+            self._nearby(*center, rebond, reown)
+        elif kind == "bond":
+            self.bond_index.insert(pid, *center)
+            rebond.add(pid)
+        else:
+            self.electron_index.insert(pid, *center)
+            reown.add(pid)
+
+    def _attach_bond(self, glyph, delta):
+        old = self.bonds.get(glyph)
+        new = None
+        if glyph in self.bond_index:
+            ends = bond_ends(self.atom_index, *self.centers[glyph])
+            if ends:
+                a, b = sorted(ends)
+                new = (a, b, BOND_ORDERS[self.labels[glyph]])
+        if old == new:
+            return
+
+        if old is not None:
+            a, b, _ = self.bonds.pop(glyph)
+            for atom in (a, b):
+                if atom in self.atom_bonds:
+                    self.atom_bonds[atom].discard(glyph)
+                    delta.touched.add(atom)
+            delta.unlinked.append((a, b))
+        if new is not None:
+            a, b, _ = self.bonds[glyph] = new
+            for atom in (a, b):
+                self.atom_bonds[atom].add(glyph)
+                delta.touched.add(atom)
+            delta.linked.append((a, b))
+
+    def _attach_electron(self, glyph, delta):
+        old = self.owners.get(glyph)
+        new = None
+        if glyph in self.electron_index:
+            new = electron_owner(self.atom_tree, *self.centers[glyph], self.labels[glyph])
+            self.owners[glyph] = new
+        else:
+            self.owners.pop(glyph, None)
+        if old in self.atom_electrons and old != new:
+            self.atom_electrons[old].discard(glyph)
+            self._tally(old)
+            delta.touched.add(old)
+        if new is not None:
+            self.atom_electrons[new].add(glyph)
+            # Also covers a glyph that kept its owner but changed its label
+            if self._tally(new) or old != new:
+                delta.touched.add(new)
+
+    def _tally(self, atom):
+        """Recounts one atom's electrons; returns True if the count changed."""
+        # A glyph deleted earlier in the same batch has lost its label but
+        # stays in the set until its own turn in ``update`` detaches it
+        labels = self.labels
+        count = sum(ELECTRON_GLYPHS[labels[e]] for e in self.atom_electrons[atom] if e in labels)
+        changed = self.tallies.get(atom) != count
+        self.tallies[atom] = count
+        return changed
+
+
+def electron_owner(atom_tree, x, y, label):
+    """The atom an electron glyph at (x, y) belongs to, or None.
+
+    Candidates come from a radius query; each is scored by an elliptical
+    distance that allows ``ELECTRON_REACH_PX`` along the glyph's axis and
+    ``ELECTRON_SIDE_PX`` across it, and the lowest score within 1 wins.
+    """
+    axis = ELECTRON_AXES.get(label, 0)
+    best = None
+    for _, atom in atom_tree.query_radius(x, y, ELECTRON_REACH_PX):
+        ax, ay = atom_tree.points[atom]
+        along, across = (ay - y, ax - x) if axis else (ax - x, ay - y)
+        score = math.hypot(along / ELECTRON_REACH_PX, across / ELECTRON_SIDE_PX)
+        if score <= 1 and (best is None or score < best[0]):
+            best = (score, atom)
+    return best and best[1]
+
+
+def bond_ends(atom_index, x, y, reach=BOND_REACH_PX):
+    """The two atoms a bond glyph centered on (x, y) connects, or None."""
+    hits = atom_index.query_radius(x, y, reach)
+    best = None
+    for i, (da, a) in enumerate(hits):
+        ax, ay = atom_index.points[a]
+        for db, b in hits[i + 1:]:
+            if best is not None and da + db >= best[0]:
+                break
+            bx, by = atom_index.points[b]
+            angle = abs(math.atan2(ay - y, ax - x) - math.atan2(by - y, bx - x))
+            angle = min(angle, 2 * math.pi - angle)
+            if angle >= MIN_BOND_ANGLE:
+                best = (da + db, a, b)
+    return best and best[1:]
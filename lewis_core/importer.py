@@ -0,0 +1,936 @@
+"""SMILES / molfile import for the builder canvas.
+
+Parsing produces a small ``Molecule`` graph; ``molecule_to_pieces`` lays it out
+in 2D with NumPy and returns every atom, bond glyph and lone-pair glyph as one
+``{pid: piece}`` dict, ready to be applied as a single bulk insert.
+``hydrogen_pieces`` uses the same valences and hydrogen placement to fill in
+the hydrogens missing from a structure drawn by hand.
+"""
+
+import math
+import re
+from collections import deque
+
+import numpy as np
+
+from .graph import (
+    BOND_REACH_PX,
+    ELECTRON_REACH_PX,
+    MIN_BOND_ANGLE,
+    PieceGraph,
+    bond_ends,
+    electron_owner,
+)
+from .pieces import (
+    BOND_LABELS,
+    STRICT_OCTET,
+    VALENCE_ELECTRONS,
+    centered_piece,
+    new_piece_id,
+    piece_size,
+)
+from .spatial import SpatialHash
+
+# Canvas distance between two bonded atom centers
+BOND_PX = 110.0
+# Distance from an atom center to its lone-pair glyphs
+LONE_PAIR_PX = 38.0
+# Closest a filled-in hydrogen may come to another glyph center
+H_CLEARANCE_PX = 80.0
+# Gap between disconnected fragments and margin from the canvas corner
+FRAGMENT_GAP_PX = 80.0
+MARGIN_PX = 60.0
+
+# Default valences of the SMILES organic subset
+_NORMAL_VALENCES = {
+    "B": (3,), "C": (4,), "N": (3, 5), "O": (2,), "P": (3, 5),
+    "S": (2, 4, 6), "F": (1,), "Cl": (1,), "Br": (1,), "I": (1,), "*": (0,),
+}
+_AROMATIC = {"b": "B", "c": "C", "n": "N", "o": "O", "p": "P", "s": "S"}
+
+_BRACKET_RE = re.compile(
+    r"\[(\d*)([A-Z][a-z]?|[bcnops]|se|as|\*)(@*)(?:H(\d*))?([+-]+\d*)?(?::\d+)?\]"
+)
+_ORGANIC_RE = re.compile(r"Cl|Br|[BCNOPSFI]|[bcnops]|\*")
+_SMILES_BONDS = {"-": 1, "=": 2, "#": 3, "$": 3, ":": 1, "/": 1, "\\": 1}
+
+
+class StructureImportError(ValueError):
+    """Raised for input that cannot be turned into a structure."""
+
+
+class Molecule:
+    """Atoms and bonds of an imported structure.
+
+    ``hcounts`` holds the number of hydrogens each atom carries implicitly,
+    ``coords`` optional 2D coordinates (molfile input) in bond-length units.
+    """
+
+    def __init__(self):
+        self.elements = []
+        self.charges = []
+        self.hcounts = []
+        self.aromatic = []
+        self.bonds = []
+        self.coords = None
+
+    def add_atom(self, element, charge=0, hcount=0, aromatic=False):
+        self.elements.append(element)
+        self.charges.append(charge)
+        self.hcounts.append(hcount)
+        self.aromatic.append(aromatic)
+        return len(self.elements) - 1
+
+    def add_bond(self, a, b, order):
+        self.bonds.append((a, b, order))
+
+    def bond_order_sums(self):
+        sums = [0] * len(self.elements)
+        for a, b, order in self.bonds:
+            sums[a] += order
+            sums[b] += order
+        return sums
+
+    def degrees(self):
+        """Number of bonded neighbors of each atom (implicit hydrogens aside)."""
+        degrees = [0] * len(self.elements)
+        for a, b, _ in self.bonds:
+            degrees[a] += 1
+            degrees[b] += 1
+        return degrees
+
+    def add_explicit_hydrogens(self):
+        """Turns every implicit hydrogen into an H atom with a single bond.
+
+        Returns the parent atom of each added hydrogen, in insertion order.
+        """
+        parents = []
+        for atom in range(len(self.elements)):
+            for _ in range(self.hcounts[atom]):
+                self.add_bond(atom, self.add_atom("H"), 1)
+                parents.append(atom)
+            self.hcounts[atom] = 0
+        return parents
+
+    def lone_pairs(self):
+        """Lone pairs per atom from its valence electrons, bonds and charge."""
+        sums = self.bond_order_sums()
+        pairs = []
+        for atom, element in enumerate(self.elements):
+            valence = VALENCE_ELECTRONS.get(element, 0)
+            nonbonding = valence - self.charges[atom] - sums[atom] - self.hcounts[atom]
+            pairs.append(max(0, nonbonding) // 2)
+        return pairs
+
+
+# -----------------------------
+#  SMILES
+# -----------------------------
+
+def _parse_charge(text):
+    if not text:
+        return 0
+    sign = 1 if text[0] == "+" else -1
+    digits = text.lstrip("+-")
+    if digits:
+        return sign * int(digits)
+    return sign * len(text)
+
+
+def parse_smiles(smiles, implicit_hydrogens=True):
+    """Parses a SMILES string into a kekulized ``Molecule``.
+
+    Supports the organic subset, bracket atoms with H counts and charges,
+    branches, ring closures (including ``%nn``), dot-separated fragments and
+    aromatic lowercase atoms. Stereo marks are accepted and ignored. With
+    ``implicit_hydrogens=False`` organic-subset atoms get no implicit H,
+    which is what substructure patterns need.
+    """
+    mol = Molecule()
+    smiles = smiles.strip()
+    implicit = []
+    aromatic_bonds = set()
+    stack = []
+    rings = {}
+    previous = None
+    pending_bond = None
+    i = 0
+
+    while i < len(smiles):
+        ch = smiles[i]
+
+        if ch in _SMILES_BONDS:
+            pending_bond = ch
+            i += 1
+            continue
+        if ch == "(":
+            if previous is None:
+                raise StructureImportError(f"Branch opened before any atom at {i}")
+            stack.append(previous)
+            i += 1
+            continue
+        if ch == ")":
+            if not stack:
+                raise StructureImportError(f"Unbalanced ')' at {i}")
+            previous = stack.pop()
+            i += 1
+            continue
+        if ch == ".":
+            previous = None
+            i += 1
+            continue
+        if ch.isdigit() or ch == "%":
+            if ch == "%":
+                number = smiles[i + 1:i + 3]
+                i += 3
+            else:
+                number = ch
+                i += 1
+            if previous is None:
+                raise StructureImportError(f"Ring closure {number} without an atom")
+            if number in rings:
+                other, other_bond = rings.pop(number)
+                bond = pending_bond or other_bond
+                _close_bond(mol, aromatic_bonds, other, previous, bond)
+            else:
+                rings[number] = (previous, pending_bond)
+            pending_bond = None
+            continue
+
+        match = _BRACKET_RE.match(smiles, i)
+        if match:
+            symbol = match.group(2)
+            is_aromatic = symbol in _AROMATIC or symbol in ("se", "as")
+            element = _AROMATIC.get(symbol, symbol.capitalize() if is_aromatic else symbol)
+            hcount = int(match.group(4) or 1) if match.group(4) is not None else 0
+            atom = mol.add_atom(element, _parse_charge(match.group(5)), hcount, is_aromatic)
+            implicit.append(False)
+            i = match.end()
+        else:
+            match = _ORGANIC_RE.match(smiles, i)
+            if not match:
+                raise StructureImportError(f"Unexpected character {ch!r} at {i}")
+            symbol = match.group(0)
+            is_aromatic = symbol in _AROMATIC
+            atom = mol.add_atom(_AROMATIC.get(symbol, symbol), 0, 0, is_aromatic)
+            implicit.append(implicit_hydrogens)
+            i = match.end()
+
+        if previous is not None:
+            _close_bond(mol, aromatic_bonds, previous, atom, pending_bond)
+        pending_bond = None
+        previous = atom
+
+    if rings:
+        raise StructureImportError(f"Unclosed ring bond(s): {', '.join(sorted(rings))}")
+    if stack:
+        raise StructureImportError("Unclosed branch")
+    if not mol.elements:
+        raise StructureImportError("Empty SMILES")
+
+    _fill_implicit_hydrogens(mol, implicit)
+    _kekulize(mol, aromatic_bonds)
+    return mol
+
+
+def _close_bond(mol, aromatic_bonds, a, b, symbol):
+    if symbol is None and mol.aromatic[a] and mol.aromatic[b]:
+        symbol = ":"
+    mol.add_bond(a, b, _SMILES_BONDS.get(symbol, 1))
+    if symbol == ":":
+        aromatic_bonds.add(len(mol.bonds) - 1)
+
+
+def _lends_lone_pair(mol, atom, connections):
+    """True for a neutral aromatic N or P with three sigma bonds, as in
+    pyrrole or N-methylimidazole: its lone pair joins the ring, not a
+    double bond."""
+    return mol.elements[atom] in ("N", "P") and connections >= 3 and not mol.charges[atom]
+
+
+def _fill_implicit_hydrogens(mol, implicit):
+    sums, degrees = mol.bond_order_sums(), mol.degrees()
+    for atom, element in enumerate(mol.elements):
+        if not implicit[atom]:
+            continue
+        used = sums[atom]
+        if (mol.aromatic[atom] and element in ("B", "C", "N", "P")
+                and not _lends_lone_pair(mol, atom, degrees[atom])):
+            # The pi bond kekulization will add later
+            used += 1
+        for valence in _NORMAL_VALENCES.get(element, (0,)):
+            if valence >= used:
+                mol.hcounts[atom] = valence - used
+                break
+
+
+def _kekulize(mol, aromatic_bonds):
+    """Turns aromatic single bonds into alternating double bonds."""
+    if not aromatic_bonds:
+        return
+    sums, degrees = mol.bond_order_sums(), mol.degrees()
+    needs_pi = set()
+    for atom, element in enumerate(mol.elements):
+        if not mol.aromatic[atom] or element not in ("B", "C", "N", "P"):
+            continue
+        if _lends_lone_pair(mol, atom, degrees[atom] + mol.hcounts[atom]):
+            continue
+        valences = _NORMAL_VALENCES[element]
+        used = sums[atom] + mol.hcounts[atom] + abs(mol.charges[atom])
+        if any(valence - used == 1 for valence in valences):
+            needs_pi.add(atom)
+
+    options = {atom: [] for atom in needs_pi}
+    for index in aromatic_bonds:
+        a, b, _ = mol.bonds[index]
+        if a in needs_pi and b in needs_pi:
+            options[a].append((index, b))
+            options[b].append((index, a))
+
+    matched = {}
+    if not _match_pi(sorted(needs_pi), options, matched):
+        raise StructureImportError("Could not kekulize the aromatic system")
+    for index in set(matched.values()):
+        a, b, _ = mol.bonds[index]
+        mol.bonds[index] = (a, b, 2)
+
+
+def _match_pi(atoms, options, matched):
+    """Backtracking perfect matching of the atoms that need a pi bond."""
+    for atom in atoms:
+        if atom not in matched:
+            break
+    else:
+        return True
+    for index, partner in options[atom]:
+        if partner in matched:
+            continue
+        matched[atom] = matched[partner] = index
+        if _match_pi(atoms, options, matched):
+            return True
+        del matched[atom], matched[partner]
+    return False
+
+
+# -----------------------------
+#  MOLFILE
+# -----------------------------
+
+_MOLFILE_CHARGES = {1: 3, 2: 2, 3: 1, 5: -1, 6: -2, 7: -3}
+
+
+def parse_molfile(text):
+    """Parses the first record of a V2000 molfile / SD file."""
+    lines = text.splitlines()
+    if len(lines) < 4:
+        raise StructureImportError("Molfile is too short")
+    counts = lines[3]
+    if "V3000" in counts:
+        raise StructureImportError("V3000 molfiles are not supported")
+    try:
+        n_atoms = int(counts[0:3])
+        n_bonds = int(counts[3:6])
+    except ValueError:
+        raise StructureImportError("Malformed molfile counts line") from None
+    if len(lines) < 4 + n_atoms + n_bonds:
+        raise StructureImportError("Molfile ends before its atom/bond blocks")
+
+    mol = Molecule()
+    coords = np.zeros((n_atoms, 2))
+    for index in range(n_atoms):
+        line = lines[4 + index]
+        coords[index] = float(line[0:10]), float(line[10:20])
+        element = line[31:34].strip()
+        charge_code = int(line[36:39] or 0) if len(line) >= 39 else 0
+        mol.add_atom(element, _MOLFILE_CHARGES.get(charge_code, 0))
+
+    for index in range(n_bonds):
+        line = lines[4 + n_atoms + index]
+        a, b, order = int(line[0:3]) - 1, int(line[3:6]) - 1, int(line[6:9])
+        # Aromatic (4) and query bond types fall back to single
+        mol.add_bond(a, b, order if order in (1, 2, 3) else 1)
+
+    for line in lines[4 + n_atoms + n_bonds:]:
+        if line.startswith("M  CHG"):
+            fields = line.split()[3:]
+            for atom, charge in zip(fields[0::2], fields[1::2]):
+                mol.charges[int(atom) - 1] = int(charge)
+        elif line.startswith("M  END") or line.startswith("$$$$"):
+            break
+
+    _fill_implicit_hydrogens(mol, [el in _NORMAL_VALENCES for el in mol.elements])
+    # Charged atoms gain or lose a hydrogen site relative to the neutral valence
+    for atom, charge in enumerate(mol.charges):
+        if charge and mol.elements[atom] in _NORMAL_VALENCES:
+            shift = charge if mol.elements[atom] in ("N", "P") else -abs(charge)
+            mol.hcounts[atom] = max(0, mol.hcounts[atom] + shift)
+
+    if np.abs(coords).max(initial=0) > 0:
+        lengths = [np.linalg.norm(coords[a] - coords[b]) for a, b, _ in mol.bonds]
+        scale = float(np.median(lengths)) if lengths else 1.0
+        # Molfile y points up, canvas y points down
+        mol.coords = coords * np.array([1.0, -1.0]) / (scale or 1.0)
+    return mol
+
+
+# -----------------------------
+#  2D LAYOUT
+# -----------------------------
+
+def _components(n, bonds):
+    adjacency = [[] for _ in range(n)]
+    for a, b, _ in bonds:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    seen = [False] * n
+    groups = []
+    for start in range(n):
+        if seen[start]:
+            continue
+        seen[start] = True
+        group = [start]
+        queue = deque([start])
+        while queue:
+            for other in adjacency[queue.popleft()]:
+                if not seen[other]:
+                    seen[other] = True
+                    group.append(other)
+                    queue.append(other)
+        groups.append(group)
+    return adjacency, groups
+
+
+def _graph_distances(group, adjacency):
+    """All-pairs shortest path lengths within one component."""
+    local = {atom: k for k, atom in enumerate(group)}
+    dist = np.full((len(group), len(group)), np.inf)
+    for k, start in enumerate(group):
+        dist[k, k] = 0
+        frontier = [start]
+        depth = 0
+        while frontier:
+            depth += 1
+            nxt = []
+            for atom in frontier:
+                for other in adjacency[atom]:
+                    j = local[other]
+                    if dist[k, j] == np.inf:
+                        dist[k, j] = depth
+                        nxt.append(other)
+            frontier = nxt
+    return dist
+
+
+def _stress_layout(dist, iterations=80):
+    """Classical MDS seed refined by vectorized stress majorization."""
+    n = len(dist)
+    if n == 1:
+        return np.zeros((1, 2))
+    if n == 2:
+        return np.array([[0.0, 0.0], [1.0, 0.0]])
+
+    squared = dist ** 2
+    centering = np.eye(n) - 1.0 / n
+    gram = -0.5 * centering @ squared @ centering
+    values, vectors = np.linalg.eigh(gram)
+    top = np.argsort(values)[::-1][:2]
+    coords = vectors[:, top] * np.sqrt(np.maximum(values[top], 1e-9))
+    # Break the symmetry of perfectly regular graphs
+    coords += np.random.default_rng(0).normal(scale=1e-3, size=coords.shape)
+
+    target = dist
+    weights = np.where(dist > 0, np.maximum(dist, 1.0) ** -2.0, 0.0)
+    weight_sum = weights.sum(axis=1)[:, None]
+
+    weighted_target = weights * target
+    for _ in range(iterations):
+        x, y = coords[:, 0], coords[:, 1]
+        length = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+        np.fill_diagonal(length, 1.0)
+        pull = weighted_target / np.maximum(length, 1e-6)
+        # sum_j pull_ij * (c_i - c_j), written as matrix products
+        spread = pull.sum(axis=1)[:, None] * coords - pull @ coords
+        coords = (weights @ coords + spread) / weight_sum
+
+    # Lay the long axis horizontally, like a textbook drawing
+    centered = coords - coords.mean(axis=0)
+    _, _, axes = np.linalg.svd(centered, full_matrices=False)
+    return centered @ axes.T
+
+
+def layout_coordinates(mol):
+    """2D coordinates (bond-length units) for every atom of ``mol``."""
+    n = len(mol.elements)
+    if mol.coords is not None and len(mol.coords) == n:
+        return np.asarray(mol.coords, dtype=float)
+
+    adjacency, groups = _components(n, mol.bonds)
+    coords = np.zeros((n, 2))
+    cursor = 0.0
+    gap = FRAGMENT_GAP_PX / BOND_PX
+    for group in groups:
+        local = _stress_layout(_graph_distances(group, adjacency))
+        local = local - local.min(axis=0)
+        local[:, 0] += cursor
+        coords[group] = local
+        cursor = local[:, 0].max() + 1.0 + gap
+
+    if mol.bonds:
+        bonds = np.array([(a, b) for a, b, _ in mol.bonds])
+        lengths = np.linalg.norm(coords[bonds[:, 0]] - coords[bonds[:, 1]], axis=1)
+        coords /= max(float(np.median(lengths)), 1e-6)
+    return coords
+
+
+# Candidate hydrogen directions, every 30 degrees
+_H_ANGLES = np.deg2rad(np.arange(0, 360, 30))
+# Slight preference for the horizontal/vertical directions on ties
+_H_PREFERENCE = 0.05 * np.cos(4 * _H_ANGLES)
+
+
+def _space_fragments(mol, coords):
+    """Spreads the fragments of a generated layout apart again, hydrogens included.
+
+    ``layout_coordinates`` spaces fragments by their heavy atoms, and the
+    hydrogens placed afterwards can reach most of the way into the gap,
+    where the canvas would give a neighbouring fragment's lone pair to them.
+    """
+    _, groups = _components(len(coords), mol.bonds)
+    if len(groups) < 2:
+        return coords
+    gap = FRAGMENT_GAP_PX / BOND_PX
+    cursor = None
+    for group in sorted(groups, key=lambda group: coords[group, 0].min()):
+        if cursor is not None:
+            coords[group, 0] += max(0.0, cursor - coords[group, 0].min())
+        cursor = coords[group, 0].max() + 1.0 + gap
+    return coords
+
+
+def _hydrogen_coordinates(mol, coords, parents):
+    """Places new hydrogens in the widest free angles around their parents.
+
+    Each round places one more hydrogen on every parent that still needs
+    one, for all parents at once.
+    """
+    if not parents:
+        return coords
+    n_heavy = len(coords)
+    parents = np.asarray(parents)
+    needed = np.bincount(parents, minlength=n_heavy)
+
+    ends, angles = [], []
+    for a, b, _ in mol.bonds:
+        if a < n_heavy and b < n_heavy:
+            ends += [a, b]
+    if ends:
+        ends = np.asarray(ends)
+        others = ends.reshape(-1, 2)[:, ::-1].ravel()
+        delta = coords[others] - coords[ends]
+        angles = np.arctan2(delta[:, 1], delta[:, 0])
+    degree = np.bincount(ends, minlength=n_heavy) if len(ends) else np.zeros(n_heavy, int)
+
+    width = int(degree.max(initial=0) + needed.max())
+    occupied = np.full((n_heavy, width), np.nan)
+    if len(ends):
+        order = np.argsort(ends, kind="stable")
+        sorted_ends = ends[order]
+        first = np.searchsorted(sorted_ends, sorted_ends)
+        occupied[sorted_ends, np.arange(len(ends)) - first] = angles[order]
+
+    placed = np.zeros((n_heavy, int(needed.max()), 2))
+    atoms = np.arange(n_heavy)
+    for rank in range(int(needed.max())):
+        active = needed > rank
+        gap = np.abs((_H_ANGLES[None, :, None] - occupied[:, None, :] + np.pi) % (2 * np.pi) - np.pi)
+        gap = np.where(np.isnan(gap), np.inf, gap).min(axis=2)
+        gap = np.where(np.isinf(gap), np.pi, gap) + _H_PREFERENCE
+        best = _H_ANGLES[gap.argmax(axis=1)]
+        placed[active, rank] = np.stack([np.cos(best), np.sin(best)], axis=1)[active]
+        occupied[atoms[active], degree[active] + rank] = best[active]
+
+    ranks = np.arange(len(parents)) - np.searchsorted(parents, parents)
+    return np.vstack([coords, coords[parents] + placed[parents, ranks]])
+
+
+# Directions tried when a hydrogen has to move, every 15 degrees
+_H_RETRY_ANGLES = np.deg2rad(np.arange(0, 360, 15))
+_H_RETRY_DIRS = np.stack([np.cos(_H_RETRY_ANGLES), np.sin(_H_RETRY_ANGLES)], axis=1)
+# Lead a bond glyph's own atoms must keep over any other pair it could join,
+# so rounding the positions (the library stores whole pixels) cannot flip it
+BOND_READ_SLACK_PX = 4.0
+_RIVAL_ANGLE = MIN_BOND_ANGLE - math.radians(2)
+
+
+def _pad(rows):
+    """Ragged lists of atom ids as an ``(n, m)`` array padded with -1, and its mask."""
+    ids = np.full((len(rows), max(map(len, rows))), -1)
+    for i, row in enumerate(rows):
+        ids[i, :len(row)] = row
+    return ids, ids >= 0
+
+
+def _polar(points, origins):
+    """Distances and angles of ``points`` (..., m, 2) seen from ``origins`` (..., 2)."""
+    delta = points - origins[..., None, :]
+    return np.hypot(delta[..., 0], delta[..., 1]), np.arctan2(delta[..., 1], delta[..., 0])
+
+
+def _opposed(a, b):
+    """Whether two directions seen from a glyph are far enough apart to bond across it."""
+    apart = np.abs(a - b)
+    return np.minimum(apart, 2 * np.pi - apart) >= _RIVAL_ANGLE
+
+
+def _read_scores(dist, angle, valid):
+    """Distance sums of each glyph's own pair and of its best rival pair.
+
+    ``dist`` and ``angle`` (see ``_polar``) hold the atoms near each glyph,
+    shape ``(..., m)``, with ``valid`` masking padding and each glyph's own
+    two atoms first. Scores pairs the way ``graph.bond_ends`` does: the
+    closest two atoms on opposite sides of the glyph win. Missing pairs
+    score infinity.
+    """
+    valid = valid & (dist <= BOND_REACH_PX)
+    pairs = np.triu(np.ones((dist.shape[-1],) * 2, dtype=bool), 1)
+    pairs[0, 1] = False
+    rivals = pairs & valid[..., :, None] & valid[..., None, :] & _opposed(angle[..., :, None], angle[..., None, :])
+    rival = np.where(rivals, dist[..., :, None] + dist[..., None, :], np.inf).min(axis=(-2, -1))
+    own = np.where(valid[..., 0] & valid[..., 1], dist[..., 0] + dist[..., 1], np.inf)
+    return own, rival
+
+
+def _misread(own, rival):
+    """Whether the canvas would attach (or nearly attach) a glyph to some
+    other pair of atoms than its own."""
+    return np.isinf(own) | (own + BOND_READ_SLACK_PX > rival)
+
+
+def _misread_bonds(index, centers, bonds, subset):
+    """Bonds of ``subset`` whose glyph, at the midpoint of its atoms, the
+    canvas would misread (see ``_misread``)."""
+    subset = list(subset)
+    if not subset:
+        return []
+    ends = np.array([bonds[k] for k in subset])
+    glyphs = (centers[ends[:, 0]] + centers[ends[:, 1]]) / 2
+    rows = [
+        [a, b] + [p for _, p in index.query_radius(x, y, BOND_REACH_PX) if p != a and p != b]
+        for (a, b), (x, y) in zip(ends.tolist(), glyphs.tolist())
+    ]
+    ids, valid = _pad(rows)
+    wrong = _misread(*_read_scores(*_polar(centers[ids], glyphs), valid))
+    return [k for k, bad in zip(subset, wrong.tolist()) if bad]
+
+
+def _best_hydrogen_spot(index, glyphs, centers, bonds, h, parent, own):
+    """Where hydrogen ``h`` misreads the fewest bonds: its current spot or
+    one of the retry directions around ``parent``, judged all at once.
+
+    Only glyphs within reach of some candidate spot, and the hydrogen's own
+    bond glyph, can change their reading, so only those are scored. The
+    other glyphs' pairs of fixed atoms are scored once; only the pairs the
+    hydrogen makes are scored per spot. Ties go to the spot farthest from
+    other atoms, then to the current spot.
+    """
+    px, py = centers[parent].tolist()
+    reach = max(BOND_PX, math.dist(centers[h], centers[parent]))
+    spots = np.vstack([centers[h], centers[parent] + BOND_PX * _H_RETRY_DIRS])
+
+    # The hydrogen's own glyph moves with it, up to reach / 2 from the parent
+    a, b = bonds[own]
+    ids, valid = _pad([[a, b] + [p for _, p in index.query_radius(px, py, BOND_REACH_PX + reach / 2)
+                                 if p != a and p != b]])
+    points = np.repeat(centers[ids], len(spots), axis=0)
+    points[:, ids[0] == h] = spots[:, None, :]
+    wrong = _misread(*_read_scores(*_polar(points, (centers[parent] + spots) / 2), valid)).astype(int)
+
+    near = [k for _, k in glyphs.query_radius(px, py, reach + BOND_REACH_PX) if k != own]
+    if near:
+        at = np.array([glyphs.points[k] for k in near])
+        ids, valid = _pad([
+            list(bonds[k]) + [p for _, p in index.query_radius(x, y, BOND_REACH_PX) if p not in (*bonds[k], h)]
+            for k, (x, y) in zip(near, at.tolist())
+        ])
+        dist, angle = _polar(centers[ids], at)
+        valid &= dist <= BOND_REACH_PX
+        own_pair, rival = _read_scores(dist, angle, valid)
+        # Pairs of the hydrogen, at each spot, with every fixed atom near a glyph
+        h_dist, h_angle = (v[..., 0] for v in _polar(spots[:, None, None, :], at))
+        pairs = (h_dist <= BOND_REACH_PX)[..., None] & valid & _opposed(h_angle[..., None], angle)
+        h_rival = np.where(pairs, h_dist[..., None] + dist, np.inf).min(axis=2)
+        wrong += _misread(own_pair, np.minimum(rival, h_rival)).sum(axis=1)
+
+    others = [p for _, p in index.query_radius(px, py, reach + BOND_PX) if p != h and p != parent]
+    clearance = np.full(len(spots), BOND_PX)
+    if others:
+        gaps = np.linalg.norm(spots[:, None, :] - centers[others][None], axis=2)
+        clearance = np.minimum(gaps.min(axis=1), BOND_PX)
+    return spots[np.lexsort((-clearance, wrong))[0]]
+
+
+def _untangle_hydrogens(mol, centers, passes=4):
+    """Moves terminal hydrogens until every bond glyph reads back as drawn.
+
+    The canvas attaches a bond glyph to the closest pair of atoms on either
+    side of it (``graph.bond_ends``). Around crowded sp3 centers, such as the
+    methyls of a tert-butyl group, a hydrogen can end up closer to another
+    bond's glyph than that bond's own atoms, so the structure falls apart
+    when the canvas reads it. Each misread bond's nearby hydrogens are swung
+    around their parent to the direction that misreads the fewest bonds,
+    keeping clear of other atoms. After a pass only the bonds within reach
+    of a moved hydrogen are checked again. Works on ``centers`` in place.
+    """
+    if not mol.bonds:
+        return
+    bonds = [(a, b) for a, b, _ in mol.bonds]
+    index = SpatialHash(BOND_REACH_PX)
+    for atom, (x, y) in enumerate(centers.tolist()):
+        index.insert(atom, x, y)
+    wrong = _misread_bonds(index, centers, bonds, range(len(bonds)))
+    if not wrong:
+        return
+
+    parent = {}
+    for k, (a, b) in enumerate(bonds):
+        for h, other in ((a, b), (b, a)):
+            if mol.elements[h] == "H":
+                parent[h] = None if h in parent else (other, k)
+    parent = {h: link for h, link in parent.items() if link is not None}
+    glyphs = SpatialHash(BOND_REACH_PX)
+    for k, (a, b) in enumerate(bonds):
+        glyphs.insert(k, *((centers[a] + centers[b]) / 2).tolist())
+
+    for _ in range(passes):
+        movable = set()
+        for k in wrong:
+            x, y = glyphs.points[k]
+            movable.update(h for h in bonds[k] if h in parent)
+            movable.update(h for _, h in index.query_radius(x, y, BOND_REACH_PX) if h in parent)
+        touched = set(wrong)
+        for h in sorted(movable):
+            p, own = parent[h]
+            spot = _best_hydrogen_spot(index, glyphs, centers, bonds, h, p, own)
+            if np.array_equal(spot, centers[h]):
+                continue
+            for position in (centers[h], spot):
+                touched.update(k for _, k in glyphs.query_radius(*position.tolist(), BOND_REACH_PX))
+            centers[h] = spot
+            index.insert(h, *spot.tolist())
+            glyphs.insert(own, *((centers[p] + spot) / 2).tolist())
+            touched.add(own)
+        wrong = _misread_bonds(index, centers, bonds, sorted(touched))
+        if not wrong:
+            return
+
+
+# -----------------------------
+#  PIECES
+# -----------------------------
+
+# Lone pairs go above/below as "••" and left/right as ":"
+_LONE_PAIR_DIRS = np.array([[0.0, -1.0], [0.0, 1.0], [-1.0, 0.0], [1.0, 0.0]])
+_LONE_PAIR_LABELS = np.array(["••", "••", ":", ":"])
+
+
+def _reseat_lone_pairs(centers, atoms, ranks, order):
+    """Moves lone pairs the canvas would give to a neighbouring atom (see
+    ``graph.electron_owner``) to a free side of their own atom.
+
+    ``order`` ranks each atom's four sides, most open first; the pair of
+    rank r sits on ``order[atom, r]``. Swapping a side into that rank moves
+    the pair. Returns the side of every pair.
+    """
+    index = SpatialHash(ELECTRON_REACH_PX)
+    for atom, (x, y) in enumerate(centers.tolist()):
+        index.insert(atom, x, y)
+    used = np.bincount(atoms, minlength=len(centers))
+
+    def owned(atom, side):
+        x, y = (centers[atom] + _LONE_PAIR_DIRS[side] * LONE_PAIR_PX).tolist()
+        return electron_owner(index, x, y, _LONE_PAIR_LABELS[side]) == atom
+
+    for atom, rank in zip(atoms.tolist(), ranks.tolist()):
+        if owned(atom, order[atom, rank]):
+            continue
+        for spare in range(used[atom], 4):
+            if owned(atom, order[atom, spare]):
+                order[atom, [rank, spare]] = order[atom, [spare, rank]]
+                break
+    return order[atoms, ranks]
+
+
+def molecule_to_pieces(mol, origin=(0.0, 0.0), explicit_hydrogens=True):
+    """Lays out ``mol`` and returns all of its pieces as ``{pid: piece}``.
+
+    Heavy atoms are laid out first; implicit hydrogens are then turned into
+    H atoms around them. Positions are computed for every glyph at once with
+    array operations. Two clean-up passes then visit only the glyphs the
+    canvas would misread: hydrogens crowding another bond's glyph swing
+    around their parent (every direction scored in one array pass), and
+    lone pairs another atom would claim move to a free side.
+    """
+    generated = mol.coords is None or len(mol.coords) != len(mol.elements)
+    coords = layout_coordinates(mol)
+    if explicit_hydrogens:
+        coords = _hydrogen_coordinates(mol, coords, mol.add_explicit_hydrogens())
+        if generated:
+            coords = _space_fragments(mol, coords)
+    centers = coords * BOND_PX
+    _untangle_hydrogens(mol, centers)
+    centers = centers - centers.min(axis=0) + MARGIN_PX + np.asarray(origin, dtype=float)
+
+    labels = list(mol.elements)
+    types = ["atom"] * len(labels)
+    points = [centers]
+
+    if mol.bonds:
+        bonds = np.array([(a, b) for a, b, _ in mol.bonds])
+        points.append((centers[bonds[:, 0]] + centers[bonds[:, 1]]) / 2)
+        labels += [BOND_LABELS[order] for _, _, order in mol.bonds]
+        types += ["bond"] * len(mol.bonds)
+
+        # Score each lone-pair direction by how close a bond points to it
+        unit = centers[bonds[:, 1]] - centers[bonds[:, 0]]
+        unit /= np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-9)
+        crowding = np.full((len(centers), 4), -1.0)
+        np.maximum.at(crowding, bonds[:, 0], unit @ _LONE_PAIR_DIRS.T)
+        np.maximum.at(crowding, bonds[:, 1], -unit @ _LONE_PAIR_DIRS.T)
+    else:
+        crowding = np.full((len(centers), 4), -1.0)
+
+    pairs = np.minimum(np.array(mol.lone_pairs(), dtype=int), 4)
+    if pairs.any():
+        order = np.argsort(crowding, axis=1, kind="stable")
+        slots = np.arange(4)[None, :] < pairs[:, None]
+        atoms, ranks = np.nonzero(slots)
+        dirs = _reseat_lone_pairs(centers, atoms, ranks, order)
+        points.append(centers[atoms] + _LONE_PAIR_DIRS[dirs] * LONE_PAIR_PX)
+        labels += _LONE_PAIR_LABELS[dirs].tolist()
+        types += ["electron"] * len(atoms)
+
+    points = np.vstack(points)
+    sizes = {label: piece_size(label) for label in set(labels)}
+    half = np.array([sizes[label] for label in labels]) / 2
+    corners = np.round(points - half, 1).tolist()
+
+    return {
+        new_piece_id(): {"x": x, "y": y, "label": label, "type": kind}
+        for (x, y), label, kind in zip(corners, labels, types)
+    }
+
+
+def import_structure(text, origin=(0.0, 0.0), explicit_hydrogens=True):
+    """Parses SMILES or molfile text and returns its pieces."""
+    if "M  END" in text or "V2000" in text:
+        mol = parse_molfile(text)
+    else:
+        mol = parse_smiles(text)
+    return molecule_to_pieces(mol, origin, explicit_hydrogens)
+
+
+# -----------------------------
+#  HYDROGEN FILL
+# -----------------------------
+
+def missing_hydrogens(element, bonded, lone):
+    """Hydrogens an atom needs, from its bond order sum and drawn electrons.
+
+    Without lone pairs drawn the atom gets its normal valence, as in SMILES.
+    With them, the drawn electrons count too, so an alkoxide O or a
+    carbanion C is left alone. Elements of the second period never get more
+    than an octet, so a 4-bonded N is an ammonium N, not one short of N(V).
+    """
+    if element == "H" or element not in _NORMAL_VALENCES:
+        return 0
+    room = (8 - 2 * bonded - lone) // 2
+    if lone:
+        unpaired = VALENCE_ELECTRONS.get(element, 0) - bonded - lone
+        return max(0, min(unpaired, room))
+    for valence in _NORMAL_VALENCES[element]:
+        if valence >= bonded:
+            return max(0, min(valence - bonded, room)) if element in STRICT_OCTET else valence - bonded
+    return 0
+
+
+def _hydrogen_fits(graph, atom, h, hx, hy):
+    """True if an H at (hx, hy), already in ``graph.atom_index``, bonds to
+    ``atom`` and leaves the bond glyphs around it with their atoms."""
+    ax, ay = graph.centers[atom]
+    if set(bond_ends(graph.atom_index, (ax + hx) / 2, (ay + hy) / 2) or ()) != {atom, h}:
+        return False
+    for _, glyph in graph.bond_index.query_radius(hx, hy, BOND_REACH_PX):
+        ends = graph.bonds.get(glyph)
+        if ends is not None and set(bond_ends(graph.atom_index, *graph.centers[glyph]) or ()) != set(ends[:2]):
+            return False
+    return True
+
+
+def hydrogen_pieces(pieces):
+    """H atoms and "-" bonds that complete every atom on the canvas.
+
+    Returns ``{pid: piece}`` for one bulk insert. Hydrogens go one bond
+    length out, in the widest free angle around their atom (bonds and
+    lone-pair glyphs count as taken) and clear of the glyphs already on the
+    canvas. Each placement is checked against the same bond-glyph rule the
+    canvas uses, so no bond ends up attached to a different atom.
+    """
+    graph = PieceGraph(pieces)
+    taken = SpatialHash(H_CLEARANCE_PX)
+    for pid, center in graph.centers.items():
+        taken.insert(pid, *center)
+
+    added = {}
+    for atom, element in list(graph.atoms.items()):
+        bonded = sum(order for _, order in graph.neighbors(atom))
+        count = missing_hydrogens(element, bonded, graph.lone_electrons(atom))
+        if not count:
+            continue
+        ax, ay = graph.centers[atom]
+        around = [neighbor for neighbor, _ in graph.neighbors(atom)] + list(graph.atom_electrons[atom])
+        occupied = [math.atan2(graph.centers[pid][1] - ay, graph.centers[pid][0] - ax) for pid in around]
+
+        for _ in range(count):
+            candidates = []
+            for angle, preference in zip(_H_ANGLES.tolist(), _H_PREFERENCE.tolist()):
+                gap = min(
+                    (abs((angle - other + math.pi) % (2 * math.pi) - math.pi) for other in occupied),
+                    default=math.pi,
+                )
+                score = gap + preference
+                dx, dy = math.cos(angle) * BOND_PX, math.sin(angle) * BOND_PX
+                # The H itself, then its bond glyph halfway out
+                for x, y, clearance in (
+                    (ax + dx, ay + dy, H_CLEARANCE_PX),
+                    (ax + dx / 2, ay + dy / 2, H_CLEARANCE_PX / 2),
+                ):
+                    hits = [d for d, key in taken.query_radius(x, y, clearance) if key != atom]
+                    if hits:
+                        score -= math.pi * (1 - hits[0] / clearance)
+                candidates.append((score, angle))
+            candidates.sort(reverse=True)
+
+            h, bond = new_piece_id(), new_piece_id()
+            for _, angle in candidates:
+                hx, hy = ax + math.cos(angle) * BOND_PX, ay + math.sin(angle) * BOND_PX
+                graph.atom_index.insert(h, hx, hy)
+                if _hydrogen_fits(graph, atom, h, hx, hy):
+                    break
+                graph.atom_index.remove(h)
+            else:
+                # Nowhere fits cleanly; the widest angle is still the best guess
+                angle = candidates[0][1]
+                hx, hy = ax + math.cos(angle) * BOND_PX, ay + math.sin(angle) * BOND_PX
+                graph.atom_index.insert(h, hx, hy)
+
+            added[h] = centered_piece("H", "atom", hx, hy)
+            added[bond] = centered_piece("-", "bond", (ax + hx) / 2, (ay + hy) / 2)
+            # Later hydrogens must leave this one's bond alone too
+            graph.centers[h] = (hx, hy)
+            graph.centers[bond] = ((ax + hx) / 2, (ay + hy) / 2)
+            graph.bond_index.insert(bond, *graph.centers[bond])
+            graph.bonds[bond] = (atom, h, 1)
+            taken.insert(h, hx, hy)
+            taken.insert(bond, (ax + hx) / 2, (ay + hy) / 2)
+            occupied.append(angle)
+    return added
@@ -0,0 +1,177 @@
+"""Force-directed "tidy up" layout for drawn structures.
+
+Atoms repel each other and bonds act as springs pulling toward the ideal
+bond length. Repulsion uses a Barnes-Hut quadtree, so one iteration costs
+O(n log n) instead of O(n^2). The quadtree is built from sorted Morton codes
+and traversed breadth-first for all atoms at once, which keeps every step a
+NumPy array operation. Bond and electron glyphs are re-anchored to their
+atoms afterwards.
+"""
+
+import numpy as np
+
+from .graph import PieceGraph
+from .pieces import centered_piece, piece_size
+
+IDEAL_BOND_PX = 110.0
+# Opening angle: cells smaller than THETA * distance are treated as one body
+THETA = 0.8
+TREE_DEPTH = 10
+ITERATIONS = 40
+REPULSION = 0.06 * IDEAL_BOND_PX ** 3
+SPRING = 1.0
+MARGIN_PX = 40.0
+
+
+def _morton_codes(cells):
+    """Interleaves the bits of integer (x, y) cell coordinates."""
+    codes = np.zeros(len(cells), dtype=np.int64)
+    for bit in range(TREE_DEPTH):
+        codes |= ((cells[:, 0] >> bit) & 1) << (2 * bit)
+        codes |= ((cells[:, 1] >> bit) & 1) << (2 * bit + 1)
+    return codes
+
+
+class QuadTree:
+    """Barnes-Hut quadtree stored level by level as flat arrays.
+
+    Level ``L`` holds the occupied cells of a ``2**L x 2**L`` grid as sorted
+    Morton-key prefixes together with their body count and center of mass.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+        low = positions.min(axis=0)
+        self.size = max(float(np.ptp(positions, axis=0).max()), 1.0) * (1 + 1e-9)
+        scale = (1 << TREE_DEPTH) / self.size
+        cells = np.minimum(((positions - low) * scale).astype(np.int64), (1 << TREE_DEPTH) - 1)
+        self.codes = _morton_codes(cells)
+
+        order = np.argsort(self.codes, kind="stable")
+        sorted_codes = self.codes[order]
+        sorted_positions = positions[order]
+        self.keys, self.counts, self.centers = [], [], []
+        for level in range(TREE_DEPTH + 1):
+            prefixes = sorted_codes >> (2 * (TREE_DEPTH - level))
+            keys, starts = np.unique(prefixes, return_index=True)
+            counts = np.diff(np.append(starts, len(prefixes)))
+            sums = np.add.reduceat(sorted_positions, starts, axis=0)
+            self.keys.append(keys)
+            self.counts.append(counts)
+            self.centers.append(sums / counts[:, None])
+
+    def repulsion(self, strength, theta=THETA):
+        """Approximate sum of the ``strength / d**2`` repulsion on every body."""
+        n = len(self.positions)
+        force = np.zeros((n, 2))
+        bodies = np.arange(n)
+        nodes = np.zeros(n, dtype=np.int64)
+
+        for level in range(TREE_DEPTH + 1):
+            if not len(bodies):
+                break
+            cell_size = self.size / (1 << level)
+            counts = self.counts[level][nodes].astype(float)
+            centers = self.centers[level][nodes]
+            own = self.keys[level][nodes] == (self.codes[bodies] >> (2 * (TREE_DEPTH - level)))
+
+            last = level == TREE_DEPTH
+            if last:
+                # Bodies sharing the finest cell: remove the body itself
+                others = counts - own
+                centers = np.where(
+                    own[:, None],
+                    (centers * counts[:, None] - self.positions[bodies]) / np.maximum(others, 1)[:, None],
+                    centers,
+                )
+                counts = others
+                accept = counts > 0
+            else:
+                delta = self.positions[bodies] - centers
+                distance = np.hypot(delta[:, 0], delta[:, 1])
+                accept = ~own & ((cell_size < theta * distance) | (counts == 1))
+
+            delta = self.positions[bodies[accept]] - centers[accept]
+            distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1.0)
+            push = (strength * counts[accept] / distance ** 3)[:, None] * delta
+            force[:, 0] += np.bincount(bodies[accept], push[:, 0], minlength=n)
+            force[:, 1] += np.bincount(bodies[accept], push[:, 1], minlength=n)
+            if last:
+                break
+
+            # Open the remaining cells; a lone body's own cell needs no visit
+            expand = ~accept & ~(own & (counts == 1))
+            bodies, nodes = self._children(level, bodies[expand], nodes[expand])
+        return force
+
+    def _children(self, level, bodies, nodes):
+        parents = self.keys[level][nodes] << 2
+        child_keys = self.keys[level + 1]
+        first = np.searchsorted(child_keys, parents)
+        last = np.searchsorted(child_keys, parents + 4)
+        fanout = last - first
+        total = int(fanout.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(fanout) - fanout, fanout)
+        return np.repeat(bodies, fanout), np.repeat(first, fanout) + offsets
+
+
+def force_layout(positions, edges, iterations=ITERATIONS):
+    """Runs the spring/Barnes-Hut simulation and returns new positions."""
+    positions = np.array(positions, dtype=float)
+    if len(positions) < 2:
+        return positions
+    # Separate atoms that sit exactly on top of each other
+    positions += np.random.default_rng(0).normal(scale=0.5, size=positions.shape)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    n = len(positions)
+    step = IDEAL_BOND_PX * 0.5
+
+    for _ in range(iterations):
+        force = QuadTree(positions).repulsion(REPULSION)
+        if len(edges):
+            delta = positions[edges[:, 1]] - positions[edges[:, 0]]
+            length = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-6)
+            pull = (SPRING * (length - IDEAL_BOND_PX) / length)[:, None] * delta
+            for axis in (0, 1):
+                force[:, axis] += np.bincount(edges[:, 0], pull[:, axis], minlength=n)
+                force[:, axis] -= np.bincount(edges[:, 1], pull[:, axis], minlength=n)
+        magnitude = np.maximum(np.hypot(force[:, 0], force[:, 1]), 1e-9)
+        positions += force * (np.minimum(magnitude, step) / magnitude)[:, None]
+        step *= 0.9
+    return positions
+
+
+def tidy_pieces(pieces):
+    """Lays out the drawn structure and returns ``{pid: piece}`` for moved pieces.
+
+    Atoms keep their overall position on the canvas; bond glyphs are put back
+    on the midpoint of their atoms and electron glyphs keep their offset from
+    the atom they belong to.
+    """
+    graph = PieceGraph(pieces)
+    if len(graph.atoms) < 2:
+        return {}
+
+    index = {pid: i for i, pid in enumerate(graph.atoms)}
+    before = np.array([graph.centers[pid] for pid in graph.atoms])
+    edges = [(index[a], index[b]) for a, b, _ in graph.bonds.values()]
+    after = force_layout(before, edges)
+    after += before.mean(axis=0) - after.mean(axis=0)
+    # Keep everything on the visible canvas
+    half = np.array([piece_size(pieces[pid]["label"]) for pid in graph.atoms]) / 2
+    low = np.min(after - half, axis=0)
+    after += np.maximum(MARGIN_PX - low, 0)
+
+    moved = {}
+    for pid, (x, y) in zip(graph.atoms, after.tolist()):
+        moved[pid] = centered_piece(pieces[pid]["label"], "atom", x, y)
+    for pid, (a, b, _) in graph.bonds.items():
+        x, y = (after[index[a]] + after[index[b]]) / 2
+        moved[pid] = centered_piece(pieces[pid]["label"], "bond", float(x), float(y))
+    for pid, owner in graph.owners.items():
+        if owner is None:
+            continue
+        shift = after[index[owner]] - before[index[owner]]
+        x, y = graph.centers[pid] + shift
+        moved[pid] = centered_piece(pieces[pid]["label"], "electron", float(x), float(y))
+    return moved
@@ -0,0 +1,285 @@
+"""Bundled library of reference molecules behind a memory-mapped index.
+
+``library/molecules.tsv`` is the source (name, SMILES, optional ``;``-separated
+aliases). ``python -m lewis_core.library build`` lays every entry out once and
+writes ``library/molecules.idx``, a flat binary file of fixed sections:
+
+* search keys: lowercased names and aliases, sorted, each pointing at a record
+* display names and Hill formulas of the records
+* an element-composition matrix (records x elements, uint16)
+* each record's pieces, zlib-compressed
+
+Opening the library only reads the header and maps the file, so startup
+does not grow with the library; searches touch the pages they need.
+
+The bundled source is deliberately smaller than the few thousand entries
+the format was designed for: about 200 curated molecules plus homologous
+series up to ten carbons, some 540 records in all. Longer generated series
+were dropped as clutter nobody searches for. The index layout, the
+memory-mapped opening and the composition screen do not depend on the
+count; an index of 3,000 entries built from a larger source opens just as
+fast and is searched the same way.
+"""
+
+import bisect
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from .importer import import_structure, parse_smiles
+from .pieces import hill_formula, new_piece_id
+
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "library")
+SOURCE_PATH = os.path.join(LIBRARY_DIR, "molecules.tsv")
+INDEX_PATH = os.path.join(LIBRARY_DIR, "molecules.idx")
+
+_MAGIC = b"LEWISLIB"
+_VERSION = 1
+_SECTIONS = (
+    "elements",
+    "key_offsets", "key_blob", "key_records",
+    "name_offsets", "name_blob",
+    "formula_offsets", "formula_blob",
+    "composition",
+    "piece_offsets", "piece_blob",
+)
+_HEADER = struct.Struct("<8sIII")
+_SECTION = struct.Struct("<QQ")
+_TYPES = {"atom": "a", "bond": "b", "electron": "e"}
+_TYPE_NAMES = {code: kind for kind, code in _TYPES.items()}
+
+_FORMULA = re.compile(r"([A-Z][a-z]?)(\d*)")
+
+
+def parse_formula(text):
+    """Parses ``"C2H6O"`` into a Counter, or returns None if it is not a formula."""
+    text = text.strip()
+    if not text or not re.fullmatch(r"(?:[A-Z][a-z]?\d*)+", text):
+        return None
+    counts = Counter()
+    for element, count in _FORMULA.findall(text):
+        counts[element] += int(count or 1)
+    return counts
+
+
+# -----------------------------
+#  BUILD
+# -----------------------------
+
+def read_source(path=SOURCE_PATH):
+    """Yields ``(name, smiles, aliases)`` from the TSV source."""
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+            name, smiles, *rest = line.split("\t")
+            aliases = [a.strip() for a in rest[0].split(";") if a.strip()] if rest else []
+            yield name, smiles, aliases
+
+
+def _compact_pieces(pieces):
+    return [
+        [piece["label"], _TYPES[piece["type"]], round(piece["x"]), round(piece["y"])]
+        for piece in pieces.values()
+    ]
+
+
+def _blob(strings):
+    data = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(data) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(d) for d in data])
+    return offsets, b"".join(data)
+
+
+def build_index(source=SOURCE_PATH, path=INDEX_PATH):
+    """Lays out every source entry and writes the binary index."""
+    names, formulas, compositions, payloads, keys = [], [], [], [], []
+    for name, smiles, aliases in read_source(source):
+        mol = parse_smiles(smiles)
+        mol.add_explicit_hydrogens()
+        counts = Counter(mol.elements)
+        record = len(names)
+        names.append(name)
+        formulas.append(hill_formula(counts))
+        compositions.append(counts)
+        payloads.append(zlib.compress(
+            json.dumps(_compact_pieces(import_structure(smiles)), separators=(",", ":")).encode(),
+            9,
+        ))
+        keys.extend((key.lower(), record) for key in [name] + aliases)
+
+    elements = sorted({e for counts in compositions for e in counts})
+    composition = np.array(
+        [[counts.get(e, 0) for e in elements] for counts in compositions], dtype="<u2"
+    )
+    keys.sort()
+    key_offsets, key_blob = _blob(k for k, _ in keys)
+    name_offsets, name_blob = _blob(names)
+    formula_offsets, formula_blob = _blob(formulas)
+    piece_offsets = np.zeros(len(payloads) + 1, dtype="<u8")
+    piece_offsets[1:] = np.cumsum([len(p) for p in payloads])
+
+    sections = {
+        "elements": ",".join(elements).encode(),
+        "key_offsets": key_offsets.tobytes(),
+        "key_blob": key_blob,
+        "key_records": np.array([r for _, r in keys], dtype="<u4").tobytes(),
+        "name_offsets": name_offsets.tobytes(),
+        "name_blob": name_blob,
+        "formula_offsets": formula_offsets.tobytes(),
+        "formula_blob": formula_blob,
+        "composition": composition.tobytes(),
+        "piece_offsets": piece_offsets.tobytes(),
+        "piece_blob": b"".join(payloads),
+    }
+
+    position = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    table, body = [], []
+    for section in _SECTIONS:
+        data = sections[section]
+        padding = -position % 8
+        body.append(b"\0" * padding)
+        position += padding
+        table.append(_SECTION.pack(position, len(data)))
+        body.append(data)
+        position += len(data)
+
+    with open(path, "wb") as fh:
+        fh.write(_HEADER.pack(_MAGIC, _VERSION, len(names), len(keys)))
+        fh.write(b"".join(table))
+        fh.write(b"".join(body))
+    return len(names)
+
+
+# -----------------------------
+#  SEARCH
+# -----------------------------
+
+class _Keys:
+    """Sequence view over the sorted search keys, for ``bisect``."""
+
+    def __init__(self, library):
+        self.library = library
+
+    def __len__(self):
+        return self.library.key_count
+
+    def __getitem__(self, i):
+        return self.library._string("key", i)
+
+
+class MoleculeLibrary:
+    """Read-only view of a library index file."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.map = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, self.count, self.key_count = _HEADER.unpack_from(self.map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a version {_VERSION} molecule library")
+
+        self._sections = {}
+        for i, section in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(self.map, _HEADER.size + i * _SECTION.size)
+            self._sections[section] = self.map[offset:offset + length]
+        self.elements = bytes(self._sections["elements"]).decode().split(",")
+        self.key_offsets = self._sections["key_offsets"].view("<u4")
+        self.key_records = self._sections["key_records"].view("<u4")
+        self.name_offsets = self._sections["name_offsets"].view("<u4")
+        self.formula_offsets = self._sections["formula_offsets"].view("<u4")
+        self.piece_offsets = self._sections["piece_offsets"].view("<u8")
+        self.composition = self._sections["composition"].view("<u2").reshape(
+            self.count, len(self.elements)
+        )
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, kind, i):
+        offsets = getattr(self, kind + "_offsets")
+        return bytes(self._sections[kind + "_blob"][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def name(self, record):
+        return self._string("name", record)
+
+    def formula(self, record):
+        return self._string("formula", record)
+
+    def search_name(self, prefix, limit=20):
+        """Records with a name or alias starting with ``prefix``."""
+        prefix = prefix.strip().lower()
+        keys = _Keys(self)
+        records = {}
+        for i in range(bisect.bisect_left(keys, prefix), self.key_count):
+            if (limit is not None and len(records) >= limit) or not keys[i].startswith(prefix):
+                break
+            records.setdefault(int(self.key_records[i]), None)
+        return list(records)
+
+    def search_composition(self, minimum=None, maximum=None, exact=False, limit=20):
+        """Records whose element counts lie within ``minimum``/``maximum``.
+
+        Both are ``{element: count}``; with ``exact`` every element not in
+        ``minimum`` must be absent, which turns it into a formula search.
+        """
+        minimum = minimum or {}
+        maximum = dict(maximum or {})
+        if any(e not in self.elements for e, n in minimum.items() if n > 0):
+            return []
+        if exact:
+            maximum = {e: minimum.get(e, 0) for e in self.elements}
+        mask = np.ones(self.count, dtype=bool)
+        for element, count in minimum.items():
+            if element in self.elements:
+                mask &= self.composition[:, self.elements.index(element)] >= count
+        for element, count in maximum.items():
+            if element in self.elements:
+                mask &= self.composition[:, self.elements.index(element)] <= count
+        return np.flatnonzero(mask)[:limit].tolist()
+
+    def search_formula(self, formula, limit=20):
+        counts = parse_formula(formula) if isinstance(formula, str) else formula
+        if not counts:
+            return []
+        return self.search_composition(counts, exact=True, limit=limit)
+
+    def search(self, query, contains=(), limit=20):
+        """Formula matches for ``query`` followed by name-prefix matches.
+
+        ``contains`` lists elements every hit must have.
+        """
+        required = {element: 1 for element in contains}
+        if not query.strip():
+            return self.search_composition(required, limit=limit) if required else []
+        hits = dict.fromkeys(self.search_formula(query, limit=None))
+        hits.update(dict.fromkeys(self.search_name(query, limit=None if required else limit)))
+        return [r for r in hits if self._has(r, required)][:limit]
+
+    def _has(self, record, required):
+        return all(
+            element in self.elements
+            and self.composition[record, self.elements.index(element)] >= count
+            for element, count in required.items()
+        )
+
+    def pieces(self, record, origin=(0.0, 0.0)):
+        """The record's pieces with fresh ids, shifted by ``origin``."""
+        start, end = self.piece_offsets[record], self.piece_offsets[record + 1]
+        compact = json.loads(zlib.decompress(bytes(self._sections["piece_blob"][start:end])))
+        ox, oy = origin
+        return {
+            new_piece_id(): {"x": x + ox, "y": y + oy, "label": label, "type": _TYPE_NAMES[kind]}
+            for label, kind, x, y in compact
+        }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python -m lewis_core.library build")
+    print(f"indexed {build_index()} molecules into {INDEX_PATH}")
@@ -0,0 +1,190 @@
+"""Load test: many simulated builder sessions on one server process.
+
+Each session is a thread standing in for a browser. It sends piece events
+at random intervals, and for every event it performs what a rerun of
+Lewis_Builder_Full_V4.py does with it, through the same ``BuilderRun``:
+checking the session out of the registry, admitting the payload through the
+throttle, building the canvas page for both tabs, submitting and polling the
+shared background analysis, serializing the pieces for the JSON view and
+releasing the session. Streamlit's own websocket and delta overhead is not
+included.
+
+    python -m lewis_core.loadtest --sessions 1,10,25,50 --duration 20
+
+Sessions can also be driven by a recording made with ``LEWIS_RECORD_EVENTS``
+(``--trace``); recorded sessions are handed out round-robin and replayed
+at their original pace.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from .canvas import INORGANIC_ATOMS, ORGANIC_ATOMS
+from .events import piece_events
+from .importer import import_structure
+from .pieces import new_piece_id
+from .profiling import Profiler
+from .replay import latency_stats, read_recording
+from .rerun import BuilderRun
+from .session import SessionRegistry, deep_sizeof
+from .workers import AnalysisPool
+
+# Molecules the synthetic students start from
+STARTING_SMILES = ["CC(=O)O", "c1ccccc1", "CCO", "NC(=O)N", "OC(=O)CC(O)(CC(=O)O)C(=O)O"]
+
+
+def rss_mb():
+    """Resident set size of this process in MB, where the OS tells us."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class SimulatedSession:
+    """One browser: its session id plus the rerun the app performs per event."""
+
+    def __init__(self, registry, pool, profiler=None):
+        self.registry = registry
+        self.pool = pool
+        self.profiler = profiler
+        self.session_id = None
+        # The state as of the last rerun; only read between reruns of this thread
+        self.state = None
+        self.latencies = []
+
+    def rerun(self, payload):
+        """One script run of the builder for an incoming payload."""
+        began = time.perf_counter()
+        run = BuilderRun(self.registry, self.pool, self.profiler, self.session_id)
+        self.session_id, self.state = run.session_id, run.state
+        try:
+            run.receive(payload)
+            run.canvas_html(ORGANIC_ATOMS)
+            run.canvas_html(INORGANIC_ATOMS)
+            run.analysis()
+            run.pieces_json()
+        finally:
+            run.close()
+        self.latencies.append(time.perf_counter() - began)
+
+    def start_synthetic(self, rng):
+        """Imports a starting molecule, as a student loading an exercise would."""
+        pieces = import_structure(rng.choice(STARTING_SMILES), origin=(rng.uniform(0, 400), 80))
+        self.rerun(piece_events(pieces))
+
+    def synthetic_event(self, rng):
+        """Mostly drags, sometimes a new glyph or a deletion."""
+        pieces = self.state["pieces"] if self.state is not None else {}
+        roll = rng.random()
+        if roll < 0.1 or not pieces:
+            label, kind = rng.choice([("C", "atom"), ("O", "atom"), ("-", "bond"), ("••", "electron")])
+            return {"id": new_piece_id(), "x": rng.uniform(0, 900), "y": rng.uniform(60, 600),
+                    "deleted": False, "label": label, "type": kind}
+        pid = rng.choice(list(pieces))
+        if roll < 0.15:
+            return {"id": pid, "deleted": True}
+        piece = pieces[pid]
+        return {"id": pid, "x": piece["x"] + rng.uniform(-40, 40), "y": piece["y"] + rng.uniform(-40, 40),
+                "deleted": False}
+
+
+def run_level(sessions, duration, interval, traces=None, workers=4, seed=0):
+    """Runs ``sessions`` concurrent sessions for ``duration`` seconds.
+
+    Sessions live in a registry of their own, in a temporary directory, with
+    a ceiling high enough that none is evicted during the run.
+    """
+    pool = AnalysisPool(max_workers=workers)
+    directory = tempfile.mkdtemp(prefix="lewis-loadtest-")
+    registry = SessionRegistry(directory, ceiling_mb=2 ** 20, on_evict=pool.drop)
+    profiler = Profiler()
+    gc.collect()
+    rss_before = rss_mb()
+    simulated = [SimulatedSession(registry, pool, profiler) for _ in range(sessions)]
+    stop = time.perf_counter() + duration
+
+    def drive(index, session):
+        rng = random.Random(seed + index)
+        if traces:
+            records = traces[index % len(traces)]
+            first, started = records[0]["t"], time.perf_counter()
+            for record in records:
+                delay = (record["t"] - first) - (time.perf_counter() - started)
+                if time.perf_counter() + max(delay, 0) >= stop:
+                    return
+                if delay > 0:
+                    time.sleep(delay)
+                session.rerun(record["payload"])
+            return
+        session.start_synthetic(rng)
+        while True:
+            pause = rng.expovariate(1 / interval)
+            if time.perf_counter() + pause >= stop:
+                return
+            time.sleep(pause)
+            session.rerun({"events": [session.synthetic_event(rng)]})
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive, args=(i, s), daemon=True) for i, s in enumerate(simulated)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = latency_stats([x for s in simulated for x in s.latencies], elapsed)
+    stats["sessions"] = sessions
+    stats["kb_per_session"] = round(
+        sum(deep_sizeof(s.state) for s in simulated if s.state is not None) / sessions / 1024, 1
+    )
+    rss_after = rss_mb()
+    if rss_before is not None and rss_after is not None:
+        stats["rss_mb"] = round(rss_after, 1)
+        stats["rss_growth_mb"] = round(rss_after - rss_before, 1)
+    pool.executor.shutdown(wait=True)
+    shutil.rmtree(directory, ignore_errors=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent builder sessions.")
+    parser.add_argument("--sessions", default="1,5,10,25,50",
+                        help="comma-separated session counts to run in turn")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="mean seconds between one student's events")
+    parser.add_argument("--trace", help="drive sessions from a LEWIS_RECORD_EVENTS recording")
+    parser.add_argument("--workers", type=int, default=4, help="analysis worker threads")
+    parser.add_argument("--json", action="store_true", help="print JSON lines instead of a table")
+    args = parser.parse_args(argv)
+
+    traces = None
+    if args.trace:
+        by_session = {}
+        for record in read_recording(args.trace):
+            by_session.setdefault(record["session"], []).append(record)
+        traces = list(by_session.values())
+
+    columns = ["sessions", "events", "events_per_s", "p50_ms", "p95_ms", "p99_ms", "max_ms",
+               "kb_per_session", "rss_mb"]
+    if not args.json:
+        print("  ".join(f"{c:>14}" for c in columns))
+    for level in [int(n) for n in args.sessions.split(",")]:
+        stats = run_level(level, args.duration, args.interval, traces, args.workers)
+        if args.json:
+            print(json.dumps(stats))
+        else:
+            print("  ".join(f"{str(stats.get(c, '-')):>14}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
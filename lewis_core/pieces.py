@@ -0,0 +1,113 @@
+"""Piece model shared by the builder scripts and the headless helpers.
+
+A piece is what the canvas shows and what ``st.session_state.pieces`` stores:
+``{"x": ..., "y": ..., "label": ..., "type": ...}`` keyed by the piece id,
+where ``x``/``y`` are the element's top-left corner in canvas pixels.
+"""
+
+import math
+import random
+import string
+
+# -----------------------------
+#  GLYPHS
+# -----------------------------
+
+PIECE_FONT_PX = 48
+VERTICAL_DASH_FONT_PX = 24
+
+# Chemistry meaning of the palette glyphs
+BOND_ORDERS = {"-": 1, "=": 2, "≡": 3}
+BOND_LABELS = {order: label for label, order in BOND_ORDERS.items()}
+
+# Every electron glyph in ELECTRON_PAIRS stands for one pair
+ELECTRON_GLYPHS = {"|": 2, "••": 2, ":": 2}
+
+VALENCE_ELECTRONS = {
+    "H": 1, "B": 3, "C": 4, "N": 5, "O": 6, "F": 7,
+    "Si": 4, "P": 5, "S": 6, "Cl": 7, "Br": 7, "I": 7,
+}
+
+# Elements that never exceed an octet in a correct Lewis structure
+STRICT_OCTET = {"H", "B", "C", "N", "O", "F"}
+
+_ID_ALPHABET = string.ascii_lowercase + string.digits
+
+
+def hill_formula(counts):
+    """Formats ``{element: count}`` in Hill order (C, H, then alphabetical)."""
+    counts = {element: n for element, n in counts.items() if n > 0}
+    if "C" in counts:
+        order = ["C"] + (["H"] if "H" in counts else [])
+        order += sorted(e for e in counts if e not in ("C", "H"))
+    else:
+        order = sorted(counts)
+    return "".join(e + (str(counts[e]) if counts[e] > 1 else "") for e in order)
+
+
+def new_piece_id():
+    """Returns an id in the same shape createPiece() uses on the client."""
+    return "piece-" + "".join(random.choices(_ID_ALPHABET, k=9))
+
+
+def new_piece_ids(count):
+    """``count`` ids from ``new_piece_id``, drawn in one call for bulk loads."""
+    chars = "".join(random.choices(_ID_ALPHABET, k=9 * count))
+    return ["piece-" + chars[i:i + 9] for i in range(0, 9 * count, 9)]
+
+
+# -----------------------------
+#  VALIDATION
+# -----------------------------
+
+def is_glyph(label, piece_type):
+    """True if a piece may carry this label and type: both non-empty text."""
+    return isinstance(label, str) and isinstance(piece_type, str) and bool(label) and bool(piece_type)
+
+
+def is_piece(piece):
+    """True for a complete piece: a glyph (see ``is_glyph``) at finite x, y.
+
+    Anything stored, encoded or mounted on the canvas must pass this; a
+    piece without a label cannot be drawn or written to a snapshot.
+    """
+    if not is_glyph(piece.get("label"), piece.get("type")):
+        return False
+    for axis in ("x", "y"):
+        value = piece.get(axis)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return False
+    return True
+
+
+# -----------------------------
+#  GEOMETRY
+# -----------------------------
+
+def piece_font_px(label):
+    """Font size the canvas CSS gives a piece with this label."""
+    return VERTICAL_DASH_FONT_PX if label == "|" else PIECE_FONT_PX
+
+
+def piece_size(label):
+    """Approximate rendered (width, height) of a piece in canvas pixels."""
+    font = piece_font_px(label)
+    width = max(1, len(label or "")) * font * 0.6
+    return width, font * 1.15
+
+
+def piece_center(piece):
+    """Center of a stored piece, which itself only records its top-left corner."""
+    width, height = piece_size(piece.get("label"))
+    return piece["x"] + width / 2, piece["y"] + height / 2
+
+
+def centered_piece(label, piece_type, cx, cy):
+    """Builds a piece whose glyph is centered on (cx, cy)."""
+    width, height = piece_size(label)
+    return {
+        "x": round(cx - width / 2, 1),
+        "y": round(cy - height / 2, 1),
+        "label": label,
+        "type": piece_type,
+    }
@@ -0,0 +1,207 @@
+"""On-demand cProfile and tracemalloc captures of chosen sessions.
+
+Profiling every rerun of every session would slow the server for all of
+them, so nothing is captured until ``Profiler.arm`` picks one session and
+a number of reruns. Each of those reruns runs under cProfile between
+``begin`` and ``end``, and the analysis jobs it submits through ``wrap``
+are profiled in the worker thread and added to the same statistics.
+
+tracemalloc traces the whole process, so while any capture is running it
+is started, and a rerun's allocations are the difference between the
+snapshots taken at its start and end. Allocations by other sessions that
+run at the same moment show up in it too. Tracing stops again once the
+last capture is done, unless something else had started it.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Frames kept per allocation traceback
+TRACE_FRAMES = 8
+
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+class SessionProfile:
+    """Everything captured for one armed session.
+
+    * ``requested`` / ``captured``: reruns asked for and reruns done
+    * ``stats``: merged ``pstats.Stats`` of the reruns and analysis jobs
+    * ``allocations``: ``{traceback: [bytes, blocks]}`` net of each rerun
+    * ``peak``: the largest traced memory seen during a rerun, in bytes
+    """
+
+    def __init__(self, session_id, runs):
+        self.session_id = session_id
+        self.requested = runs
+        self.captured = 0
+        self.jobs = 0
+        self.seconds = 0.0
+        self.peak = 0
+        self.stats = None
+        self.allocations = {}
+        self.armed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    @property
+    def remaining(self):
+        return self.requested - self.captured
+
+    def _add_profile(self, profile):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def pstats_bytes(self):
+        """The merged statistics in the file format of ``Stats.dump_stats``."""
+        return marshal.dumps(self.stats.stats) if self.stats is not None else b""
+
+    def report(self, limit=30):
+        """Plain-text summary: slowest functions, then the largest allocations."""
+        out = io.StringIO()
+        out.write(
+            f"Session {self.session_id}: {self.captured} of {self.requested} rerun(s), "
+            f"{self.jobs} analysis job(s), {self.seconds:.3f} s in reruns, "
+            f"peak traced memory {self.peak / 2 ** 20:.1f} MB\n\n"
+        )
+        if self.stats is not None:
+            stream, self.stats.stream = self.stats.stream, out
+            self.stats.sort_stats("cumulative").print_stats(limit)
+            self.stats.stream = stream
+
+        out.write(f"Top {limit} allocations (net over the captured reruns)\n\n")
+        top = sorted(self.allocations.items(), key=lambda item: -abs(item[1][0]))[:limit]
+        for traceback, (size, count) in top:
+            out.write(f"{size / 1024:+10.1f} KiB {count:+8d} blocks\n")
+            for line in traceback.format():
+                out.write(f"    {line}\n")
+        if not top:
+            out.write("    (nothing captured yet)\n")
+        return out.getvalue()
+
+
+class _Capture:
+    def __init__(self, profile):
+        self.profile = profile
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.before = None
+        self.ended = False
+
+
+class Profiler:
+    """Armed sessions and their captures, shared by every session of the app."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._open = {}
+        self._active = 0
+        self._started_tracing = False
+
+    def arm(self, session_id, runs):
+        """Captures the next ``runs`` reruns of ``session_id``, dropping older results."""
+        with self._lock:
+            self._profiles[session_id] = SessionProfile(session_id, runs)
+
+    def disarm(self, session_id):
+        with self._lock:
+            self._profiles.pop(session_id, None)
+
+    def profiles(self):
+        """Every armed or finished capture, newest first."""
+        with self._lock:
+            return sorted(self._profiles.values(), key=lambda profile: profile.armed_at, reverse=True)
+
+    def begin(self, session_id):
+        """Starts capturing this rerun if the session is armed; returns the
+        capture to hand to ``end``, or None.
+
+        Streamlit abandons a rerun when a newer one is requested, so a
+        capture the last rerun never ended is ended here first.
+        """
+        with self._lock:
+            stale = self._open.pop(session_id, None)
+        if stale is not None:
+            self.end(stale)
+        with self._lock:
+            profile = self._profiles.get(session_id)
+            if profile is None or profile.remaining <= 0:
+                return None
+            profile.captured += 1
+            self._active += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACE_FRAMES)
+                self._started_tracing = True
+            capture = self._open[session_id] = _Capture(profile)
+        tracemalloc.reset_peak()
+        capture.before = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        try:
+            capture.profiler.enable()
+        except ValueError:
+            # Another profiler is running in this interpreter; keep the allocations only
+            capture.profiler = None
+        return capture
+
+    def end(self, capture):
+        with self._lock:
+            if capture is None or capture.ended:
+                return
+            capture.ended = True
+            if self._open.get(capture.profile.session_id) is capture:
+                del self._open[capture.profile.session_id]
+        if capture.profiler is not None:
+            capture.profiler.disable()
+        elapsed = time.perf_counter() - capture.started
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        diff = after.compare_to(capture.before, "traceback")
+
+        profile = capture.profile
+        with self._lock:
+            if capture.profiler is not None:
+                profile._add_profile(capture.profiler)
+            profile.seconds += elapsed
+            profile.peak = max(profile.peak, peak)
+            for stat in diff:
+                if stat.size_diff or stat.count_diff:
+                    total = profile.allocations.setdefault(stat.traceback, [0, 0])
+                    total[0] += stat.size_diff
+                    total[1] += stat.count_diff
+            self._active -= 1
+            if not self._active and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def wrap(self, capture, fn):
+        """``fn``, profiled in whichever thread runs it, if ``capture`` is a
+        capture from ``begin``; the analysis jobs a captured rerun submits
+        count towards its session."""
+        if capture is None:
+            return fn
+        profile = capture.profile
+
+        def profiled(*args, **kwargs):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                with self._lock:
+                    profile._add_profile(profiler)
+                    profile.jobs += 1
+
+        return profiled
@@ -0,0 +1,121 @@
+"""Per-session rate limiting of the piece events posted by the canvas.
+
+Every value the component posts triggers a rerun of the whole builder
+script. ``EventThrottle`` lets a session's events through at a sustained
+rate with some burst; what arrives faster waits in the throttle, with
+later events for a piece merged into the waiting one, until the bucket
+has refilled. The canvas is told how long to hold its next post, so a
+flooding client backs off instead of queueing reruns.
+"""
+
+import time
+
+from .events import iter_events
+
+# Sustained and burst allowance, in tokens; a payload costs one token plus
+# one per EVENTS_PER_TOKEN events, so large group moves cost a little more
+TOKENS_PER_SECOND = 10.0
+BURST_TOKENS = 20.0
+EVENTS_PER_TOKEN = 100
+
+# Waiting pieces kept per session; events for further pieces are dropped
+MAX_PENDING = 10000
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``burst``.
+
+    A cost larger than ``burst`` is let through once the bucket is full and
+    leaves it in debt, so an oversized request waits its turn instead of
+    never passing.
+    """
+
+    def __init__(self, rate=TOKENS_PER_SECOND, burst=BURST_TOKENS):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, cost=1.0, now=None):
+        """Spends ``cost`` tokens if they are available; returns whether it did."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens < min(cost, self.burst):
+            return False
+        self.tokens -= cost
+        return True
+
+    def wait(self, cost=1.0, now=None):
+        """Seconds until ``take(cost)`` would succeed."""
+        self._refill(time.monotonic() if now is None else now)
+        return max(0.0, (min(cost, self.burst) - self.tokens) / self.rate)
+
+
+def _merge(waiting, event):
+    """Folds ``event`` into the event already waiting for the same piece."""
+    if waiting is None or waiting.get("deleted") or event.get("deleted"):
+        return dict(event)
+    # A move after a create keeps the create's label and type
+    waiting.update((key, value) for key, value in event.items() if value is not None)
+    return waiting
+
+
+def payload_cost(events):
+    return 1 + len(events) // EVENTS_PER_TOKEN
+
+
+class EventThrottle:
+    """Admits one session's incoming payloads under a ``TokenBucket``.
+
+    ``admit`` returns the bulk payload to hand to ``ingest`` now: every
+    waiting event when the bucket allows it, otherwise none. Counters:
+
+    * ``throttled``: payloads held back
+    * ``coalesced``: events merged into one already waiting for their piece
+    * ``dropped``: events lost because ``MAX_PENDING`` pieces were waiting
+    """
+
+    def __init__(self, rate=TOKENS_PER_SECOND, burst=BURST_TOKENS, max_pending=MAX_PENDING):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_pending = max_pending
+        self.pending = {}
+        self.throttled = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def admit(self, payload, now=None):
+        for event in iter_events(payload):
+            pid = event["id"]
+            if pid in self.pending:
+                self.coalesced += 1
+            elif len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                continue
+            self.pending[pid] = _merge(self.pending.get(pid), event)
+
+        if not self.pending:
+            return {"events": []}
+        events = list(self.pending.values())
+        if not self.bucket.take(payload_cost(events), now):
+            self.throttled += 1
+            return {"events": []}
+        self.pending = {}
+        return {"events": events}
+
+    def hint(self, now=None):
+        """What the canvas should know before posting again.
+
+        ``interval_ms`` is the sustained spacing of posts, ``retry_after_ms``
+        how long the events still waiting here need before they can go
+        through, and ``pending`` how many pieces they cover.
+        """
+        waiting = list(self.pending.values())
+        retry = self.bucket.wait(payload_cost(waiting), now) if waiting else 0.0
+        return {
+            "interval_ms": round(1000 / self.bucket.rate),
+            "retry_after_ms": round(1000 * retry),
+            "pending": len(waiting),
+        }
@@ -0,0 +1,127 @@
+"""Reaction schemes drawn on the canvas, and their atom and charge balance.
+
+Arrow pieces (type ``"reaction"``, label ``"→"``) split the canvas into
+regions from left to right: step k turns what lies left of the k-th arrow
+into what lies between it and the next one, so a multi-step scheme is just
+more arrows. A molecule belongs to the region its center falls in. "+"
+signs are drawn for the reader and play no part in the grouping.
+
+``ReactionBalance`` keeps each molecule's composition, charge and region,
+and running totals per region. It is fed by ``ComponentTracker``, which
+passes only the molecules that changed or moved, so editing one species
+costs that species' size; only moving an arrow regroups every molecule.
+"""
+
+from bisect import bisect
+from collections import Counter
+
+from .pieces import hill_formula, piece_center
+
+ARROW = "→"
+PLUS = "+"
+
+
+def _species(counts):
+    """``"2 O2 + CH4"`` from ``{formula: count}``."""
+    return " + ".join(
+        f"{count} {formula}" if count > 1 else formula
+        for formula, count in sorted(counts.items())
+        if count > 0
+    )
+
+
+class _Region:
+    def __init__(self):
+        self.elements = Counter()
+        self.charge = 0
+        self.species = Counter()
+
+    def add(self, molecule, sign):
+        _, _, elements, charge, formula = molecule
+        for element, count in elements.items():
+            self.elements[element] += sign * count
+        self.charge += sign * charge
+        self.species[formula] += sign
+
+
+class ReactionBalance:
+    """Per-molecule compositions and per-region totals of a reaction scheme.
+
+    ``molecules`` maps a component root to ``(x, region, elements, charge,
+    formula)``; ``regions[k]`` sums the molecules between arrow k - 1 and
+    arrow k.
+    """
+
+    def __init__(self):
+        self.arrows = {}
+        self.cuts = []
+        self.molecules = {}
+        self.regions = [_Region()]
+
+    def update_arrows(self, changes):
+        """Follows arrow pieces in ``(pid, before, after)`` changes; returns
+        whether the regions changed."""
+        changed = False
+        for pid, before, after in changes:
+            if after is not None and after.get("type") == "reaction" and after.get("label") == ARROW:
+                x = piece_center(after)[0]
+                if self.arrows.get(pid) != x:
+                    self.arrows[pid] = x
+                    changed = True
+            elif pid in self.arrows:
+                del self.arrows[pid]
+                changed = True
+        if changed:
+            self.cuts = sorted(self.arrows.values())
+            self._regroup()
+        return changed
+
+    def _regroup(self):
+        self.regions = [_Region() for _ in range(len(self.cuts) + 1)]
+        for root, (x, _, elements, charge, formula) in self.molecules.items():
+            molecule = (x, bisect(self.cuts, x), elements, charge, formula)
+            self.molecules[root] = molecule
+            self.regions[molecule[1]].add(molecule, 1)
+
+    def refresh(self, tracker, roots):
+        """Re-reads the molecules at ``roots`` from ``tracker``; roots that
+        are no longer components are dropped."""
+        graph = tracker.graph
+        for root in roots:
+            old = self.molecules.pop(root, None)
+            if old is not None:
+                self.regions[old[1]].add(old, -1)
+            atoms = tracker.members.get(root)
+            if not atoms or root not in tracker.summaries:
+                continue
+            x = sum(graph.centers[atom][0] for atom in atoms) / len(atoms)
+            elements = Counter(graph.atoms[atom] for atom in atoms)
+            molecule = (x, bisect(self.cuts, x), elements, tracker.summaries[root]["charge"], hill_formula(elements))
+            self.molecules[root] = molecule
+            self.regions[molecule[1]].add(molecule, 1)
+
+    def steps(self):
+        """One balance check per arrow, left to right.
+
+        Each step lists its reactants and products, whether atoms and charge
+        balance, and ``missing``: the atoms the products lack (negative when
+        they have extra).
+        """
+        steps = []
+        for k in range(len(self.cuts)):
+            left, right = self.regions[k], self.regions[k + 1]
+            missing = {
+                element: left.elements[element] - right.elements[element]
+                for element in sorted(set(left.elements) | set(right.elements))
+                if left.elements[element] != right.elements[element]
+            }
+            steps.append({
+                "step": k + 1,
+                "reactants": _species(left.species),
+                "products": _species(right.species),
+                "atoms_balanced": not missing,
+                "charge_balanced": left.charge == right.charge,
+                "missing": missing,
+                "charges": (left.charge, right.charge),
+            })
+        return steps
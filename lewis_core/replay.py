@@ -0,0 +1,148 @@
+"""Records builder event streams and replays them the way the app receives them.
+
+Set ``LEWIS_RECORD_EVENTS=/path/to/events.jsonl`` before starting the app and
+every payload is appended as one JSON line as the server receives it, before
+the event throttle holds back or merges anything, so a flood replays as the
+flood it was::
+
+    {"t": 1718000000.123, "session": "3f2a...", "payload": {...}}
+
+Replaying hands the payloads to ``BuilderRun.receive``, the entry point of
+a live rerun, one fresh session per recorded session. They pass through
+the session's event throttle as live events do, either at the recorded
+pace (scaled) or as fast as possible::
+
+    python -m lewis_core.replay events.jsonl --speed 10
+    python -m lewis_core.replay events.jsonl --speed max
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+from .rerun import BuilderRun
+from .session import SessionRegistry
+
+
+class EventRecorder:
+    """Appends ingested payloads to a JSON-lines file; safe to share across sessions."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, payload, session=None):
+        line = json.dumps({"t": time.time(), "session": session, "payload": payload})
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_recording(path):
+    """Yields the recorded ``{"t", "session", "payload"}`` records in order."""
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def latency_stats(latencies, elapsed):
+    """Summary of per-event latencies (seconds) over ``elapsed`` wall seconds."""
+    import numpy as np
+
+    latencies = np.asarray(latencies, dtype=float) * 1000
+    if not len(latencies):
+        return {"events": 0, "elapsed_s": round(elapsed, 3)}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "events": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "events_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "max_ms": round(latencies.max(), 3),
+    }
+
+
+def _receive(registry, session_id, payload):
+    """One rerun's worth of ingestion: the session checked out, the payload
+    received through its throttle, the session released."""
+    run = BuilderRun(registry, None, session_id=session_id)
+    try:
+        run.receive(payload)
+    finally:
+        run.close()
+    return run.session_id, run.state
+
+
+def replay(records, speed=1.0):
+    """Feeds recorded payloads to ``BuilderRun.receive``; ``speed=None`` means no waiting.
+
+    Each recorded session gets a session of its own, in a registry kept in
+    a temporary directory for the replay. Payloads replayed faster than the
+    throttle allows wait and merge in it as a flood from a browser would.
+    Once the recording ends, what is still waiting is collected as the
+    canvas collects it: an empty post once ``retry_after_ms`` has passed.
+    The analysis is not run. Returns ``(stats, states)`` where ``stats``
+    summarizes the time spent receiving each recorded payload.
+    """
+    directory = tempfile.mkdtemp(prefix="lewis-replay-")
+    registry = SessionRegistry(directory, ceiling_mb=2 ** 20)
+    ids, states = {}, {}
+    latencies = []
+    first = None
+    start = time.perf_counter()
+
+    try:
+        for record in records:
+            if speed:
+                first = record["t"] if first is None else first
+                delay = (record["t"] - first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            began = time.perf_counter()
+            session_id, state = _receive(registry, ids.get(record["session"]), record["payload"])
+            latencies.append(time.perf_counter() - began)
+            ids[record["session"]] = session_id
+            states[record["session"]] = state
+
+        for session, state in states.items():
+            while state["throttle"].pending:
+                time.sleep(state["throttle"].hint()["retry_after_ms"] / 1000)
+                _, state = _receive(registry, ids[session], {"events": []})
+            states[session] = state
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    stats["throttled"] = sum(state["throttle"].throttled for state in states.values())
+    return stats, states
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded builder event stream.")
+    parser.add_argument("recording", help="JSON-lines file written with LEWIS_RECORD_EVENTS")
+    parser.add_argument(
+        "--speed", default="1",
+        help="playback speed multiplier (1, 10, ...) or 'max' for no waiting",
+    )
+    args = parser.parse_args(argv)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    stats, states = replay(read_recording(args.recording), speed)
+    stats["sessions"] = len(states)
+    stats["pieces"] = sum(len(state["pieces"]) for state in states.values())
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
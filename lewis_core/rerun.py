@@ -0,0 +1,107 @@
+"""One script run of the builder for one session, without Streamlit.
+
+Lewis_Builder_Full_V4.py and the load test both go through ``BuilderRun``,
+so the load test measures the path the app actually runs: checking the
+session out of the registry, profiling armed sessions, admitting canvas
+events through the throttle, building the canvas pages and polling the
+background analysis. The app puts its widgets between these steps.
+"""
+
+import json
+
+from .canvas import builder_page, throttle_json
+from .events import ingest, record_payload
+from .pieces import is_piece
+from .workers import analyze_scheme
+
+
+class BuilderRun:
+    """One rerun: checked out on construction, released by ``close``.
+
+    ``registry`` is the ``SessionRegistry``, ``pool`` the shared
+    ``AnalysisPool`` and ``profiler`` the ``Profiler`` (or None). The state
+    is only valid until ``close``; the id to keep for the next rerun is
+    ``session_id``.
+    """
+
+    def __init__(self, registry, pool, profiler=None, session_id=None):
+        self.registry = registry
+        self.pool = pool
+        self.profiler = profiler
+        self.state = registry.checkout(session_id)
+        self.session_id = self.state["session_id"]
+        # None unless an admin armed this session
+        self.capture = profiler.begin(self.session_id) if profiler is not None else None
+        self._mounted = None
+        self._hint = None
+
+    def receive(self, payload):
+        """Ingests a canvas payload; events over the rate wait in the throttle.
+
+        The payload is recorded as received, before the throttle holds it
+        back or merges it with the events waiting there.
+        """
+        record_payload(self.state, payload)
+        changes = ingest(self.state, self.state["throttle"].admit(payload), record=False)
+        self._mounted = self._hint = None
+        return changes
+
+    @property
+    def throttle(self):
+        """How fast the canvas may post, as of this rerun's event."""
+        if self._hint is None:
+            self._hint = self.state["throttle"].hint()
+        return self._hint
+
+    @property
+    def mounted(self):
+        """Every piece of the session with its id, for the canvas to rehydrate from.
+
+        Incomplete pieces (left by sessions saved before events were checked)
+        are not sent; the page could not draw them.
+        """
+        if self._mounted is None:
+            self._mounted = [
+                dict(piece, id=pid) for pid, piece in self.state["pieces"].items() if is_piece(piece)
+            ]
+        return self._mounted
+
+    def canvas_html(self, atom_list):
+        """The builder page for one palette, rebuilt from the server's pieces.
+
+        The page is kept per palette until the pieces change, so a rerun
+        whose events all wait in the throttle only fills in the new hint.
+        """
+        head, tail = self._rendered(tuple(atom_list), lambda: builder_page(atom_list, self.mounted))
+        return head + throttle_json(self.throttle) + tail
+
+    def pieces_json(self):
+        """The pieces as JSON, for the app's JSON view; kept like the pages."""
+        return self._rendered("json", lambda: json.dumps(self.state["pieces"]))
+
+    def _rendered(self, key, build):
+        rendered = self.state.setdefault("rendered", {})
+        revision = self.state.get("revision", 0)
+        if key not in rendered or rendered[key][0] != revision:
+            rendered[key] = (revision, build())
+        return rendered[key][1]
+
+    def analysis(self):
+        """Submits the scheme analysis if needed; returns the latest outcome.
+
+        Only the newest edit matters, so a job is submitted only when there are
+        updates the worker has not seen (or nothing was ever analyzed), and
+        older queued jobs are superseded. The outcome is ``(result, error,
+        current)`` as ``AnalysisPool.latest`` gives it, or None.
+        """
+        pool, session, deferred = self.pool, self.session_id, self.state["components"]
+        if deferred.pending or not (pool.latest(session, "molecules") or pool.busy(session, "molecules")):
+            job = analyze_scheme if self.profiler is None else self.profiler.wrap(self.capture, analyze_scheme)
+            pool.submit(session, "molecules", job, deferred)
+        return pool.latest(session, "molecules")
+
+    def close(self):
+        """Ends the rerun: releases the session and closes the capture."""
+        self.registry.release(self.state)
+        if self.profiler is not None:
+            self.profiler.end(self.capture)
@@ -0,0 +1,191 @@
+"""Ring perception and Hückel aromaticity on the drawn graph.
+
+``smallest_rings`` returns the smallest set of smallest rings (a minimum
+cycle basis) of one molecule. Candidates are Horton's cycles, each made of
+two shortest paths from an atom joined by one bond, tried shortest first
+and kept when they are independent of the rings kept so far (bonds as
+bits, eliminated over GF(2)). Atoms on chains and branches never lie on a
+ring, so the search only runs on what is left after stripping them.
+
+``aromatic_rings`` flags each ring by Hückel's 4n + 2 rule, counting the
+electrons the drawn Lewis structure puts into each ring atom's p orbital.
+"""
+
+from collections import deque
+
+
+def _bonds_of(graph, atom):
+    """``{neighbor: order}`` of one atom, with duplicate bond glyphs merged."""
+    bonds = {}
+    for neighbor, order in graph.neighbors(atom):
+        bonds[neighbor] = bonds.get(neighbor, 0) + order
+    return bonds
+
+
+def _ring_core(adjacency):
+    """Neighbor sets of the atoms left after repeatedly removing those with < 2 bonds."""
+    core = {atom: set(neighbors) for atom, neighbors in adjacency.items()}
+    queue = deque(atom for atom, neighbors in core.items() if len(neighbors) < 2)
+    while queue:
+        atom = queue.popleft()
+        if atom not in core:
+            continue
+        for neighbor in core.pop(atom):
+            core[neighbor].discard(atom)
+            if len(core[neighbor]) < 2:
+                queue.append(neighbor)
+    return core
+
+
+def _pieces_of(core):
+    """Connected pieces of the ring core, each as a set of atoms."""
+    seen, pieces = set(), []
+    for start in core:
+        if start in seen:
+            continue
+        piece, stack = {start}, [start]
+        while stack:
+            for neighbor in core[stack.pop()]:
+                if neighbor not in piece:
+                    piece.add(neighbor)
+                    stack.append(neighbor)
+        seen |= piece
+        pieces.append(piece)
+    return pieces
+
+
+def _basis(core, atoms):
+    """Minimum cycle basis of one connected piece of the ring core."""
+    edges = sorted((a, b) for a in atoms for b in core[a] if a < b)
+    wanted = len(edges) - len(atoms) + 1
+    if wanted <= 0:
+        return []
+    bit = {edge: 1 << i for i, edge in enumerate(edges)}
+
+    def edge_bit(a, b):
+        return bit[(a, b) if a < b else (b, a)]
+
+    candidates = {}
+    for root in sorted(atoms):
+        parent, order = {root: None}, [root]
+        for atom in order:
+            for neighbor in sorted(core[atom]):
+                if neighbor not in parent:
+                    parent[neighbor] = atom
+                    order.append(neighbor)
+
+        def path(atom):
+            walk = [atom]
+            while parent[walk[-1]] is not None:
+                walk.append(parent[walk[-1]])
+            return walk
+
+        for x, y in edges:
+            if parent[x] == y or parent[y] == x:
+                continue
+            to_x, to_y = path(x), path(y)
+            if set(to_x) & set(to_y) != {root}:
+                continue
+            ring = to_x[::-1] + to_y[:-1]
+            bits = 0
+            for a, b in zip(ring, ring[1:] + ring[:1]):
+                bits ^= edge_bit(a, b)
+            if bits not in candidates or len(ring) < len(candidates[bits]):
+                candidates[bits] = ring
+
+    pivots, rings = {}, []
+    for bits, ring in sorted(candidates.items(), key=lambda item: (len(item[1]), item[1])):
+        reduced = bits
+        while reduced:
+            top = reduced.bit_length() - 1
+            if top not in pivots:
+                pivots[top] = reduced
+                rings.append(ring)
+                break
+            reduced ^= pivots[top]
+        if len(rings) == wanted:
+            break
+    return rings
+
+
+def smallest_rings(graph, atoms):
+    """SSSR of the molecule made of ``atoms``: a list of rings, each a list
+    of atom ids in ring order, smallest rings first."""
+    core = _ring_core({atom: _bonds_of(graph, atom) for atom in atoms})
+    rings = []
+    for piece in _pieces_of(core):
+        rings.extend(_basis(core, piece))
+    return sorted(rings, key=lambda ring: (len(ring), ring))
+
+
+def _ring_systems(rings):
+    """Groups ring indices into fused systems (rings sharing a bond)."""
+    owner = list(range(len(rings)))
+
+    def find(i):
+        while owner[i] != i:
+            owner[i] = owner[owner[i]]
+            i = owner[i]
+        return i
+
+    by_bond = {}
+    for i, ring in enumerate(rings):
+        for a, b in zip(ring, ring[1:] + ring[:1]):
+            j = by_bond.setdefault((a, b) if a < b else (b, a), i)
+            owner[find(i)] = find(j)
+    systems = {}
+    for i in range(len(rings)):
+        systems.setdefault(find(i), []).append(i)
+    return list(systems.values())
+
+
+def _pi_electrons(graph, adjacency, atom, system_atoms):
+    """Electrons ``atom`` puts into the ring's pi system, or None if it is
+    saturated (no p orbital to offer)."""
+    neighbors = adjacency[atom]
+    if any(order >= 2 and other in system_atoms for other, order in neighbors.items()):
+        return 1
+    if any(order >= 2 for order in neighbors.values()):
+        # Exocyclic double bond, as in a ring C=O: an empty p orbital
+        return 0
+    lone = graph.lone_electrons(atom)
+    shell = 2 * sum(neighbors.values()) + lone
+    if lone >= 2 and shell == 8:
+        # Pyrrole N, furan O, a carbanion: the lone pair joins the ring
+        return 2
+    if lone == 0 and len(neighbors) == 3 and shell == 6:
+        # Carbocation or borane: three bonds and an empty p orbital
+        return 0
+    return None
+
+
+def _huckel(graph, adjacency, ring_atoms, system_atoms):
+    total = 0
+    for atom in ring_atoms:
+        electrons = _pi_electrons(graph, adjacency, atom, system_atoms)
+        if electrons is None:
+            return False
+        total += electrons
+    return total % 4 == 2
+
+
+def aromatic_rings(graph, rings):
+    """Hückel flag for each of ``rings``.
+
+    A ring is aromatic if its own atoms hold 4n + 2 pi electrons, or if
+    the fused system it belongs to does as a whole (azulene, where neither
+    ring passes alone).
+    """
+    adjacency = {atom: _bonds_of(graph, atom) for ring in rings for atom in ring}
+    flags = [False] * len(rings)
+    for system in _ring_systems(rings):
+        system_atoms = set()
+        for i in system:
+            system_atoms.update(rings[i])
+        for i in system:
+            flags[i] = _huckel(graph, adjacency, rings[i], system_atoms)
+        if len(system) > 1 and not all(flags[i] for i in system):
+            if _huckel(graph, adjacency, system_atoms, system_atoms):
+                for i in system:
+                    flags[i] = True
+    return flags
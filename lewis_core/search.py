@@ -0,0 +1,348 @@
+"""Saved builder structures with fingerprint-screened substructure search.
+
+``StructureStore`` keeps three append-only files in one directory:
+
+* ``structures.jsonl``: the saved sessions (name, time, pieces)
+* ``graphs.jsonl``: name, time and molecular graph of each one
+* ``fingerprints.bin``: one row of ``FINGERPRINT_WORDS`` uint64s per structure
+
+Saving appends one line to each, so the index grows incrementally and is
+never rebuilt. A search first screens every fingerprint at once with numpy
+(a structure can only contain the query if it has all of the query's bits)
+and then confirms the survivors with an exact subgraph match.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .graph import PieceGraph
+from .importer import parse_smiles
+from .pieces import VALENCE_ELECTRONS
+
+FINGERPRINT_BITS = 1024
+FINGERPRINT_WORDS = FINGERPRINT_BITS // 64
+# Longest bond path (in bonds) hashed into the fingerprint
+PATH_BONDS = 3
+# Backtracking steps allowed per candidate before it is given up on
+MATCH_LIMIT = 50000
+
+# Patterns use explicit hydrogens, so "O[H]" means an O bearing an H
+FUNCTIONAL_GROUPS = {
+    "Carboxylic acid": "C(=O)O[H]",
+    "Carboxylate": "C(=O)[O-]",
+    "Ester": "C(=O)OC",
+    "Amide": "C(=O)N",
+    "Aldehyde": "C(=O)[H]",
+    "Ketone": "CC(=O)C",
+    "Alcohol": "CO[H]",
+    "Ether": "COC",
+    "Primary amine": "CN([H])[H]",
+    "Nitrile": "C#N",
+    "Nitro": "[N+](=O)[O-]",
+    "Thiol": "CS[H]",
+    "Alkene": "C=C",
+    "Alkyne": "C#C",
+    "Benzene ring": "C1=CC=CC=C1",
+    "Alkyl halide (Cl)": "CCl",
+}
+
+# Extensions of a group's pattern that rule a match out. Each one starts
+# with the group's atoms in the same order, and those atoms must map where
+# the group's did; "*" matches any element
+GROUP_EXCLUSIONS = {
+    # Only OH on a saturated carbon; acids, enols and phenols are not alcohols
+    "Alcohol": ["C(O[H])=*", "C(O[H])#*"],
+    # Esters and anhydrides are not ethers
+    "Ether": ["C(OC)=O", "COC=O"],
+    # NH2 on an acyl carbon is an amide
+    "Primary amine": ["C(N([H])[H])=O"],
+    # The alternating bonds of an aromatic ring are not alkenes
+    "Alkene": ["C1=C*=**=*1"],
+    "Alkyl halide (Cl)": ["C(Cl)=*", "C(Cl)#*"],
+}
+
+
+class MolGraph:
+    """Bare molecular graph: element and formal charge per atom, ``{neighbor: order}`` maps.
+
+    ``exclusions`` is only set on patterns, by ``from_group``: ``(graph,
+    anchors)`` pairs whose first ``anchors`` atoms are the pattern's own.
+    """
+
+    def __init__(self, elements, bonds, charges=None):
+        self.elements = list(elements)
+        self.charges = list(charges) if charges is not None else [0] * len(self.elements)
+        self.bonds = [tuple(bond) for bond in bonds]
+        self.adjacency = [{} for _ in self.elements]
+        for a, b, order in self.bonds:
+            if a != b:
+                # Two glyphs between the same atoms add up, as in grading.Structure
+                order = self.adjacency[a].get(b, 0) + order
+                self.adjacency[a][b] = self.adjacency[b][a] = order
+        self.exclusions = []
+
+    @classmethod
+    def from_pieces(cls, pieces, charges=True):
+        """Graph of a drawing; ``charges=False`` for fragments drawn without lone pairs."""
+        graph = PieceGraph(pieces)
+        index = {pid: i for i, pid in enumerate(graph.atoms)}
+        return cls(
+            list(graph.atoms.values()),
+            [(index[a], index[b], order) for a, b, order in graph.bonds.values()],
+            [
+                VALENCE_ELECTRONS.get(element, 0) - graph.lone_electrons(pid)
+                - sum(order for _, order in graph.neighbors(pid))
+                for pid, element in graph.atoms.items()
+            ] if charges else None,
+        )
+
+    @classmethod
+    def from_smiles(cls, smiles):
+        """Pattern graph: no implicit hydrogens, bracket H counts made explicit."""
+        mol = parse_smiles(smiles, implicit_hydrogens=False)
+        mol.add_explicit_hydrogens()
+        return cls(mol.elements, mol.bonds, mol.charges)
+
+    @classmethod
+    def from_group(cls, name):
+        """Pattern of a ``FUNCTIONAL_GROUPS`` entry, with its exclusions."""
+        pattern = cls.from_smiles(FUNCTIONAL_GROUPS[name])
+        pattern.exclusions = [
+            (cls.from_smiles(smiles), len(pattern.elements)) for smiles in GROUP_EXCLUSIONS.get(name, ())
+        ]
+        return pattern
+
+    def features(self, bonds=PATH_BONDS):
+        """Yields the strings hashed into the fingerprint.
+
+        These are every simple path up to ``bonds`` long, read the same in
+        both directions, every charged atom with its charge, plus every atom
+        together with any two or three of its bonds.
+        A substructure has a subset of its parent's features.
+        """
+        for atom, element in enumerate(self.elements):
+            yield element
+            if self.charges[atom]:
+                yield f"{element}{self.charges[atom]:+d}"
+            branches = sorted(f"{order}{self.elements[n]}" for n, order in self.adjacency[atom].items())
+            for size in (2, 3):
+                for combination in itertools.combinations(branches, size):
+                    yield element + "".join(f"({branch})" for branch in combination)
+        stack = [(start, (start,), (self.elements[start],)) for start in range(len(self.elements))]
+        while stack:
+            atom, visited, path = stack.pop()
+            if len(visited) > bonds:
+                continue
+            for neighbor, order in self.adjacency[atom].items():
+                if neighbor in visited:
+                    continue
+                walked = path + (str(order), self.elements[neighbor])
+                yield min("".join(walked), "".join(reversed(walked)))
+                stack.append((neighbor, visited + (neighbor,), walked))
+
+    def fingerprint(self):
+        """``FINGERPRINT_WORDS`` uint64s with one bit set per hashed feature."""
+        bits = np.zeros(FINGERPRINT_BITS, dtype=bool)
+        for feature in set(self.features()):
+            bits[zlib.crc32(feature.encode()) % FINGERPRINT_BITS] = True
+        return np.packbits(bits, bitorder="little").view("<u8")
+
+
+def contains(target, pattern, limit=MATCH_LIMIT, order=None, pinned=None):
+    """True when ``pattern`` maps into ``target`` preserving elements and bond orders.
+
+    Charged pattern atoms must match an atom with the same formal charge;
+    neutral ones match regardless, as patterns carry no lone pairs. A
+    mapping that also fits one of the pattern's exclusions does not count.
+    ``pinned`` fixes some pattern atoms to target atoms up front.
+    """
+    if len(pattern.elements) > len(target.elements):
+        return False
+    pinned = pinned or {}
+    order = order or _pattern_order(pattern, pinned)
+    by_element = {}
+    for atom, element in enumerate(target.elements):
+        by_element.setdefault(element, []).append(atom)
+    by_element["*"] = range(len(target.elements))
+    mapping, used = dict(pinned), set(pinned.values())
+    budget = [limit]
+
+    def excluded():
+        return any(
+            contains(target, exclusion, limit, pinned={atom: mapping[atom] for atom in range(anchors)})
+            for exclusion, anchors in pattern.exclusions
+        )
+
+    def extend(depth):
+        if depth == len(order):
+            return not excluded()
+        atom = order[depth]
+        element = pattern.elements[atom]
+        charge = pattern.charges[atom]
+        degree = len(pattern.adjacency[atom])
+        anchor = next((n for n in pattern.adjacency[atom] if n in mapping), None)
+        pool = target.adjacency[mapping[anchor]] if anchor is not None else by_element.get(element, ())
+        for candidate in pool:
+            budget[0] -= 1
+            if budget[0] < 0:
+                return False
+            if (candidate in used or element not in ("*", target.elements[candidate])
+                    or len(target.adjacency[candidate]) < degree
+                    or (charge and target.charges[candidate] != charge)):
+                continue
+            if any(
+                target.adjacency[candidate].get(mapping[n]) != bond
+                for n, bond in pattern.adjacency[atom].items()
+                if n in mapping
+            ):
+                continue
+            mapping[atom] = candidate
+            used.add(candidate)
+            if extend(depth + 1):
+                return True
+            del mapping[atom]
+            used.discard(candidate)
+        return False
+
+    return extend(0)
+
+
+def _pattern_order(pattern, pinned=()):
+    """Heavy atoms first, then breadth-first so each atom has a mapped neighbor.
+
+    Pinned atoms are already mapped, so the walk starts from them.
+    """
+    start_order = list(pinned) + sorted(
+        range(len(pattern.elements)),
+        key=lambda i: (pattern.elements[i] == "H", -len(pattern.adjacency[i])),
+    )
+    seen, order = set(), []
+    for start in start_order:
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = [start]
+        while queue:
+            atom = queue.pop(0)
+            order.append(atom)
+            for neighbor in pattern.adjacency[atom]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return [atom for atom in order if atom not in pinned]
+
+
+class StructureStore:
+    """Append-only store of saved structures with an in-memory fingerprint index.
+
+    Opening the store reads the graph index and the fingerprints; the saved
+    pieces stay on disk until ``pieces`` seeks to one of them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.structures_path = os.path.join(directory, "structures.jsonl")
+        self.graphs_path = os.path.join(directory, "graphs.jsonl")
+        self.fingerprints_path = os.path.join(directory, "fingerprints.bin")
+
+        self.meta = []
+        self.graphs = []
+        if os.path.exists(self.graphs_path):
+            with open(self.graphs_path, encoding="utf-8") as fh:
+                for line in fh:
+                    record = json.loads(line)
+                    self.meta.append({key: record.pop(key) for key in ("name", "saved_at", "offset")})
+                    self.graphs.append(record)
+        fingerprints = (
+            np.fromfile(self.fingerprints_path, dtype="<u8").reshape(-1, FINGERPRINT_WORDS)
+            if os.path.exists(self.fingerprints_path)
+            else np.zeros((0, FINGERPRINT_WORDS), dtype="<u8")
+        )
+        # A crash mid-save can leave the files uneven; trust the shortest
+        self.count = min(len(self.graphs), len(fingerprints))
+        del self.meta[self.count:], self.graphs[self.count:]
+        self._fingerprints = np.zeros((max(64, self.count * 2), FINGERPRINT_WORDS), dtype="<u8")
+        self._fingerprints[:self.count] = fingerprints[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def fingerprints(self):
+        return self._fingerprints[:self.count]
+
+    def add(self, name, pieces):
+        """Saves one structure and indexes it; returns its record number."""
+        graph = MolGraph.from_pieces(pieces)
+        fingerprint = graph.fingerprint()
+        meta = {"name": name, "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with self._lock:
+            with open(self.structures_path, "ab") as fh:
+                meta["offset"] = fh.tell()
+                fh.write((json.dumps(dict(meta, pieces=pieces)) + "\n").encode("utf-8"))
+            with open(self.graphs_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(dict(
+                    meta, elements=graph.elements, bonds=graph.bonds, charges=graph.charges,
+                )) + "\n")
+            with open(self.fingerprints_path, "ab") as fh:
+                fh.write(fingerprint.tobytes())
+
+            if self.count == len(self._fingerprints):
+                grown = np.zeros((2 * self.count, FINGERPRINT_WORDS), dtype="<u8")
+                grown[:self.count] = self._fingerprints
+                self._fingerprints = grown
+            self._fingerprints[self.count] = fingerprint
+            self.meta.append(meta)
+            self.graphs.append(graph)
+            self.count += 1
+            return self.count - 1
+
+    def graph(self, record):
+        """The ``MolGraph`` of a record, built on first use."""
+        graph = self.graphs[record]
+        if not isinstance(graph, MolGraph):
+            graph = self.graphs[record] = MolGraph(**graph)
+        return graph
+
+    def record_id(self, record):
+        """Where a record's pieces are stored: file, offset and save time.
+
+        Records are only ever appended, so this names the same pieces for as
+        long as the store exists, and a store rebuilt in the same directory
+        gives its records other save times.
+        """
+        meta = self.meta[record]
+        return [self.structures_path, meta["offset"], meta["saved_at"]]
+
+    def pieces(self, record):
+        """Pieces of one saved structure, read back from disk."""
+        with open(self.structures_path, "rb") as fh:
+            fh.seek(self.meta[record]["offset"])
+            return json.loads(fh.readline())["pieces"]
+
+    def screen(self, pattern):
+        """Records whose fingerprint has every bit of the pattern's."""
+        query = pattern.fingerprint()
+        fingerprints = self.fingerprints
+        return np.flatnonzero(((fingerprints & query) == query).all(axis=1)).tolist()
+
+    def search(self, pattern, limit=None):
+        """Records containing ``pattern`` (a ``MolGraph``, SMILES or group name)."""
+        if isinstance(pattern, str):
+            pattern = MolGraph.from_group(pattern) if pattern in FUNCTIONAL_GROUPS else MolGraph.from_smiles(pattern)
+        order = _pattern_order(pattern)
+        hits = []
+        for record in self.screen(pattern):
+            if contains(self.graph(record), pattern, order=order):
+                hits.append(record)
+                if limit is not None and len(hits) >= limit:
+                    break
+        return hits
@@ -0,0 +1,235 @@
+"""Per-session state of the builder, shared by the app and headless tools.
+
+``SessionRegistry`` owns the state of every session the server has seen.
+Sessions idle longest are written to compressed snapshots on disk once the
+resident ones exceed a memory ceiling, and are read back on their next
+rerun, so the server no longer grows with every student who ever opened it.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from .components import ComponentTracker
+from .ratelimit import EventThrottle
+from .summary import LiveSummary
+from .workers import DeferredUpdates
+
+
+def init_session(state):
+    """Fills in whatever ``state`` is missing; ``state`` may be st.session_state.
+
+    * ``pieces``: ``{pid: piece}``, the canvas contents
+    * ``components``: molecules on the canvas, fed through ``DeferredUpdates``
+      so the tracker is only touched by the analysis worker
+    * ``summary``: formula, electron and charge counters of the whole canvas,
+      updated by ``ingest`` itself
+    * ``throttle``: rate limit on the events the canvas posts
+    * ``session_id``: key of the session's analysis lanes and recordings
+    """
+    if "pieces" not in state:
+        state["pieces"] = {}
+    if "components" not in state:
+        state["components"] = DeferredUpdates(ComponentTracker(state["pieces"]))
+    if "summary" not in state:
+        state["summary"] = LiveSummary(state["pieces"])
+    if "throttle" not in state:
+        state["throttle"] = EventThrottle()
+    if "session_id" not in state:
+        state["session_id"] = uuid.uuid4().hex
+    return state
+
+
+def deep_sizeof(obj, seen=None):
+    """Bytes held by ``obj`` and everything reachable from it (once each)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, (type, threading.Thread)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def session_usage(state):
+    """Memory accounting of one session: piece count and estimated bytes.
+
+    ``cache_bytes`` is everything derived from the pieces (the component
+    tracker, its graph and spatial index, the rendered pages), counted
+    without the pieces.
+    """
+    seen = set()
+    piece_bytes = deep_sizeof(state["pieces"], seen)
+    cache_bytes = sum(deep_sizeof(value, seen) for key, value in state.items() if key != "recorder")
+    return {
+        "pieces": len(state["pieces"]),
+        "piece_bytes": piece_bytes,
+        "cache_bytes": cache_bytes,
+        "bytes": piece_bytes + cache_bytes,
+    }
+
+
+# Keys of the state that go into a snapshot; the rest is rebuilt from them
+SNAPSHOT_KEYS = ("session_id", "pieces")
+
+# Reruns between two measurements of a session whose piece count is unchanged
+REMEASURE_EVERY = 20
+
+
+class _Entry:
+    def __init__(self, state):
+        self.state = state
+        self.bytes = 0
+        self.usage = None
+        self.releases = 0
+        self.last_used = time.time()
+
+
+class SessionRegistry:
+    """Session states by id, with LRU eviction to disk under a memory ceiling.
+
+    The app keeps only the session id in ``st.session_state`` and checks the
+    state out of the registry on every rerun; holding the state anywhere else
+    would keep an evicted session in memory. Sessions used in the last
+    ``min_idle`` seconds are never evicted, so a rerun in progress keeps its
+    state. ``on_evict(session_id)`` lets the caller drop what else it keeps
+    per session, such as analysis lanes.
+    """
+
+    def __init__(self, directory, ceiling_mb=256, min_idle=60, on_evict=None):
+        self.directory = directory
+        self.ceiling = ceiling_mb * 2 ** 20
+        self.min_idle = min_idle
+        self.on_evict = on_evict
+        self._lock = threading.RLock()
+        self._resident = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json.z")
+
+    def checkout(self, session_id=None):
+        """The state of ``session_id``, restored from disk if it was evicted.
+
+        Unknown ids (and None) get a fresh state; the id to keep for the
+        next rerun is ``state["session_id"]``.
+        """
+        with self._lock:
+            entry = self._resident.get(session_id)
+            if entry is None:
+                state = self._restore(session_id) if session_id else None
+                if state is None:
+                    state = init_session({} if session_id is None else {"session_id": session_id})
+                entry = self._resident[state["session_id"]] = _Entry(state)
+            entry.last_used = time.time()
+            return entry.state
+
+    def _restore(self, session_id):
+        path = self._path(session_id)
+        try:
+            with open(path, "rb") as fh:
+                snapshot = json.loads(zlib.decompress(fh.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+        os.remove(path)
+        return init_session(snapshot)
+
+    def release(self, state):
+        """Ends a rerun: re-measures the session and enforces the ceiling.
+
+        Measuring walks the whole state, so it is skipped while the piece
+        count is unchanged (drags) except on every ``REMEASURE_EVERY``-th call.
+        """
+        with self._lock:
+            entry = self._resident.get(state["session_id"])
+            if entry is None:
+                return
+            entry.last_used = time.time()
+            entry.releases += 1
+            stale = (
+                entry.usage is None
+                or entry.usage["pieces"] != len(state["pieces"])
+                or entry.releases % REMEASURE_EVERY == 0
+            )
+        if stale:
+            try:
+                usage = session_usage(state)
+            except RuntimeError:
+                # The analysis worker changed the tracker mid-count; keep the last figure
+                usage = None
+        with self._lock:
+            if stale and usage is not None:
+                entry.usage, entry.bytes = usage, usage["bytes"]
+            self._enforce()
+
+    def _enforce(self):
+        total = sum(entry.bytes for entry in self._resident.values())
+        if total <= self.ceiling:
+            return
+        cutoff = time.time() - self.min_idle
+        idle = sorted(
+            (entry.last_used, session_id)
+            for session_id, entry in self._resident.items()
+            if entry.last_used < cutoff
+        )
+        for _, session_id in idle:
+            if total <= self.ceiling:
+                break
+            total -= self._resident[session_id].bytes
+            self.evict(session_id)
+
+    def evict(self, session_id):
+        """Writes a session to its snapshot and forgets it in memory."""
+        with self._lock:
+            entry = self._resident.pop(session_id, None)
+            if entry is None:
+                return
+            snapshot = {key: entry.state[key] for key in SNAPSHOT_KEYS}
+            path = self._path(session_id)
+            with open(path + ".tmp", "wb") as fh:
+                fh.write(zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8")))
+            os.replace(path + ".tmp", path)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def usage(self):
+        """One row per resident session, most recently used first."""
+        now = time.time()
+        with self._lock:
+            rows = [
+                dict(entry.usage or {}, session_id=session_id, idle_s=round(now - entry.last_used))
+                for session_id, entry in self._resident.items()
+            ]
+        return sorted(rows, key=lambda row: row["idle_s"])
+
+    def totals(self):
+        """Resident sessions and bytes, plus the snapshots waiting on disk."""
+        with self._lock:
+            resident = len(self._resident)
+            total = sum(entry.bytes for entry in self._resident.values())
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json.z")]
+        return {
+            "resident": resident,
+            "bytes": total,
+            "ceiling": self.ceiling,
+            "on_disk": len(names),
+            "disk_bytes": sum(os.path.getsize(os.path.join(self.directory, name)) for name in names),
+        }
+
+    def prune(self, max_age):
+        """Deletes snapshots of sessions not seen for ``max_age`` seconds."""
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json.z") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
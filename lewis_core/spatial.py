@@ -0,0 +1,180 @@
+"""Spatial indexes over piece positions."""
+
+import math
+from collections import defaultdict
+
+
+class SpatialHash:
+    """Uniform grid of cells mapping canvas points to keys.
+
+    Insert, move and remove touch a single cell; radius queries only look at
+    the cells the query circle overlaps.
+    """
+
+    def __init__(self, cell_size=100.0):
+        self.cell_size = float(cell_size)
+        self.cells = defaultdict(set)
+        self.points = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, key, x, y):
+        if key in self.points:
+            self.remove(key)
+        self.points[key] = (x, y)
+        self.cells[self._cell(x, y)].add(key)
+
+    def remove(self, key):
+        point = self.points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self.cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, key, x, y):
+        self.insert(key, x, y)
+
+    def query_radius(self, x, y, radius):
+        """Returns ``[(distance, key), ...]`` within ``radius``, nearest first."""
+        cx0, cy0 = self._cell(x - radius, y - radius)
+        cx1, cy1 = self._cell(x + radius, y + radius)
+        hits = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for key in self.cells.get((cx, cy), ()):
+                    px, py = self.points[key]
+                    distance = math.hypot(px - x, py - y)
+                    if distance <= radius:
+                        hits.append((distance, key))
+        hits.sort()
+        return hits
+
+    def nearest(self, x, y, radius):
+        """Nearest key within ``radius``, or None."""
+        hits = self.query_radius(x, y, radius)
+        return hits[0][1] if hits else None
+
+
+class KDTree:
+    """Static 2-d tree over ``{key: (x, y)}``, split at medians into small buckets.
+
+    Built in one pass with numpy partitions; queries walk the tree in
+    Python, which is cheap at the few hundred atoms a canvas holds.
+    """
+
+    BUCKET = 8
+
+    def __init__(self, points):
+        # numpy loads with the first tree, not with this module
+        import numpy as np
+
+        self.keys = list(points)
+        coords = np.array([points[key] for key in self.keys], dtype=float).reshape(-1, 2)
+        # Bucket contents, in the order the leaves were laid out
+        self.order = np.arange(len(self.keys))
+        # Nodes are (axis, split, left, right) or (None, start, end, None) for buckets
+        self.nodes = []
+        self.root = self._build(coords, self.order.copy(), 0) if len(self.keys) else None
+        ordered = coords[self.order]
+        self.xs = ordered[:, 0].tolist()
+        self.ys = ordered[:, 1].tolist()
+        self.ordered_keys = [self.keys[i] for i in self.order]
+
+    def _build(self, coords, order, start):
+        import numpy as np
+
+        end = start + len(order)
+        if len(order) <= self.BUCKET:
+            self.order[start:end] = order
+            self.nodes.append((None, start, end, None))
+            return len(self.nodes) - 1
+        spread = coords[order].max(axis=0) - coords[order].min(axis=0)
+        axis = int(spread[1] > spread[0])
+        mid = len(order) // 2
+        order = order[np.argpartition(coords[order, axis], mid)]
+        split = float(coords[order[mid], axis])
+        index = len(self.nodes)
+        self.nodes.append(None)
+        left = self._build(coords, order[:mid].copy(), start)
+        right = self._build(coords, order[mid:].copy(), start + mid)
+        self.nodes[index] = (axis, split, left, right)
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def query_radius(self, x, y, radius):
+        """Returns ``[(distance, key), ...]`` within ``radius``, nearest first."""
+        hits = []
+        if self.root is None:
+            return hits
+        stack = [self.root]
+        while stack:
+            axis, a, b, c = self.nodes[stack.pop()]
+            if axis is None:
+                for i in range(a, b):
+                    distance = math.hypot(self.xs[i] - x, self.ys[i] - y)
+                    if distance <= radius:
+                        hits.append((distance, self.ordered_keys[i]))
+                continue
+            offset = (x, y)[axis] - a
+            if offset - radius <= 0:
+                stack.append(b)
+            if offset + radius >= 0:
+                stack.append(c)
+        hits.sort()
+        return hits
+
+    def nearest(self, x, y, radius):
+        hits = self.query_radius(x, y, radius)
+        return hits[0][1] if hits else None
+
+
+class LazyKDTree:
+    """Keyed points whose ``KDTree`` is rebuilt on the first query after a change."""
+
+    def __init__(self):
+        self.points = {}
+        self.rebuilds = 0
+        self._tree = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def insert(self, key, x, y):
+        if self.points.get(key) != (x, y):
+            self.points[key] = (x, y)
+            self._tree = None
+
+    def remove(self, key):
+        if self.points.pop(key, None) is not None:
+            self._tree = None
+
+    def move(self, key, x, y):
+        self.insert(key, x, y)
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = KDTree(self.points)
+            self.rebuilds += 1
+        return self._tree
+
+    def query_radius(self, x, y, radius):
+        return self.tree.query_radius(x, y, radius)
+
+    def nearest(self, x, y, radius):
+        return self.tree.nearest(x, y, radius)
@@ -0,0 +1,64 @@
+"""Whole-canvas formula, electron and charge counters kept up to date by ingest."""
+
+from collections import Counter
+
+from .pieces import BOND_ORDERS, ELECTRON_GLYPHS, VALENCE_ELECTRONS, hill_formula
+
+
+class LiveSummary:
+    """Running totals over every piece on the canvas.
+
+    ``update`` takes the ``(pid, before, after)`` changes from
+    ``apply_events`` and adjusts the counters by what each side contributes,
+    so creates, deletes and relabels cost O(1) and moves cost nothing.
+
+    * ``elements``: atom counts, formatted by ``formula`` in Hill order
+    * ``electrons``: electrons drawn, two per bond order and per pair glyph
+    * ``expected``: valence electrons of the atoms on the canvas
+    """
+
+    def __init__(self, pieces=None):
+        self.elements = Counter()
+        self.electrons = 0
+        self.expected = 0
+        if pieces:
+            self.update([(pid, None, piece) for pid, piece in pieces.items()])
+
+    def _count(self, piece, sign):
+        label, kind = piece.get("label"), piece.get("type")
+        if kind == "atom":
+            self.elements[label] += sign
+            self.expected += sign * VALENCE_ELECTRONS.get(label, 0)
+        elif kind == "bond":
+            self.electrons += sign * 2 * BOND_ORDERS.get(label, 0)
+        elif kind == "electron":
+            self.electrons += sign * ELECTRON_GLYPHS.get(label, 0)
+
+    def update(self, changes):
+        for _, before, after in changes:
+            if before is not None and after is not None and (
+                before["label"] == after["label"] and before["type"] == after["type"]
+            ):
+                continue
+            if before is not None:
+                self._count(before, -1)
+            if after is not None:
+                self._count(after, 1)
+
+    @property
+    def formula(self):
+        return hill_formula(self.elements)
+
+    @property
+    def charge(self):
+        """Net charge if every drawn electron belongs to the canvas's atoms."""
+        return self.expected - self.electrons
+
+    def as_dict(self):
+        return {
+            "formula": self.formula,
+            "atoms": sum(self.elements.values()),
+            "electrons": self.electrons,
+            "expected": self.expected,
+            "charge": self.charge,
+        }
@@ -0,0 +1,38 @@
+"""Stamp templates: common fragments inserted as many pieces at once.
+
+Templates are written as SMILES where ``*`` marks an attachment point. The
+dummy atom itself is dropped, so its bond glyph is left sticking out of the
+fragment, ready to be joined to the rest of the drawing.
+"""
+
+from functools import lru_cache
+
+from .importer import molecule_to_pieces, parse_smiles
+
+TEMPLATES = {
+    "Benzene ring": "c1ccccc1",
+    "Methyl": "*C",
+    "Carbonyl": "*C(*)=O",
+    "Hydroxyl": "*O",
+}
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    pieces = molecule_to_pieces(parse_smiles(TEMPLATES[name]))
+    kept = [piece for piece in pieces.values() if piece["label"] != "*"]
+    left = min(piece["x"] for piece in kept)
+    top = min(piece["y"] for piece in kept)
+    return tuple(
+        (piece["label"], piece["type"], round(piece["x"] - left, 1), round(piece["y"] - top, 1))
+        for piece in kept
+    )
+
+
+def template_pieces(name):
+    """Pieces of a template with ``x``/``y`` relative to its top-left corner."""
+    return [
+        {"label": label, "type": kind, "x": x, "y": y}
+        for label, kind, x, y in _template(name)
+    ]
+
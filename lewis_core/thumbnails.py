@@ -0,0 +1,120 @@
+"""SVG thumbnails of piece states, cached on disk by structure hash.
+
+A thumbnail only depends on the glyphs and their positions relative to
+each other, so the key is a hash of the pieces moved to the origin; the
+same drawing saved twice, or dragged across the canvas, renders once.
+
+Computing that key needs the pieces, so thumbnails of saved structures
+are keyed on where the pieces are stored instead (``source_key``), and a
+cached one is served without reading the structure at all.
+"""
+
+import hashlib
+import html
+import json
+import os
+import uuid
+
+from .pieces import piece_center, piece_font_px, piece_size
+
+# Bump to re-render every cached thumbnail after changing the drawing code
+THUMBNAIL_VERSION = 1
+THUMBNAIL_PX = 180
+PADDING_PX = 24
+
+_COLORS = {"atom": "#1f2328", "bond": "#57606a", "electron": "#0969da"}
+
+
+def _normalized(pieces):
+    """Glyphs as sorted ``(label, type, x, y)`` rows with the drawing at the origin."""
+    if not pieces:
+        return []
+    x0 = min(piece["x"] for piece in pieces.values())
+    y0 = min(piece["y"] for piece in pieces.values())
+    return sorted(
+        (piece["label"], piece["type"], round(piece["x"] - x0, 1), round(piece["y"] - y0, 1))
+        for piece in pieces.values()
+    )
+
+
+def thumbnail_key(pieces):
+    """Hash of the drawing, independent of where it sits on the canvas."""
+    payload = json.dumps([THUMBNAIL_VERSION, _normalized(pieces)], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def source_key(source):
+    """Hash of where a drawing is stored, e.g. ``StructureStore.record_id``.
+
+    The source must change whenever the pieces stored there can.
+    """
+    payload = json.dumps([THUMBNAIL_VERSION, source], ensure_ascii=False)
+    return "src-" + hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def pieces_svg(pieces, size=THUMBNAIL_PX):
+    """Renders ``{pid: piece}`` as a standalone ``size`` x ``size`` SVG."""
+    rows = _normalized(pieces)
+    if not rows:
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+            f'viewBox="0 0 {size} {size}"><text x="50%" y="50%" text-anchor="middle" '
+            f'fill="#8c959f" font-family="sans-serif" font-size="14">empty</text></svg>'
+        )
+
+    texts = []
+    x1 = y1 = 0.0
+    for label, kind, x, y in rows:
+        width, height = piece_size(label)
+        x1, y1 = max(x1, x + width), max(y1, y + height)
+        cx, cy = piece_center({"x": x, "y": y, "label": label})
+        texts.append(
+            f'<text x="{cx:.1f}" y="{cy:.1f}" font-size="{piece_font_px(label)}" '
+            f'fill="{_COLORS.get(kind, "#1f2328")}">{html.escape(label)}</text>'
+        )
+    side = max(x1, y1) + 2 * PADDING_PX
+    # Center the drawing in a square view box
+    left = -PADDING_PX - (side - 2 * PADDING_PX - x1) / 2
+    top = -PADDING_PX - (side - 2 * PADDING_PX - y1) / 2
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="{left:.1f} {top:.1f} {side:.1f} {side:.1f}">'
+        f'<g font-family="sans-serif" text-anchor="middle" dominant-baseline="central">'
+        + "".join(texts)
+        + "</g></svg>"
+    )
+
+
+class ThumbnailCache:
+    """Directory of rendered thumbnails named by ``thumbnail_key``."""
+
+    def __init__(self, directory, size=THUMBNAIL_PX):
+        self.directory = directory
+        self.size = size
+        os.makedirs(directory, exist_ok=True)
+
+    def svg(self, pieces):
+        """The thumbnail of ``pieces``, rendered and stored on first request."""
+        return self._cached(thumbnail_key(pieces), lambda: pieces)
+
+    def saved_svg(self, source, load):
+        """The thumbnail of the drawing stored at ``source`` (see ``source_key``).
+
+        ``load()`` returns its pieces and is only called on a miss.
+        """
+        return self._cached(source_key(source), load)
+
+    def _cached(self, key, load):
+        path = os.path.join(self.directory, f"{key}-{self.size}.svg")
+        try:
+            with open(path, encoding="utf-8") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            pass
+        svg = pieces_svg(load(), self.size)
+        # Sessions may render the same drawing at once; each writes its own file
+        scratch = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(scratch, "w", encoding="utf-8") as fh:
+            fh.write(svg)
+        os.replace(scratch, path)
+        return svg
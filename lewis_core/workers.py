@@ -0,0 +1,135 @@
+"""Runs chemistry analysis off the Streamlit script thread.
+
+Jobs are grouped in lanes keyed by ``(session, name)``. A lane runs one job
+at a time and is latest-wins: submitting while a job runs parks the new
+job, cancelling whichever job was parked before it, so a burst of edits
+costs at most one extra run. The script never waits on a job; it picks up
+the newest finished result on a later rerun.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Lane:
+    def __init__(self):
+        self.generation = 0
+        self.running = None
+        self.waiting = None
+        self.done = None
+
+
+class AnalysisPool:
+    """Latest-wins job lanes on a shared executor.
+
+    Any ``concurrent.futures`` executor works; with a process pool the job
+    functions and their arguments must be picklable.
+    """
+
+    def __init__(self, max_workers=None, executor=None):
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers, thread_name_prefix="lewis-analysis"
+        )
+        # Re-entrant: a future that is already done runs its callback inline
+        self._lock = threading.RLock()
+        self._lanes = {}
+
+    def submit(self, session, name, fn, *args, **kwargs):
+        """Queues ``fn(*args, **kwargs)`` and returns its generation number."""
+        key = (session, name)
+        with self._lock:
+            lane = self._lanes.setdefault(key, _Lane())
+            lane.generation += 1
+            job = (lane.generation, fn, args, kwargs)
+            if lane.running is None:
+                self._start(key, lane, job)
+            else:
+                lane.waiting = job
+            return lane.generation
+
+    def _start(self, key, lane, job):
+        generation, fn, args, kwargs = job
+        future = self.executor.submit(fn, *args, **kwargs)
+        lane.running = (generation, future)
+        future.add_done_callback(lambda done: self._finished(key, generation, done))
+
+    def _finished(self, key, generation, future):
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                return
+            lane.running = None
+            if not future.cancelled():
+                error = future.exception()
+                value = None if error is not None else future.result()
+                lane.done = (generation, value, error)
+            if lane.waiting is not None:
+                job, lane.waiting = lane.waiting, None
+                self._start(key, lane, job)
+
+    def latest(self, session, name):
+        """Newest finished job as ``(value, error, current)``, or None.
+
+        ``current`` is False while a newer submission is still pending.
+        """
+        with self._lock:
+            lane = self._lanes.get((session, name))
+            if lane is None or lane.done is None:
+                return None
+            generation, value, error = lane.done
+            return value, error, generation == lane.generation
+
+    def busy(self, session, name):
+        """True while a job of the lane is running or waiting."""
+        with self._lock:
+            lane = self._lanes.get((session, name))
+            return lane is not None and (lane.running is not None or lane.waiting is not None)
+
+    def drop(self, session):
+        """Forgets every lane of a session; running jobs finish unobserved."""
+        with self._lock:
+            for key in [key for key in self._lanes if key[0] == session]:
+                lane = self._lanes.pop(key)
+                if lane.running is not None:
+                    lane.running[1].cancel()
+
+
+class DeferredUpdates:
+    """Stands in for a tracker whose updates must run on a worker lane.
+
+    ``ingest`` calls ``update`` on the script thread, which only queues the
+    changes; ``apply`` replays them on the lane that owns the tracker, so the
+    tracker is never touched by two threads at once.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._queue = []
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return bool(self._queue)
+
+    def update(self, changes):
+        with self._lock:
+            self._queue.extend(changes)
+
+    def apply(self):
+        with self._lock:
+            changes, self._queue = self._queue, []
+        if changes:
+            self.tracker.update(changes)
+        return self.tracker
+
+
+def analyze_molecules(deferred):
+    """Worker job: catches the tracker up and validates every molecule."""
+    return [summary for _, _, summary in deferred.apply().components()]
+
+
+def analyze_scheme(deferred):
+    """Worker job: ``analyze_molecules`` plus the balance of each reaction step."""
+    tracker = deferred.apply()
+    molecules = [summary for _, _, summary in tracker.components()]
+    return {"molecules": molecules, "steps": tracker.reactions.steps()}
@@ -0,0 +1,81 @@
+"""Streamlit resources shared by every session and every page of the builder.
+
+The builder script and the pages under pages/ run as separate scripts, so
+the cached factories live here where both import the same ones.
+"""
+
+import os
+import tempfile
+
+import streamlit as st
+
+from lewis_core import (
+    AnalysisPool,
+    EventRecorder,
+    MoleculeLibrary,
+    Profiler,
+    SessionRegistry,
+    StructureStore,
+    ThumbnailCache,
+)
+
+# -----------------------------
+#  SHARED RESOURCES
+# -----------------------------
+
+@st.cache_resource
+def analysis_pool():
+    """One worker pool shared by every session of the app."""
+    return AnalysisPool(max_workers=4)
+
+
+@st.cache_resource
+def molecule_library():
+    """The bundled library; opening it only maps the index file."""
+    return MoleculeLibrary()
+
+
+# Saved structures live next to the app unless LEWIS_SAVED_DIR says otherwise
+SAVED_DIR = os.environ.get(
+    "LEWIS_SAVED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved")
+)
+
+
+@st.cache_resource
+def structure_store():
+    """Saved structures and their fingerprint index, shared by all sessions."""
+    return StructureStore(SAVED_DIR)
+
+
+@st.cache_resource
+def event_recorder(path):
+    """One recorder per file, shared by every session."""
+    return EventRecorder(path)
+
+
+# Idle sessions are offloaded to disk once the resident ones pass this many MB
+SESSION_MEMORY_MB = float(os.environ.get("LEWIS_SESSION_MEMORY_MB", "256"))
+SESSION_DIR = os.environ.get(
+    "LEWIS_SESSION_DIR", os.path.join(tempfile.gettempdir(), "lewis-sessions")
+)
+
+
+@st.cache_resource
+def session_registry():
+    """Every session's pieces and caches; idle ones wait on disk."""
+    registry = SessionRegistry(SESSION_DIR, SESSION_MEMORY_MB, on_evict=analysis_pool().drop)
+    # Snapshots of students who never came back
+    registry.prune(7 * 24 * 3600)
+    return registry
+
+
+@st.cache_resource
+def profiler():
+    """Admin-armed cProfile/tracemalloc captures of chosen sessions."""
+    return Profiler()
+
+
+@st.cache_resource
+def thumbnail_cache():
+    """Rendered previews of saved structures, next to the structures themselves."""
+    return ThumbnailCache(os.path.join(SAVED_DIR, "thumbnails"))
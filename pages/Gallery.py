@@ -0,0 +1,73 @@
+import base64
+import html
+
+import streamlit as st
+
+from lewis_core import ingest, new_piece_id, piece_events
+from lewis_resources import session_registry, structure_store, thumbnail_cache
+
+st.set_page_config(page_title="Gallery", layout="wide")
+
+st.title("🖼️ Saved structures")
+
+# Thumbnails per row, and rows added by each "Show more"
+COLUMNS = 6
+PAGE_SIZE = 8 * COLUMNS
+
+store = structure_store()
+thumbnails = thumbnail_cache()
+
+# -----------------------------
+#  FILTER
+# -----------------------------
+name_filter = st.text_input("Name contains", placeholder="e.g. Alex")
+needle = name_filter.strip().lower()
+records = [
+    record
+    for record in range(len(store) - 1, -1, -1)
+    if needle in store.meta[record]["name"].lower()
+]
+
+# A new filter starts again from the first page
+if st.session_state.get("gallery_filter") != needle:
+    st.session_state.gallery_filter = needle
+    st.session_state.gallery_limit = PAGE_SIZE
+
+shown = records[:st.session_state.gallery_limit]
+st.caption(f"Showing {len(shown)} of {len(records)} saved structures, newest first.")
+
+# -----------------------------
+#  THUMBNAILS
+# -----------------------------
+# Only the records on screen are rendered, or fetched from the thumbnail
+# cache by where they are saved, which skips reading their pieces; the rest
+# wait until "Show more" scrolls them in
+for row in range(0, len(shown), COLUMNS):
+    for column, record in zip(st.columns(COLUMNS), shown[row:row + COLUMNS]):
+        meta = store.meta[record]
+        svg = thumbnails.saved_svg(store.record_id(record), lambda: store.pieces(record))
+        src = "data:image/svg+xml;base64," + base64.b64encode(svg.encode("utf-8")).decode("ascii")
+        column.markdown(
+            f'<img src="{src}" style="width:100%;border:1px solid #d0d7de;'
+            f'border-radius:6px" alt="{html.escape(meta["name"])}">',
+            unsafe_allow_html=True,
+        )
+        column.caption(f'{meta["name"]} · {meta["saved_at"]}')
+        if column.button("Open in builder", key=f"open-{record}"):
+            registry = session_registry()
+            state = registry.checkout(st.session_state.get("session_id"))
+            st.session_state.session_id = state["session_id"]
+            try:
+                new_pieces = {new_piece_id(): piece for piece in store.pieces(record).values()}
+                ingest(state, piece_events(new_pieces))
+            finally:
+                # Every checkout ends in a release, which measures the session again
+                registry.release(state)
+            st.switch_page("Lewis_Builder_Full_V4.py")
+
+if len(shown) < len(records):
+    if st.button(f"Show more ({len(records) - len(shown)} left)"):
+        st.session_state.gallery_limit += PAGE_SIZE
+        st.rerun()
+elif not records:
+    st.info("No saved structures match." if needle else "No structures have been saved yet.")
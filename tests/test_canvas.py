@@ -0,0 +1,259 @@
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from lewis_core.canvas import ORGANIC_ATOMS, builder_html, script_json
+from lewis_core.importer import import_structure
+
+NODE = shutil.which("node")
+needs_node = pytest.mark.skipif(NODE is None, reason="needs node")
+
+# Just enough of the DOM for the page script to run under node: elements
+# are plain objects, getElementById makes them on first use, and what the
+# page posts to Streamlit is collected in ``posted``. The viewport is 800x600.
+FAKE_DOM = """
+    class FakeElement {
+        constructor(id) {
+            this.id = id || "";
+            this.style = {};
+            this.dataset = {};
+            this.children = [];
+            this.parent = null;
+            this.listeners = {};
+            this.classes = new Set();
+            this.textContent = "";
+            this.checked = false;
+            this.clientWidth = 800;
+            this.clientHeight = 600;
+            const classes = this.classes;
+            this.classList = {
+                add: (...names) => names.forEach(name => classes.add(name)),
+                remove: (...names) => names.forEach(name => classes.delete(name)),
+                contains: name => classes.has(name),
+                toggle: (name, on) => {
+                    if (on === undefined) on = !classes.has(name);
+                    if (on) classes.add(name); else classes.delete(name);
+                    return on;
+                },
+            };
+        }
+        set className(value) {
+            this.classes.clear();
+            value.split(/\\s+/).filter(Boolean).forEach(name => this.classes.add(name));
+        }
+        get className() { return [...this.classes].join(" "); }
+        addEventListener(type, fn) { (this.listeners[type] = this.listeners[type] || []).push(fn); }
+        removeEventListener(type, fn) { this.listeners[type] = (this.listeners[type] || []).filter(f => f !== fn); }
+        appendChild(child) {
+            if (child.isFragment) {
+                child.children.slice().forEach(c => this.appendChild(c));
+                return child;
+            }
+            child.remove();
+            child.parent = this;
+            this.children.push(child);
+            return child;
+        }
+        remove() {
+            if (!this.parent) return;
+            const siblings = this.parent.children;
+            siblings.splice(siblings.indexOf(this), 1);
+            this.parent = null;
+        }
+        getBoundingClientRect() { return {left: 0, top: 0, width: this.clientWidth, height: this.clientHeight}; }
+        querySelectorAll() { return []; }
+    }
+    const byId = new Map();
+    const document = {
+        getElementById(id) {
+            if (!byId.has(id)) byId.set(id, new FakeElement(id));
+            return byId.get(id);
+        },
+        createElement: () => new FakeElement(),
+        createDocumentFragment() {
+            const fragment = new FakeElement();
+            fragment.isFragment = true;
+            return fragment;
+        },
+        querySelectorAll: () => [],
+        addEventListener() {},
+        removeEventListener() {},
+    };
+    const stored = new Map();
+    const sessionStorage = {
+        getItem: key => (stored.has(key) ? stored.get(key) : null),
+        setItem: (key, value) => stored.set(key, String(value)),
+    };
+    const posted = [];
+    const window = {parent: {postMessage: message => posted.push(message.value)}};
+    const requestAnimationFrame = fn => setTimeout(fn, 0);
+"""
+
+
+def page_script(page):
+    """The JavaScript of a builder page."""
+    return re.search(r"<script>(.*)</script>", page, re.S).group(1)
+
+
+def run_node(source):
+    result = subprocess.run([NODE, "-"], input=source, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def run_pages(*runs):
+    """Runs ``(page, probe)`` pairs in one node process, one after another.
+
+    Each page gets its own scope, with its ``probe`` appended to the page's
+    script; the pages share sessionStorage, as iframes of one tab do. Every
+    line a probe logs is parsed as JSON, and the parsed lines are returned.
+    """
+    scopes = "".join(
+        "(function () {\n" + page_script(page) + "\n" + probe + "\n})();\n" for page, probe in runs
+    )
+    return [json.loads(line) for line in run_node(FAKE_DOM + scopes).splitlines()]
+
+
+def atom_grid(count, columns=100, pitch=60.0):
+    return [
+        {"id": f"p{i}", "x": (i % columns) * pitch, "y": (i // columns) * pitch, "label": "C", "type": "atom"}
+        for i in range(count)
+    ]
+
+
+def in_view(piece, x0, y0, x1, y1):
+    """Python twin of queryRect for one-letter atoms (28.8 x 55.2 px)."""
+    return piece["x"] <= x1 and piece["x"] + 28.8 >= x0 and piece["y"] <= y1 and piece["y"] + 55.2 >= y0
+
+
+def test_labels_cannot_break_out_of_the_script():
+    hostile = "</script><script>alert(1)</script><!--"
+    page = builder_html(ORGANIC_ATOMS, [{"id": "a", "x": 0, "y": 0, "label": hostile, "type": "atom"}])
+    assert page.count("</script>") == 1
+    assert "<!--" not in page_script(page)
+    assert json.loads(script_json(hostile)) == hostile
+
+
+@needs_node
+def test_the_page_script_parses():
+    page = builder_html(ORGANIC_ATOMS, [{"id": "a", "x": 0, "y": 0, "label": "C", "type": "atom"}],
+                        {"interval_ms": 100, "retry_after_ms": 0, "pending": 0})
+    run_node(f"new Function({json.dumps(page_script(page))});")
+
+
+@needs_node
+def test_piece_size_survives_a_missing_label():
+    script = page_script(builder_html(ORGANIC_ATOMS))
+    piece_size = re.search(r"function pieceSize\(p\) \{.*?\n\s*\}", script, re.S).group(0)
+    out = run_node(piece_size + "\nconsole.log(JSON.stringify([pieceSize({label: null}), pieceSize({label: 'Cl'})]));")
+    assert [size["w"] for size in json.loads(out)] == pytest.approx([28.8, 57.6])
+
+
+@needs_node
+def test_only_pieces_in_the_viewport_are_drawn():
+    mount = atom_grid(5000)
+    probe = """
+        const drawn = () => [...elements.keys()].sort();
+        console.log(JSON.stringify({drawn: drawn(), children: world.children.length}));
+        Object.assign(view, {x: 3000, y: 1200});
+        cull();
+        console.log(JSON.stringify({drawn: drawn(), children: world.children.length}));
+    """
+    home, panned = run_pages((builder_html(ORGANIC_ATOMS, mount), probe))
+    # The 800x600 view plus a 100 px margin
+    for seen, (x, y) in ((home, (0, 0)), (panned, (3000, 1200))):
+        expected = sorted(p["id"] for p in mount if in_view(p, x - 100, y - 100, x + 900, y + 700))
+        assert seen["drawn"] == expected and seen["children"] == len(expected)
+        assert len(expected) < 300
+
+
+@needs_node
+def test_zoom_to_fit_shows_everything_and_the_view_outlives_the_page():
+    page = builder_html(ORGANIC_ATOMS, atom_grid(2000))
+    fit = """
+        zoomToFit();
+        cull();
+        console.log(JSON.stringify({view, drawn: elements.size}));
+    """
+    remount = "console.log(JSON.stringify({view, drawn: elements.size}));"
+    fitted, reloaded = run_pages((page, fit), (page, remount))
+    assert fitted["drawn"] == 2000 and fitted["view"]["scale"] < 0.2
+    assert reloaded == fitted
+
+
+@needs_node
+def test_a_mount_passes_over_incomplete_pieces_and_posts_nothing():
+    mount = atom_grid(30) + [
+        {"id": "bad", "x": 10.0, "y": 10.0, "label": None, "type": None},
+        {"id": "odd", "x": 60.0, "y": 10.0, "label": "<!--", "type": "atom"},
+    ]
+    probe = """
+        setTimeout(() => console.log(JSON.stringify({
+            pieces: [...pieces.keys()].length,
+            bad: pieces.has("bad"),
+            odd: elements.get("odd").textContent,
+            posted,
+        })), 50);
+    """
+    mounted, = run_pages((builder_html(ORGANIC_ATOMS, mount), probe))
+    assert mounted == {"pieces": 31, "bad": False, "odd": "<!--", "posted": []}
+
+
+@needs_node
+def test_dragged_centers_align_with_nearby_atoms_or_the_grid():
+    mount = [
+        {"id": "a", "x": 0.0, "y": 0.0, "label": "C", "type": "atom"},
+        {"id": "e", "x": 200.0, "y": 400.0, "label": "••", "type": "electron"},
+    ]
+    probe = """
+        const shown = () => [guideX.style.display, guideY.style.display];
+        const log = (c) => console.log(JSON.stringify({to: snapCenter(c), shown: shown()}));
+        log({x: 14.4 + GUIDE_PX - 1, y: 200});
+        log({x: 14.4 + GUIDE_PX + 1, y: 200});
+        log(center(pieces.get("e")));
+        snap.grid = true;
+        log({x: 130, y: 27.6 + 3});
+        snap.guides = false;
+        log({x: 18, y: 27.6 + 3});
+    """
+    near, far, electron, grid, grid_only = run_pages((builder_html(ORGANIC_ATOMS, mount), probe))
+    assert near["to"] == {"x": pytest.approx(14.4), "y": 200} and near["shown"] == ["block", "none"]
+    assert far["to"] == {"x": pytest.approx(14.4 + 9), "y": 200} and far["shown"] == ["none", "none"]
+    # Only atoms are aligned with
+    assert electron["shown"] == ["none", "none"]
+    assert grid["to"] == {"x": 120, "y": pytest.approx(27.6)} and grid["shown"] == ["none", "block"]
+    assert grid_only == {"to": {"x": 24, "y": 24}, "shown": ["none", "none"]}
+
+
+@needs_node
+def test_stacked_pieces_are_flagged_until_moved_apart():
+    mount = [
+        {"id": "a", "x": 0.0, "y": 0.0, "label": "C", "type": "atom"},
+        {"id": "b", "x": 6.0, "y": 4.0, "label": "O", "type": "atom"},
+        {"id": "c", "x": 400.0, "y": 0.0, "label": "N", "type": "atom"},
+    ]
+    probe = """
+        const flags = () => console.log(JSON.stringify({
+            stacked: [...overlaps.keys()].sort(),
+            marked: ["a", "b", "c"].filter(id => elements.get(id).classList.contains("overlap")),
+        }));
+        flags();
+        setPiece(Object.assign({}, pieces.get("b"), {x: 200}));
+        flags();
+        setPiece(Object.assign({}, pieces.get("a"), {x: 404, y: 2}));
+        flags();
+    """
+    stacked, apart, moved = run_pages((builder_html(ORGANIC_ATOMS, mount), probe))
+    assert stacked == {"stacked": ["a", "b"], "marked": ["a", "b"]}
+    assert apart == {"stacked": [], "marked": []}
+    assert moved == {"stacked": ["a", "c"], "marked": ["a", "c"]}
+
+
+@needs_node
+def test_lone_pairs_beside_their_atom_are_not_stacked():
+    mount = [dict(piece, id=pid) for pid, piece in import_structure("O", origin=(100, 100)).items()]
+    probe = "console.log(JSON.stringify(overlaps.size));"
+    assert run_pages((builder_html(ORGANIC_ATOMS, mount), probe)) == [0]
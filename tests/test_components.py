@@ -0,0 +1,64 @@
+import random
+
+from lewis_core.components import ComponentTracker
+from lewis_core.events import apply_events, piece_events
+from lewis_core.importer import import_structure
+from lewis_core.pieces import BOND_ORDERS
+
+
+def summaries(tracker):
+    return sorted(
+        (summary["formula"], summary["electrons"], summary["charge"], tuple(summary["problems"]), len(atoms))
+        for _, atoms, summary in tracker.components()
+    )
+
+
+def test_each_molecule_is_validated_on_its_own():
+    tracker = ComponentTracker(import_structure("CCO.[Cl-].C[N+](C)(C)C"))
+    assert summaries(tracker) == [
+        ("C2H6O", 20, 0, (), 9),
+        ("C4H12N", 32, 1, (), 17),
+        ("Cl", 8, -1, (), 1),
+    ]
+
+
+def test_octet_problems_are_reported_per_atom():
+    pieces = import_structure("C")
+    hydrogen = next(pid for pid, piece in pieces.items() if piece["label"] == "H")
+    del pieces[hydrogen]
+    (formula, _, _, problems, _), = summaries(ComponentTracker(pieces))
+    assert formula == "CH3" and "C has 6 electrons (needs 8)" in problems
+    assert "H has 0 electrons (needs 2)" in summaries(ComponentTracker(import_structure("[H+]")))[0][3]
+
+
+def test_incremental_updates_match_a_fresh_tracker():
+    rng = random.Random(7)
+    pieces = import_structure("CC(=O)OCC.c1ccccc1O", origin=(0, 0))
+    pieces.update(import_structure("N#CC", origin=(0, 700)))
+    tracker = ComponentTracker(dict(pieces))
+    live = dict(pieces)
+
+    for step in range(60):
+        bonds = [pid for pid, piece in live.items() if piece["label"] in BOND_ORDERS]
+        roll = rng.random()
+        if roll < 0.4 and bonds:
+            # Break a bond, or put it back somewhere else
+            events = [{"id": rng.choice(bonds), "deleted": True}]
+        elif roll < 0.7:
+            pid = rng.choice(list(pieces))
+            events = [dict(pieces[pid], id=pid, deleted=False)]
+        else:
+            pid = rng.choice(list(live))
+            events = [{"id": pid, "x": live[pid]["x"] + rng.uniform(-30, 30), "y": live[pid]["y"],
+                       "deleted": False}]
+        tracker.update(apply_events(live, {"events": events}))
+        if step % 5 == 0:
+            assert summaries(tracker) == summaries(ComponentTracker(dict(live)))
+    assert summaries(tracker) == summaries(ComponentTracker(dict(live)))
+
+
+def test_a_bulk_insert_matches_the_initial_build():
+    pieces = import_structure("OC(=O)CC(O)(CC(=O)O)C(=O)O")
+    tracker = ComponentTracker()
+    tracker.update(apply_events({}, piece_events(pieces)))
+    assert summaries(tracker) == summaries(ComponentTracker(pieces))
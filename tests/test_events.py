@@ -0,0 +1,38 @@
+from lewis_core.events import apply_event, ingest, iter_events
+from lewis_core.session import init_session
+
+
+def test_iter_events_accepts_single_and_bulk_payloads():
+    event = {"id": "a", "x": 1, "y": 2, "deleted": False}
+    assert list(iter_events(event)) == [event]
+    assert list(iter_events({"events": [event, {"x": 3}, None]})) == [event]
+    assert list(iter_events(None)) == []
+
+
+def test_a_move_keeps_the_label_and_type():
+    pieces = {}
+    apply_event(pieces, {"id": "a", "x": 1, "y": 2, "label": "C", "type": "atom"})
+    pid, before, after = apply_event(pieces, {"id": "a", "x": 5, "y": 6, "label": None, "type": None})
+    assert after == {"x": 5, "y": 6, "label": "C", "type": "atom"} and before["x"] == 1
+
+
+def test_incomplete_pieces_are_never_stored():
+    pieces = {}
+    # A move for a piece the server never saw created
+    assert apply_event(pieces, {"id": "a", "x": 1, "y": 2, "label": None, "type": None}) is None
+    assert apply_event(pieces, {"id": "b", "x": 1, "y": 2, "label": "C", "type": ""}) is None
+    assert apply_event(pieces, {"id": "c", "label": "C", "type": "atom"}) is None
+    assert apply_event(pieces, {"id": "d", "x": "1", "y": 2, "label": "C", "type": "atom"}) is None
+    assert pieces == {}
+
+
+def test_ingest_keeps_the_summary_and_revision_in_step():
+    state = init_session({})
+    ingest(state, {"events": [
+        {"id": "c", "x": 0, "y": 0, "label": "C", "type": "atom"},
+        {"id": "x", "x": 0, "y": 0, "label": None, "type": None},
+    ]})
+    assert list(state["pieces"]) == ["c"] and state["revision"] == 1
+    assert state["summary"].formula == "C"
+    ingest(state, {"events": [{"id": "x", "deleted": True}]})
+    assert state["revision"] == 1
@@ -0,0 +1,53 @@
+from lewis_core.grading import Grader, Structure, is_isomorphic
+from lewis_core.importer import import_structure
+from lewis_core.pieces import centered_piece
+
+
+def test_isomorphism_ignores_layout_and_atom_order():
+    assert is_isomorphic(Structure.from_source("OCC"), Structure.from_source("CCO"))
+    assert not is_isomorphic(Structure.from_source("CCO"), Structure.from_source("COC"))
+
+
+def test_a_drawn_structure_matches_its_key():
+    grader = Grader({"ethanol": "CCO", "dimethyl ether": "COC"})
+    result = grader.grade(import_structure("CCO"))
+    assert result == {"key": "ethanol", "score": 1.0, "match": True, "details": []}
+
+
+def test_wrong_bond_order_gets_partial_credit():
+    grader = Grader({"carbon dioxide": "O=C=O"})
+    # Same skeleton, but drawn with a single and a triple bond
+    result = grader.grade(import_structure("[O-]C#[O+]"))
+    assert result["match"] is False
+    assert 0.5 <= result["score"] < 1.0
+    assert any(detail.endswith("bond should be double, drawn as triple") for detail in result["details"])
+
+
+def test_wrong_formula_reports_missing_and_extra_atoms():
+    result = Grader({"ethanol": "CCO"}).grade(import_structure("CCN"))
+    assert result["score"] == 0.0
+    assert "missing atoms: O" in result["details"] and "extra atoms: HN" in result["details"]
+
+
+def test_stray_glyphs_are_not_cached_with_the_structure():
+    grader = Grader({"water": "O"})
+    clean = import_structure("O")
+    stray = dict(clean, stray=centered_piece("-", "bond", 2000, 2000))
+
+    assert grader.grade(stray)["details"] == ["1 bond glyph(s) do not connect two atoms"]
+    assert grader.grade(clean)["details"] == []
+    assert grader.grade(stray)["details"] == ["1 bond glyph(s) do not connect two atoms"]
+
+
+def test_results_do_not_share_the_cached_details():
+    grader = Grader({"ethanol": "CCO"})
+    first = grader.grade(import_structure("CCN"))
+    first["details"].append("edited by the caller")
+    assert "edited by the caller" not in grader.grade(import_structure("CCN"))["details"]
+
+
+def test_cache_is_bounded():
+    grader = Grader({"water": "O"}, cache_size=2)
+    for smiles in ("C", "CC", "CCC", "CCCC"):
+        grader.grade(import_structure(smiles))
+    assert len(grader._cache) == 2
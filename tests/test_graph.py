@@ -0,0 +1,49 @@
+from lewis_core.events import apply_events
+from lewis_core.graph import PieceGraph
+from lewis_core.pieces import centered_piece
+
+
+def _oxygen(prefix):
+    """An O with electron pairs above, below, left and right of it."""
+    pieces = {
+        f"{prefix}-o": centered_piece("O", "atom", 200, 200),
+        f"{prefix}-up": centered_piece("••", "electron", 200, 160),
+        f"{prefix}-down": centered_piece("••", "electron", 200, 240),
+        f"{prefix}-left": centered_piece(":", "electron", 170, 200),
+        f"{prefix}-right": centered_piece(":", "electron", 230, 200),
+    }
+    return pieces
+
+
+def test_electron_glyphs_belong_to_their_atom():
+    pieces = _oxygen("a")
+    graph = PieceGraph(pieces)
+    assert graph.lone_electrons("a-o") == 8
+    assert {graph.owners[pid] for pid in pieces if pid != "a-o"} == {"a-o"}
+
+
+def test_deleting_a_glyph_while_its_neighbours_move_in_one_batch():
+    # The deleted glyph must not be counted when another glyph of the same
+    # atom is re-owned first; which one goes first depends on set order,
+    # so several id sets are tried
+    for n in range(20):
+        pieces = _oxygen(f"m{n}")
+        graph = PieceGraph(pieces)
+        payload = {"events": [{"id": f"m{n}-up", "deleted": True}] + [
+            {"id": f"m{n}-{side}", "x": pieces[f"m{n}-{side}"]["x"] + 1, "y": pieces[f"m{n}-{side}"]["y"]}
+            for side in ("down", "left", "right")
+        ]}
+        graph.update(apply_events(pieces, payload))
+        assert graph.lone_electrons(f"m{n}-o") == 6
+        assert graph.tallies == PieceGraph(pieces).tallies
+
+
+def test_bond_glyph_joins_the_atoms_on_either_side():
+    pieces = {
+        "c": centered_piece("C", "atom", 100, 100),
+        "o": centered_piece("O", "atom", 200, 100),
+        "b": centered_piece("=", "bond", 150, 100),
+    }
+    graph = PieceGraph(pieces)
+    assert graph.bonds["b"] == ("c", "o", 2)
+    assert sorted(graph.neighbors("o")) == [("c", 2)]
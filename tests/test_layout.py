@@ -0,0 +1,51 @@
+from collections import Counter
+
+import numpy as np
+
+from lewis_core.graph import PieceGraph
+from lewis_core.importer import import_structure
+from lewis_core.layout import IDEAL_BOND_PX, MARGIN_PX, QuadTree, tidy_pieces
+
+
+def brute_force_repulsion(positions, strength):
+    delta = positions[:, None, :] - positions[None, :, :]
+    distance = np.maximum(np.hypot(delta[..., 0], delta[..., 1]), 1.0)
+    np.fill_diagonal(distance, np.inf)
+    return ((strength / distance ** 3)[..., None] * delta).sum(axis=1)
+
+
+def test_barnes_hut_matches_the_exact_sum():
+    positions = np.random.default_rng(1).uniform(0, 2000, size=(300, 2))
+    exact = brute_force_repulsion(positions, 1000.0)
+    tree = QuadTree(positions)
+    np.testing.assert_allclose(tree.repulsion(1000.0, theta=0.0), exact, rtol=1e-9, atol=1e-12)
+    approx = tree.repulsion(1000.0)
+    error = np.hypot(*(approx - exact).T) / np.hypot(*exact.T)
+    assert np.median(error) < 0.05
+
+
+def bonded_elements(pieces):
+    graph = PieceGraph(pieces)
+    return Counter(
+        (tuple(sorted((graph.atoms[a], graph.atoms[b]))), order) for a, b, order in graph.bonds.values()
+    )
+
+
+def test_tidy_keeps_every_bond_and_evens_out_their_lengths():
+    pieces = import_structure("CC(=O)OCC")
+    rng = np.random.default_rng(2)
+    # Squash the drawing, keeping each glyph with its atoms
+    squashed = {pid: dict(piece, x=piece["x"] * 0.7 + rng.uniform(-3, 3)) for pid, piece in pieces.items()}
+    moved = tidy_pieces(squashed)
+    tidied = dict(squashed, **moved)
+
+    assert set(moved) == set(pieces)
+    assert bonded_elements(tidied) == bonded_elements(pieces)
+    graph = PieceGraph(tidied)
+    lengths = [np.hypot(*np.subtract(graph.centers[a], graph.centers[b])) for a, b, _ in graph.bonds.values()]
+    assert 0.7 * IDEAL_BOND_PX < min(lengths) and max(lengths) < 1.3 * IDEAL_BOND_PX
+    assert min(piece["x"] for piece in moved.values()) >= MARGIN_PX - 1
+
+
+def test_nothing_to_tidy_for_a_lone_atom():
+    assert tidy_pieces(import_structure("[Na+]")) == {}
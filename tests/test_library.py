@@ -0,0 +1,52 @@
+from collections import Counter
+
+from lewis_core.graph import PieceGraph
+from lewis_core.library import MoleculeLibrary, build_index, parse_formula, read_source
+
+
+def test_parse_formula():
+    assert parse_formula("C2H6O") == Counter({"C": 2, "H": 6, "O": 1})
+    assert parse_formula("ethanol") is None
+    assert parse_formula("") is None
+
+
+def test_bundled_index_matches_its_source():
+    library = MoleculeLibrary()
+    names = [name for name, _, _ in read_source()]
+    assert len(library) == len(names)
+    assert [library.name(record) for record in range(len(library))] == names
+
+
+def test_homologous_series_stop_at_ten_carbons():
+    library = MoleculeLibrary()
+    assert library.search_name("decane") and not library.search_name("undecane")
+    assert not library.search_name("cycloheptapentacontane")
+
+
+def test_search_by_name_alias_and_formula():
+    library = MoleculeLibrary()
+    assert [library.name(record) for record in library.search_name("acetylsal")] == ["aspirin"]
+    by_formula = [library.name(record) for record in library.search("C2H6O")]
+    assert {"ethanol", "dimethyl ether"} <= set(by_formula)
+    assert all(library.formula(record) == "C2H6O" for record in library.search_formula("C2H6O"))
+
+
+def test_contains_filter_requires_every_element():
+    library = MoleculeLibrary()
+    hits = library.search("", contains=["N", "S"], limit=None)
+    assert hits
+    assert all({"N", "S"} <= set(parse_formula(library.formula(record))) for record in hits)
+
+
+def test_build_and_read_a_small_index(tmp_path):
+    source = tmp_path / "molecules.tsv"
+    source.write_text("# name\tSMILES\taliases\nwater\tO\tH2O\nmethanol\tCO\twood alcohol\n", encoding="utf-8")
+    assert build_index(str(source), str(tmp_path / "molecules.idx")) == 2
+
+    library = MoleculeLibrary(str(tmp_path / "molecules.idx"))
+    assert library.search_name("wood") == [1]
+    assert library.search_formula("H2O") == [0]
+    pieces = library.pieces(1, origin=(500, 0))
+    graph = PieceGraph(pieces)
+    assert Counter(graph.atoms.values()) == {"C": 1, "O": 1, "H": 4}
+    assert min(piece["x"] for piece in pieces.values()) >= 500
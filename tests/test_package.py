@@ -0,0 +1,48 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import lewis_core
+
+
+def loaded_after(statement):
+    """The lewis_core modules, and whether streamlit or numpy, that a fresh
+    interpreter has loaded after running ``statement``."""
+    probe = statement + (
+        "\nimport json, sys"
+        "\nprint(json.dumps(sorted(m for m in sys.modules"
+        " if m.split('.')[0] in ('streamlit', 'numpy') and '.' not in m or m.startswith('lewis_core.'))))"
+    )
+    root = os.path.dirname(os.path.dirname(lewis_core.__file__))
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, timeout=60, cwd=root)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+
+def test_importing_the_package_loads_nothing_else():
+    assert loaded_after("import lewis_core") == []
+
+
+def test_a_name_loads_only_its_module():
+    assert loaded_after("from lewis_core import ingest") == ["lewis_core.events", "lewis_core.pieces"]
+
+
+def test_nothing_in_the_engine_needs_streamlit():
+    loaded = loaded_after("import lewis_core\nfor name in lewis_core.__all__: getattr(lewis_core, name)")
+    assert "streamlit" not in loaded and "numpy" in loaded
+
+
+@pytest.mark.parametrize("name", lewis_core.__all__)
+def test_every_export_resolves_to_its_module(name):
+    module = importlib.import_module(f"lewis_core.{lewis_core._LOCATIONS[name]}")
+    assert getattr(lewis_core, name) is getattr(module, name)
+    assert name in dir(lewis_core)
+
+
+def test_unknown_names_raise_attribute_error():
+    with pytest.raises(AttributeError):
+        lewis_core.no_such_thing
@@ -0,0 +1,94 @@
+import marshal
+import threading
+import tracemalloc
+
+from lewis_core.profiling import Profiler
+
+KEPT = []
+
+
+def busy_rerun():
+    return sum(i * i for i in range(20000))
+
+
+def allocating_rerun():
+    KEPT.append([bytearray(1024) for _ in range(200)])
+
+
+def function_names(profile):
+    return {name for _, _, name in marshal.loads(profile.pstats_bytes())}
+
+
+def test_unarmed_sessions_are_not_captured():
+    profiler = Profiler()
+    assert profiler.begin("s1") is None
+    profiler.end(None)
+    assert profiler.wrap(None, busy_rerun) is busy_rerun
+    assert profiler.profiles() == []
+
+
+def test_an_armed_session_captures_the_requested_reruns():
+    profiler = Profiler()
+    tracing = tracemalloc.is_tracing()
+    profiler.arm("s1", 2)
+    for _ in range(3):
+        capture = profiler.begin("s1")
+        busy_rerun()
+        profiler.end(capture)
+    assert capture is None
+    profile, = profiler.profiles()
+    assert (profile.captured, profile.remaining, profile.jobs) == (2, 0, 0)
+    assert "busy_rerun" in function_names(profile)
+    assert profile.report().startswith("Session s1: 2 of 2 rerun(s), 0 analysis job(s)")
+    # Tracing stops with the last capture unless it was on before
+    assert tracemalloc.is_tracing() == tracing
+    assert profiler.begin("s2") is None
+
+
+def test_allocations_are_net_of_each_rerun():
+    profiler = Profiler()
+    profiler.arm("s1", 1)
+    capture = profiler.begin("s1")
+    allocating_rerun()
+    profiler.end(capture)
+    profile, = profiler.profiles()
+    kept = sum(size for traceback, (size, _) in profile.allocations.items()
+               if any(frame.filename == __file__ for frame in traceback))
+    assert kept >= 200 * 1024 and profile.peak >= kept
+
+
+def test_a_rerun_that_never_ended_is_ended_by_the_next():
+    profiler = Profiler()
+    profiler.arm("s1", 3)
+    first = profiler.begin("s1")
+    second = profiler.begin("s1")
+    assert first.ended and not second.ended
+    profiler.end(second)
+    profiler.end(second)
+    assert profiler.profiles()[0].captured == 2
+
+
+def test_wrapped_jobs_count_towards_the_session():
+    profiler = Profiler()
+    profiler.arm("s1", 1)
+    capture = profiler.begin("s1")
+    job = profiler.wrap(capture, busy_rerun)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(job()))
+    worker.start()
+    worker.join()
+    profiler.end(capture)
+    profile, = profiler.profiles()
+    assert results == [busy_rerun()] and profile.jobs == 1
+    assert "busy_rerun" in function_names(profile)
+
+
+def test_arming_again_drops_older_results_and_disarm_forgets():
+    profiler = Profiler()
+    profiler.arm("s1", 1)
+    profiler.end(profiler.begin("s1"))
+    profiler.arm("s1", 5)
+    assert profiler.profiles()[0].captured == 0
+    assert "(nothing captured yet)" in profiler.profiles()[0].report()
+    profiler.disarm("s1")
+    assert profiler.profiles() == [] and profiler.begin("s1") is None
@@ -0,0 +1,55 @@
+from lewis_core.ratelimit import EventThrottle, TokenBucket
+
+
+def move(pid, x, **extra):
+    return dict({"id": pid, "x": x, "y": 0.0, "deleted": False}, **extra)
+
+
+def test_bucket_allows_a_burst_then_the_sustained_rate():
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    assert [bucket.take(now=bucket.stamp) for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait(now=bucket.stamp) == 0.5
+    assert bucket.take(now=bucket.stamp + 0.5)
+
+
+def test_an_oversized_cost_passes_once_the_bucket_is_full():
+    bucket = TokenBucket(rate=1.0, burst=2.0)
+    assert bucket.take(5.0, now=bucket.stamp)
+    assert bucket.tokens == -3.0
+    assert bucket.wait(5.0, now=bucket.stamp) == 5.0
+
+
+def test_held_events_are_merged_per_piece_and_released_together():
+    throttle = EventThrottle(rate=1.0, burst=1.0)
+    start = throttle.bucket.stamp
+    assert throttle.admit({"events": [move("a", 1, label="C", type="atom")]}, start)["events"]
+
+    assert throttle.admit({"events": [move("a", 2, label="C", type="atom")]}, start) == {"events": []}
+    assert throttle.admit({"events": [move("a", 3), move("b", 4)]}, start) == {"events": []}
+    assert (throttle.throttled, throttle.coalesced) == (2, 1)
+    assert throttle.hint(start) == {"interval_ms": 1000, "retry_after_ms": 1000, "pending": 2}
+
+    # The empty post the canvas sends after retry_after_ms collects them
+    released = throttle.admit({"events": []}, start + 1.0)["events"]
+    assert released == [move("a", 3, label="C", type="atom"), move("b", 4)]
+    assert throttle.hint(start + 1.0)["pending"] == 0
+
+
+def test_a_delete_replaces_what_waits_for_its_piece():
+    throttle = EventThrottle(rate=1.0, burst=1.0)
+    now = throttle.bucket.stamp
+    throttle.admit({"events": [move("x", 0)]}, now)
+    throttle.admit({"events": [move("a", 1, label="C", type="atom")]}, now)
+    throttle.admit({"events": [{"id": "a", "deleted": True}]}, now)
+    assert throttle.pending == {"a": {"id": "a", "deleted": True}}
+
+
+def test_events_past_max_pending_are_dropped():
+    throttle = EventThrottle(rate=1.0, burst=1.0, max_pending=2)
+    now = throttle.bucket.stamp
+    throttle.admit({"events": [move("x", 0)]}, now)
+    throttle.admit({"events": [move(pid, 0) for pid in "abc"]}, now)
+    assert sorted(throttle.pending) == ["a", "b"] and throttle.dropped == 1
+    # Pieces already waiting still take updates
+    throttle.admit({"events": [move("a", 9)]}, now)
+    assert throttle.pending["a"]["x"] == 9 and throttle.dropped == 1
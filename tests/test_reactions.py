@@ -0,0 +1,64 @@
+from lewis_core.components import ComponentTracker
+from lewis_core.events import apply_events
+from lewis_core.importer import import_structure
+from lewis_core.reactions import ARROW, PLUS
+
+
+def scheme(*columns, arrows=()):
+    """Pieces for ``columns`` of SMILES, 400 px apart, with arrows and plus
+    signs at the given x positions."""
+    pieces = {}
+    for i, column in enumerate(columns):
+        for j, smiles in enumerate(column):
+            for pid, piece in import_structure(smiles, origin=(400.0 * i, 300.0 * j)).items():
+                pieces[f"m{i}{j}-{pid}"] = piece
+    for k, x in enumerate(arrows):
+        pieces[f"arrow{k}"] = {"x": x, "y": 0.0, "label": ARROW, "type": "reaction"}
+        pieces[f"plus{k}"] = {"x": x - 200.0, "y": 0.0, "label": PLUS, "type": "reaction"}
+    return pieces
+
+
+def steps(tracker):
+    tracker.components()
+    return tracker.reactions.steps()
+
+
+def test_a_balanced_combustion():
+    tracker = ComponentTracker(scheme(["C", "O=O"], ["O=O"], ["O=C=O"], ["O", "O"], arrows=[700.0]))
+    step, = steps(tracker)
+    assert step["reactants"] == "CH4 + 2 O2" and step["products"] == "CO2 + 2 H2O"
+    assert step["atoms_balanced"] and step["charge_balanced"] and step["missing"] == {}
+
+
+def test_missing_atoms_and_charge_are_reported():
+    pieces = scheme(["N"], ["[NH4+]", "O"], arrows=[300.0])
+    step, = steps(ComponentTracker(pieces))
+    assert step["missing"] == {"H": -3, "O": -1}
+    assert not step["charge_balanced"] and step["charges"] == (0, 1)
+
+
+def test_each_arrow_is_a_step():
+    tracker = ComponentTracker(scheme(["N", "[H+]"], ["[NH4+]"], ["[NH4+]", "[Cl-]"], arrows=[300.0, 700.0]))
+    first, second = steps(tracker)
+    assert (first["step"], first["atoms_balanced"], first["charge_balanced"]) == (1, True, True)
+    assert second["reactants"] == "H4N" and second["products"] == "Cl + H4N"
+    assert second["missing"] == {"Cl": -1} and second["charges"] == (1, 0)
+
+
+def test_edits_and_arrow_moves_update_the_balance():
+    pieces = scheme(["C", "O=O"], ["O=O"], ["O=C=O"], ["O", "O"], arrows=[700.0])
+    tracker = ComponentTracker(dict(pieces))
+    water = [pid for pid in pieces if pid.startswith("m31-")]
+    tracker.update(apply_events(pieces, {"events": [{"id": pid, "deleted": True} for pid in water]}))
+    step, = steps(tracker)
+    assert step["products"] == "CO2 + H2O" and step["missing"] == {"H": 2, "O": 1}
+
+    # Moving the arrow past everything leaves no products
+    arrow = dict(pieces["arrow0"], id="arrow0", x=5000.0)
+    tracker.update(apply_events(pieces, arrow))
+    step, = steps(tracker)
+    assert step["products"] == "" and step["reactants"] == "CH4 + CO2 + H2O + 2 O2"
+    assert steps(tracker) == steps(ComponentTracker(dict(pieces)))
+
+    tracker.update(apply_events(pieces, {"id": "arrow0", "deleted": True}))
+    assert steps(tracker) == []
@@ -0,0 +1,69 @@
+import json
+
+from lewis_core.events import ingest, piece_events
+from lewis_core.importer import import_structure
+from lewis_core.replay import EventRecorder, latency_stats, main, read_recording, replay
+from lewis_core.session import init_session
+
+
+def test_a_replay_rebuilds_every_recorded_session(tmp_path):
+    recorder = EventRecorder(str(tmp_path / "events.jsonl"))
+    states = [init_session({"recorder": recorder}) for _ in range(2)]
+    for state, smiles in zip(states, ("CCO", "c1ccccc1")):
+        pieces = import_structure(smiles)
+        ingest(state, piece_events(pieces))
+        pid = next(iter(pieces))
+        ingest(state, {"id": pid, "x": 500.0, "y": 300.0, "deleted": False})
+    ingest(states[0], {"events": [{"id": next(iter(states[0]["pieces"])), "deleted": True}]})
+    recorder.close()
+
+    records = list(read_recording(recorder.path))
+    assert len(records) == 5
+    assert {record["session"] for record in records} == {state["session_id"] for state in states}
+
+    stats, replayed = replay(records, speed=None)
+    assert stats["events"] == 5
+    for state in states:
+        again = replayed[state["session_id"]]
+        assert again["pieces"] == state["pieces"]
+        assert again["summary"].formula == state["summary"].formula
+
+
+def test_replay_keeps_the_recorded_pace(tmp_path):
+    event = {"id": "a", "x": 0.0, "y": 0.0, "deleted": False, "label": "C", "type": "atom"}
+    records = [{"t": 100.0 + i, "session": "s", "payload": dict(event, x=float(i))} for i in range(3)]
+    stats, states = replay(records, speed=20)
+    # Two seconds of recording at 20x
+    assert stats["elapsed_s"] >= 0.1
+    assert states["s"]["pieces"]["a"]["x"] == 2.0
+
+
+def test_a_flood_waits_in_the_throttle_as_it_did_live():
+    records = [
+        {"t": 100.0, "session": "s",
+         "payload": {"id": f"p{i}", "x": float(i), "y": 0.0, "deleted": False, "label": "C", "type": "atom"}}
+        for i in range(40)
+    ]
+    stats, states = replay(records, speed=None)
+    # The burst goes straight through; the rest waits and is collected at the end
+    assert stats["events"] == 40 and stats["throttled"] >= 15
+    state = states["s"]
+    assert len(state["pieces"]) == 40 and not state["throttle"].pending
+    assert state["summary"].formula == "C40"
+    assert state["revision"] < 40
+
+
+def test_latency_stats_of_nothing():
+    assert latency_stats([], 1.0) == {"events": 0, "elapsed_s": 1.0}
+    stats = latency_stats([0.001, 0.002, 0.003], 2.0)
+    assert stats["p50_ms"] == 2.0 and stats["max_ms"] == 3.0 and stats["events_per_s"] == 1.5
+
+
+def test_main_prints_a_summary(tmp_path, capsys):
+    path = tmp_path / "events.jsonl"
+    recorder = EventRecorder(str(path))
+    recorder.record(piece_events(import_structure("O")), "s")
+    recorder.close()
+    main([str(path), "--speed", "max"])
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["sessions"] == 1 and summary["pieces"] == len(import_structure("O"))
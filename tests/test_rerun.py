@@ -0,0 +1,132 @@
+import json
+import time
+
+from lewis_core import rerun
+from lewis_core.canvas import ORGANIC_ATOMS
+from lewis_core.events import piece_events
+from lewis_core.importer import import_structure
+from lewis_core.loadtest import SimulatedSession, run_level
+from lewis_core.profiling import Profiler
+from lewis_core.replay import EventRecorder, read_recording
+from lewis_core.rerun import BuilderRun
+from lewis_core.session import SessionRegistry
+from lewis_core.workers import AnalysisPool
+
+
+def settled(pool, session_id, timeout=10.0):
+    """Polls a session's analysis until the newest job has finished."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        outcome = pool.latest(session_id, "molecules")
+        if outcome is not None and outcome[2]:
+            return outcome
+        time.sleep(0.01)
+    raise AssertionError("analysis did not finish")
+
+
+def test_a_rerun_keeps_its_session_in_the_registry(tmp_path):
+    registry, pool = SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1)
+    run = BuilderRun(registry, pool)
+    run.receive(piece_events(import_structure("CCO")))
+    page = run.canvas_html(ORGANIC_ATOMS)
+    run.analysis()
+    run.close()
+
+    assert all(f'"{pid}"' in page for pid in run.state["pieces"])
+    again = BuilderRun(registry, pool, session_id=run.session_id)
+    assert again.state is run.state
+    scheme = settled(pool, again.session_id)[0]
+    assert [molecule["formula"] for molecule in scheme["molecules"]] == ["C2H6O"]
+    assert scheme["steps"] == []
+    again.close()
+    pool.executor.shutdown(wait=True)
+
+
+def test_events_over_the_rate_wait_and_show_in_the_hint(tmp_path):
+    run = BuilderRun(SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1))
+    pieces = import_structure("CC")
+    for _ in range(60):
+        run.receive(piece_events(pieces))
+    assert run.throttle["pending"] == len(pieces)
+    assert run.throttle["retry_after_ms"] > 0
+    assert f'"pending": {len(pieces)}' in run.canvas_html(ORGANIC_ATOMS)
+    run.close()
+
+
+def test_an_armed_session_is_profiled_with_its_analysis(tmp_path):
+    registry, pool, profiler = SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1), Profiler()
+    session_id = BuilderRun(registry, pool).session_id
+    profiler.arm(session_id, 1)
+
+    run = BuilderRun(registry, pool, profiler, session_id)
+    run.receive(piece_events(import_structure("O")))
+    run.analysis()
+    settled(pool, session_id)
+    run.close()
+    pool.executor.shutdown(wait=True)
+
+    profile = profiler.profiles()[0]
+    assert (profile.captured, profile.jobs) == (1, 1)
+    assert profile.stats is not None
+
+
+def test_the_load_test_runs_the_app_rerun(tmp_path):
+    registry, pool = SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1)
+    session = SimulatedSession(registry, pool)
+    session.rerun(piece_events(import_structure("CC(=O)O")))
+    outcome = settled(pool, session.session_id)
+    # The scheme analysis the app submits, not the per-molecule one
+    assert set(outcome[0]) == {"molecules", "steps"}
+    assert registry.usage()[0]["pieces"] == len(session.state["pieces"])
+    pool.executor.shutdown(wait=True)
+
+
+def test_run_level_reports_latencies():
+    stats = run_level(2, duration=0.5, interval=0.05, workers=1)
+    assert stats["sessions"] == 2 and stats["events"] > 0
+
+
+def test_payloads_are_recorded_as_received_before_the_throttle(tmp_path):
+    run = BuilderRun(SessionRegistry(str(tmp_path / "sessions")), AnalysisPool(max_workers=1))
+    recorder = run.state["recorder"] = EventRecorder(str(tmp_path / "events.jsonl"))
+    flood = [{"events": [{"id": "a", "x": float(x), "y": 0.0, "deleted": False, "label": "C", "type": "atom"}]}
+             for x in range(40)]
+    for payload in flood:
+        run.receive(payload)
+    # The canvas' empty post that collects held events is not worth a line
+    run.receive({"events": []})
+    run.close()
+    recorder.close()
+
+    assert [record["payload"] for record in read_recording(recorder.path)] == flood
+
+
+def test_a_held_event_reuses_the_rendered_pages(tmp_path, monkeypatch):
+    run = BuilderRun(SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1))
+    pieces = import_structure("CC")
+    while not run.throttle["pending"]:
+        run.receive(piece_events(pieces))
+    run.canvas_html(ORGANIC_ATOMS)
+    shown = run.pieces_json()
+    assert json.loads(shown) == run.state["pieces"]
+
+    built = []
+    monkeypatch.setattr(rerun, "builder_page", lambda *args: built.append(args))
+    assert run.receive(piece_events(pieces)) == []
+    page = run.canvas_html(ORGANIC_ATOMS)
+    assert all(f'"{pid}"' in page for pid in pieces)
+    assert json.dumps(run.throttle) in page
+    assert run.pieces_json() is shown
+    assert built == []
+    run.close()
+
+
+def test_incomplete_pieces_are_not_mounted(tmp_path):
+    run = BuilderRun(SessionRegistry(str(tmp_path)), AnalysisPool(max_workers=1))
+    # As a session saved before events were checked may still hold it
+    run.state["pieces"].update(
+        a={"x": 0.0, "y": 0.0, "label": "C", "type": "atom"},
+        b={"x": 1.0, "y": 1.0, "label": None, "type": None},
+    )
+    assert [piece["id"] for piece in run.mounted] == ["a"]
+    run.close()
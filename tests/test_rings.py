@@ -0,0 +1,46 @@
+import pytest
+
+from lewis_core.components import ComponentTracker
+from lewis_core.events import apply_events
+from lewis_core.importer import import_structure
+from lewis_core.pieces import BOND_ORDERS
+
+
+def rings_of(pieces):
+    (_, _, summary), = ComponentTracker(pieces).components()
+    return sorted((ring["size"], ring["aromatic"]) for ring in summary["rings"])
+
+
+@pytest.mark.parametrize("smiles, expected", [
+    ("c1ccccc1", [(6, True)]),
+    ("C1CCCCC1", [(6, False)]),
+    ("c1ccncc1", [(6, True)]),
+    ("c1ccoc1", [(5, True)]),
+    ("c1cc[nH]c1", [(5, True)]),
+    ("C1=CCC=C1", [(5, False)]),
+    ("O=C1C=CC(=O)C=C1", [(6, False)]),
+    ("c1ccc2ccccc2c1", [(6, True), (6, True)]),
+    ("C1CC2CCC1C2", [(5, False), (5, False)]),
+    ("CCO", []),
+])
+def test_smallest_rings_and_huckel_flags(smiles, expected):
+    assert rings_of(import_structure(smiles)) == expected
+
+
+def test_ring_atoms_come_in_ring_order():
+    pieces = import_structure("c1ccccc1")
+    tracker = ComponentTracker(pieces)
+    (_, _, summary), = tracker.components()
+    atoms = summary["rings"][0]["atoms"]
+    assert len(set(atoms)) == 6
+    for a, b in zip(atoms, atoms[1:] + atoms[:1]):
+        assert b in {neighbor for neighbor, _ in tracker.graph.neighbors(a)}
+
+
+def test_opening_a_ring_updates_the_tracker():
+    pieces = import_structure("c1ccccc1")
+    tracker = ComponentTracker(dict(pieces))
+    bond = next(pid for pid, piece in pieces.items() if piece["label"] in BOND_ORDERS)
+    tracker.update(apply_events(pieces, {"id": bond, "deleted": True}))
+    (_, _, summary), = tracker.components()
+    assert summary["rings"] == [] and rings_of(pieces) == []
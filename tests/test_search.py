@@ -0,0 +1,86 @@
+import pytest
+
+from lewis_core.importer import import_structure
+from lewis_core.pieces import centered_piece
+from lewis_core.search import FUNCTIONAL_GROUPS, MolGraph, StructureStore, contains
+
+
+def drawn(smiles):
+    """The graph the search sees for a structure drawn on the canvas."""
+    return MolGraph.from_pieces(import_structure(smiles))
+
+
+@pytest.mark.parametrize("group, smiles", [
+    ("Alcohol", "CCO"),
+    ("Alcohol", "CC(C)(C)O"),
+    ("Alcohol", "OCC1OC(O)C(O)C(O)C1O"),
+    ("Ether", "CCOCC"),
+    ("Ether", "CC(C)(C)OC(C)(C)C"),
+    ("Ether", "COc1ccccc1"),
+    ("Primary amine", "CCN"),
+    ("Primary amine", "CC(C)(C)N"),
+    ("Alkene", "C=C"),
+    ("Alkene", "C=Cc1ccccc1"),
+    ("Carboxylic acid", "CC(=O)O"),
+    ("Ester", "CC(=O)OC"),
+    ("Amide", "CC(=O)N"),
+    ("Ketone", "CC(=O)C"),
+    ("Benzene ring", "c1ccccc1"),
+    ("Alkyl halide (Cl)", "CCCl"),
+])
+def test_group_is_found(group, smiles):
+    assert contains(drawn(smiles), MolGraph.from_group(group))
+
+
+@pytest.mark.parametrize("group, smiles", [
+    ("Alcohol", "CC(=O)O"),
+    ("Alcohol", "Oc1ccccc1"),
+    ("Alcohol", "CCOCC"),
+    ("Ether", "CC(=O)OC"),
+    ("Ether", "CCO"),
+    ("Primary amine", "CC(=O)N"),
+    ("Primary amine", "CNC"),
+    ("Alkene", "c1ccccc1"),
+    ("Alkene", "Oc1ccccc1"),
+    ("Alkene", "c1ccncc1"),
+    ("Ketone", "CC=O"),
+    ("Alkyl halide (Cl)", "CC(=O)Cl"),
+    ("Alkyl halide (Cl)", "Clc1ccccc1"),
+])
+def test_group_is_not_found(group, smiles):
+    assert not contains(drawn(smiles), MolGraph.from_group(group))
+
+
+def test_every_group_pattern_parses():
+    for name in FUNCTIONAL_GROUPS:
+        assert MolGraph.from_group(name).elements
+
+
+def test_stacked_bond_glyphs_add_up_as_in_grading():
+    pieces = {
+        "c1": centered_piece("C", "atom", 100, 100),
+        "c2": centered_piece("C", "atom", 210, 100),
+        "b1": centered_piece("-", "bond", 155, 100),
+        "b2": centered_piece("-", "bond", 155, 104),
+    }
+    graph = MolGraph.from_pieces(pieces, charges=False)
+    assert graph.adjacency[0][1] == 2
+    assert contains(graph, MolGraph.from_smiles("C=C"))
+
+
+def test_fingerprint_of_a_substructure_is_a_subset():
+    whole, part = drawn("CC(=O)OCC").fingerprint(), MolGraph.from_smiles("C(=O)OC").fingerprint()
+    assert ((whole & part) == part).all()
+
+
+def test_store_search_screens_and_confirms(tmp_path):
+    store = StructureStore(str(tmp_path))
+    for name, smiles in [("ethanol", "CCO"), ("acetic acid", "CC(=O)O"), ("tert-butanol", "CC(C)(C)O")]:
+        store.add(name, import_structure(smiles))
+    assert [store.meta[r]["name"] for r in store.search("Alcohol")] == ["ethanol", "tert-butanol"]
+    assert store.search("Carboxylic acid") == [1]
+
+    reopened = StructureStore(str(tmp_path))
+    assert len(reopened) == 3
+    assert reopened.search("Alcohol") == [0, 2]
+    assert reopened.pieces(1) == store.pieces(1)
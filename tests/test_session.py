@@ -0,0 +1,54 @@
+import os
+
+from lewis_core.events import ingest, piece_events
+from lewis_core.importer import import_structure
+from lewis_core.session import SessionRegistry, init_session, session_usage
+
+
+def test_init_session_fills_in_only_what_is_missing():
+    pieces = {"a": {"x": 0.0, "y": 0.0, "label": "C", "type": "atom"}}
+    state = init_session({"pieces": pieces, "session_id": "s1"})
+    assert state["pieces"] is pieces and state["session_id"] == "s1"
+    assert {"components", "summary", "throttle"} <= set(state)
+
+
+def test_release_measures_the_session(tmp_path):
+    registry = SessionRegistry(str(tmp_path))
+    state = registry.checkout()
+    ingest(state, piece_events(import_structure("CCO")))
+    registry.release(state)
+
+    row, = registry.usage()
+    assert row["session_id"] == state["session_id"] and row["pieces"] == len(state["pieces"])
+    assert row["bytes"] == row["piece_bytes"] + row["cache_bytes"] > 0
+    assert registry.totals()["bytes"] == row["bytes"]
+
+
+def test_idle_sessions_go_to_disk_and_come_back(tmp_path):
+    evicted = []
+    registry = SessionRegistry(str(tmp_path), ceiling_mb=0, min_idle=-1, on_evict=evicted.append)
+    state = registry.checkout()
+    ingest(state, piece_events(import_structure("CC=O")))
+    pieces, session_id = dict(state["pieces"]), state["session_id"]
+    registry.release(state)
+
+    assert evicted == [session_id]
+    assert registry.totals()["resident"] == 0 and registry.totals()["on_disk"] == 1
+
+    restored = registry.checkout(session_id)
+    assert restored is not state and restored["pieces"] == pieces
+    assert restored["summary"].formula == "C2H4O"
+    assert not os.listdir(tmp_path)
+
+
+def test_unknown_ids_get_a_fresh_state(tmp_path):
+    registry = SessionRegistry(str(tmp_path))
+    state = registry.checkout("gone")
+    assert state["session_id"] == "gone" and state["pieces"] == {}
+    assert registry.checkout("gone") is state
+
+
+def test_usage_leaves_the_recorder_out():
+    state = init_session({})
+    state["recorder"] = bytearray(2 ** 20)
+    assert session_usage(state)["bytes"] < 2 ** 20
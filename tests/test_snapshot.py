@@ -0,0 +1,86 @@
+import zlib
+
+import pytest
+
+from lewis_core.importer import import_structure
+from lewis_core.snapshot import (
+    MAGIC,
+    SNAPSHOT_VERSION,
+    SnapshotError,
+    _put_text,
+    _put_varint,
+    dump_snapshot,
+    load_snapshot,
+    pieces_from_token,
+    snapshot_token,
+)
+
+
+def as_drawn(pieces):
+    """Pieces without their ids, in order, at the snapshot's quarter-pixel steps."""
+    return [
+        (piece["label"], piece["type"], round(piece["x"] * 4) / 4, round(piece["y"] * 4) / 4)
+        for piece in pieces.values()
+    ]
+
+
+def test_snapshots_round_trip_with_fresh_ids():
+    pieces = import_structure("OC(=O)CC(O)(CC(=O)O)C(=O)O")
+    loaded = load_snapshot(dump_snapshot(pieces))
+    assert as_drawn(loaded) == as_drawn(pieces)
+    assert not set(loaded) & set(pieces)
+
+
+def test_share_tokens_round_trip_through_whitespace():
+    pieces = import_structure("CC=O")
+    token = snapshot_token(pieces)
+    assert set(token) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+    wrapped = "\n".join(token[i:i + 20] for i in range(0, len(token), 20))
+    assert as_drawn(pieces_from_token(f"  {wrapped} ")) == as_drawn(pieces)
+
+
+def test_an_empty_canvas_round_trips():
+    assert load_snapshot(dump_snapshot({})) == {}
+
+
+def test_incomplete_pieces_are_left_out():
+    pieces = import_structure("O")
+    broken = dict(pieces, a={"x": 1.0, "y": 2.0, "label": None, "type": "atom"}, b={"x": 1.0, "y": 2.0})
+    assert as_drawn(load_snapshot(dump_snapshot(broken))) == as_drawn(pieces)
+
+
+def forged(table, entries):
+    """Snapshot bytes with the given label table and pieces at the origin."""
+    body = bytearray()
+    _put_varint(body, 4)
+    _put_varint(body, len(table))
+    for label, kind in table:
+        _put_text(body, label)
+        _put_text(body, kind)
+    _put_varint(body, len(entries))
+    body += bytes(entries) + bytes(2 * len(entries))
+    return MAGIC + bytes([SNAPSHOT_VERSION]) + zlib.compress(bytes(body))
+
+
+def test_forged_snapshots_are_refused():
+    assert load_snapshot(forged([("C", "atom")], [0, 0]))
+    with pytest.raises(SnapshotError, match="empty label"):
+        load_snapshot(forged([("", "atom")], [0]))
+    with pytest.raises(SnapshotError, match="empty label"):
+        load_snapshot(forged([("C", "")], [0]))
+    with pytest.raises(SnapshotError, match="missing label"):
+        load_snapshot(forged([("C", "atom")], [1]))
+
+
+@pytest.mark.parametrize("data", [b"", b"LWS", b"PNG\x01", b"LWS\x09abc", b"LWS\x01not zlib"])
+def test_garbage_is_refused(data):
+    with pytest.raises(SnapshotError):
+        load_snapshot(data)
+
+
+def test_truncated_snapshots_are_refused():
+    data = dump_snapshot(import_structure("CCO"))
+    with pytest.raises(SnapshotError):
+        load_snapshot(data[:-3])
+    with pytest.raises(SnapshotError):
+        pieces_from_token("not a token!")
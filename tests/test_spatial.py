@@ -0,0 +1,55 @@
+import math
+import random
+
+import pytest
+
+from lewis_core.spatial import KDTree, LazyKDTree, SpatialHash
+
+
+def brute_force(points, x, y, radius):
+    return sorted(
+        (math.hypot(px - x, py - y), key)
+        for key, (px, py) in points.items()
+        if math.hypot(px - x, py - y) <= radius
+    )
+
+
+def scattered(count, seed=0):
+    rng = random.Random(seed)
+    points = {f"a{i}": (rng.uniform(0, 1500), rng.uniform(0, 900)) for i in range(count)}
+    # Duplicates and points on one line stress the median splits
+    points.update({f"d{i}": (700.0, 400.0) for i in range(12)})
+    points.update({f"l{i}": (100.0, 10.0 * i) for i in range(30)})
+    return points
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 300])
+def test_tree_queries_match_brute_force(count):
+    points = scattered(count)
+    tree, grid = KDTree(points), SpatialHash(70.0)
+    for key, (x, y) in points.items():
+        grid.insert(key, x, y)
+    rng = random.Random(count)
+    for _ in range(200):
+        x, y, radius = rng.uniform(-50, 1550), rng.uniform(-50, 950), rng.choice([0.0, 5.0, 70.0, 400.0])
+        expected = brute_force(points, x, y, radius)
+        assert tree.query_radius(x, y, radius) == expected
+        assert grid.query_radius(x, y, radius) == expected
+    assert tree.query_radius(700.0, 400.0, 0.0) == sorted((0.0, f"d{i}") for i in range(12))
+
+
+def test_lazy_tree_rebuilds_once_per_batch_of_changes():
+    lazy = LazyKDTree()
+    for key, (x, y) in scattered(50).items():
+        lazy.insert(key, x, y)
+    assert lazy.rebuilds == 0
+    assert lazy.nearest(700.0, 401.0, 5.0).startswith("d")
+    lazy.insert("d0", 700.0, 400.0)
+    lazy.nearest(0.0, 0.0, 10.0)
+    assert lazy.rebuilds == 1
+
+    lazy.move("a0", 2000.0, 2000.0)
+    lazy.remove("a1")
+    lazy.remove("missing")
+    assert lazy.nearest(2001.0, 2000.0, 5.0) == "a0"
+    assert "a1" not in lazy and lazy.rebuilds == 2
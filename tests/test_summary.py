@@ -0,0 +1,61 @@
+import random
+
+from lewis_core.events import apply_events
+from lewis_core.summary import LiveSummary
+
+
+def piece(label, type, x=0.0, y=0.0):
+    return {"x": x, "y": y, "label": label, "type": type}
+
+
+def test_water_with_two_lone_pairs_is_neutral():
+    pieces = {
+        "o": piece("O", "atom"), "h1": piece("H", "atom"), "h2": piece("H", "atom"),
+        "b1": piece("-", "bond"), "b2": piece("-", "bond"),
+        "e1": piece("••", "electron"), "e2": piece(":", "electron"),
+    }
+    assert LiveSummary(pieces).as_dict() == {
+        "formula": "H2O", "atoms": 3, "electrons": 8, "expected": 8, "charge": 0,
+    }
+
+
+def test_charge_follows_missing_and_extra_electrons():
+    pieces = {"n": piece("N", "atom"), "e": piece("|", "electron")}
+    summary = LiveSummary(pieces)
+    assert summary.charge == 3
+    summary.update(apply_events(pieces, {"events": [
+        {"id": f"p{i}", "x": 0, "y": 0, "label": "••", "type": "electron"} for i in range(3)
+    ]}))
+    assert summary.electrons == 8 and summary.charge == -3
+
+
+def test_moves_cost_nothing_and_relabels_swap_counts():
+    pieces = {"a": piece("C", "atom"), "b": piece("=", "bond")}
+    summary = LiveSummary(pieces)
+    summary.update(apply_events(pieces, {"id": "a", "x": 9, "y": 9, "label": None, "type": None}))
+    assert summary.as_dict() == LiveSummary(pieces).as_dict()
+    summary.update(apply_events(pieces, {"events": [
+        {"id": "a", "x": 9, "y": 9, "label": "Si", "type": "atom"},
+        {"id": "b", "x": 0, "y": 0, "label": "≡", "type": "bond"},
+    ]}))
+    assert summary.formula == "Si" and summary.electrons == 6
+
+
+def test_incremental_totals_match_a_recount_after_random_edits():
+    rng = random.Random(41)
+    choices = [("C", "atom"), ("H", "atom"), ("O", "atom"), ("Cl", "atom"),
+               ("-", "bond"), ("=", "bond"), ("••", "electron"), ("|", "electron")]
+    pieces, summary = {}, LiveSummary()
+    for _ in range(300):
+        events = []
+        for _ in range(rng.randint(1, 4)):
+            pid = f"p{rng.randrange(40)}"
+            if pid in pieces and rng.random() < 0.3:
+                events.append({"id": pid, "deleted": True})
+            else:
+                label, kind = rng.choice(choices)
+                events.append({"id": pid, "x": rng.random(), "y": rng.random(), "label": label, "type": kind})
+        summary.update(apply_events(pieces, {"events": events}))
+        fresh = LiveSummary(pieces)
+        assert summary.as_dict() == fresh.as_dict()
+        assert +summary.elements == +fresh.elements
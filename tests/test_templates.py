@@ -0,0 +1,46 @@
+import pytest
+
+from lewis_core.events import ingest, piece_events
+from lewis_core.graph import PieceGraph
+from lewis_core.pieces import BOND_ORDERS, new_piece_id
+from lewis_core.session import init_session
+from lewis_core.templates import TEMPLATES, template_pieces
+
+
+def stamp(name, x=0.0, y=0.0):
+    """A template as the canvas stamps it: fresh ids, offset to (x, y)."""
+    return {
+        new_piece_id(): dict(piece, x=piece["x"] + x, y=piece["y"] + y)
+        for piece in template_pieces(name)
+    }
+
+
+@pytest.mark.parametrize("name", list(TEMPLATES))
+def test_templates_start_at_the_origin_and_leave_their_attachment_bonds(name):
+    pieces = stamp(name)
+    assert min(piece["x"] for piece in pieces.values()) == 0
+    assert min(piece["y"] for piece in pieces.values()) == 0
+    graph = PieceGraph(pieces)
+    assert "*" not in graph.atoms.values()
+    glyphs = [pid for pid, piece in pieces.items() if piece["label"] in BOND_ORDERS]
+    dangling = [pid for pid in glyphs if pid not in graph.bonds]
+    assert len(dangling) == TEMPLATES[name].count("*")
+
+
+def test_the_hydroxyl_oxygen_keeps_its_lone_pairs():
+    graph = PieceGraph(stamp("Hydroxyl"))
+    oxygen, = [atom for atom, element in graph.atoms.items() if element == "O"]
+    assert graph.lone_electrons(oxygen) == 4
+
+
+def test_a_stamp_and_a_group_move_are_one_step_each():
+    state = init_session({})
+    pieces = stamp("Benzene ring", 200, 100)
+    ingest(state, piece_events(pieces))
+    assert state["revision"] == 1 and state["summary"].formula == "C6H6"
+
+    moved = {pid: dict(piece, x=piece["x"] + 50, y=piece["y"] - 20) for pid, piece in pieces.items()}
+    changes = ingest(state, piece_events(moved))
+    assert len(changes) == len(pieces) and state["revision"] == 2
+    assert state["pieces"] == moved
+    assert state["summary"].formula == "C6H6"
@@ -0,0 +1,39 @@
+from lewis_core.importer import import_structure
+from lewis_core.search import StructureStore
+from lewis_core.thumbnails import ThumbnailCache, pieces_svg, thumbnail_key
+
+
+def test_the_key_ignores_where_the_drawing_sits():
+    pieces = import_structure("CCO")
+    moved = {pid: dict(piece, x=piece["x"] + 300, y=piece["y"] - 40) for pid, piece in pieces.items()}
+    assert thumbnail_key(moved) == thumbnail_key(pieces)
+    assert thumbnail_key(import_structure("COC")) != thumbnail_key(pieces)
+
+
+def test_labels_are_escaped():
+    svg = pieces_svg({"a": {"x": 0.0, "y": 0.0, "label": "<b>", "type": "atom"}})
+    assert "&lt;b&gt;" in svg and "<b>" not in svg
+
+
+def test_saved_thumbnails_are_served_without_reading_the_pieces(tmp_path):
+    store = StructureStore(str(tmp_path / "saved"))
+    first, second = store.add("ethanol", import_structure("CCO")), store.add("water", import_structure("O"))
+    assert store.record_id(first) != store.record_id(second)
+
+    loads = []
+
+    def load(record):
+        loads.append(record)
+        return store.pieces(record)
+
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"))
+    svg = cache.saved_svg(store.record_id(first), lambda: load(first))
+    assert svg == pieces_svg(store.pieces(first))
+    assert cache.saved_svg(store.record_id(first), lambda: load(first)) == svg
+    # A reopened store names its records the same way
+    reopened = StructureStore(str(tmp_path / "saved"))
+    assert cache.saved_svg(reopened.record_id(first), lambda: load(first)) == svg
+    assert loads == [first]
+
+    assert cache.saved_svg(store.record_id(second), lambda: load(second)) != svg
+    assert loads == [first, second]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from lewis_core.components import ComponentTracker
+from lewis_core.events import apply_events, piece_events
+from lewis_core.importer import import_structure
+from lewis_core.workers import AnalysisPool, DeferredUpdates, analyze_scheme
+
+
+def wait_for(pool, session, name, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while pool.busy(session, name):
+        assert time.monotonic() < deadline, "lane did not go idle"
+        time.sleep(0.005)
+    return pool.latest(session, name)
+
+
+def test_only_the_newest_parked_job_runs():
+    pool = AnalysisPool(max_workers=2)
+    gate, ran = threading.Event(), []
+
+    def job(tag):
+        if tag == 1:
+            gate.wait(5)
+        ran.append(tag)
+        return tag
+
+    assert [pool.submit("s", "molecules", job, tag) for tag in (1, 2, 3, 4)] == [1, 2, 3, 4]
+    assert pool.busy("s", "molecules") and pool.latest("s", "molecules") is None
+    gate.set()
+    assert wait_for(pool, "s", "molecules") == (4, None, True)
+    assert ran == [1, 4]
+    pool.executor.shutdown(wait=True)
+
+
+def test_a_result_is_not_current_while_a_newer_job_waits():
+    pool = AnalysisPool(max_workers=1)
+    gate = threading.Event()
+    pool.submit("s", "molecules", lambda: "first")
+    wait_for(pool, "s", "molecules")
+    pool.submit("s", "molecules", gate.wait, 5)
+    assert pool.latest("s", "molecules") == ("first", None, False)
+    gate.set()
+    assert wait_for(pool, "s", "molecules") == (True, None, True)
+    pool.executor.shutdown(wait=True)
+
+
+def test_errors_are_reported_and_sessions_kept_apart():
+    pool = AnalysisPool(max_workers=2)
+    pool.submit("a", "molecules", lambda: 1 / 0)
+    pool.submit("b", "molecules", lambda: "fine")
+    value, error, current = wait_for(pool, "a", "molecules")
+    assert value is None and isinstance(error, ZeroDivisionError) and current
+    assert wait_for(pool, "b", "molecules") == ("fine", None, True)
+    pool.drop("a")
+    assert pool.latest("a", "molecules") is None and pool.latest("b", "molecules") is not None
+    pool.executor.shutdown(wait=True)
+
+
+def test_deferred_updates_reach_the_tracker_on_the_worker():
+    deferred = DeferredUpdates(ComponentTracker())
+    live = {}
+    deferred.update(apply_events(live, piece_events(import_structure("CC=O"))))
+    assert deferred.pending and not deferred.tracker.graph.atoms
+
+    pool = AnalysisPool(max_workers=1)
+    pool.submit("s", "molecules", analyze_scheme, deferred)
+    scheme, error, _ = wait_for(pool, "s", "molecules")
+    assert error is None and not deferred.pending
+    assert [molecule["formula"] for molecule in scheme["molecules"]] == ["C2H4O"]
+    assert scheme["steps"] == []
+    pool.executor.shutdown(wait=True)